@@ -0,0 +1,238 @@
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import Dict, Iterable, List
+
+from prompt_toolkit.application.current import set_app
+
+from procmux.config import ProcMuxConfig
+from procmux.tui.harness import TUIHarness
+
+
+def _benchmark_config(process_count: int) -> ProcMuxConfig:
+    return ProcMuxConfig(procs={
+        f'process {i:04}': {
+            'shell': f'echo {i}',
+            'description': f'benchmark process {i}',
+        }
+        for i in range(process_count)
+    },
+                         signal_server={'enable': False},
+                         watch_config=False)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1,
+                int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark_keystroke_latency(
+        process_counts: Iterable[int] = (10, 100, 1000),
+        keystrokes: int = 200) -> Dict[int, Dict[str, float]]:
+    """keystroke-to-render latency (in ms) of moving the selection through the process list"""
+    results = {}
+    for process_count in process_counts:
+        latencies = []
+        with TUIHarness(_benchmark_config(process_count),
+                        autostart=False) as harness:
+            for i in range(keystrokes):
+                key = 'j' if (i // 20) % 2 == 0 else 'k'
+                started = time.perf_counter()
+                harness.send_keys(key)
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        results[process_count] = {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1],
+            'mean': statistics.mean(latencies),
+        }
+    return results
+
+
+def _idle_footprint(process_count: int) -> int:
+    """bytes allocated by python (and still alive) for the config and a started TUI that runs nothing"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        config = _benchmark_config(process_count)
+        with TUIHarness(config, autostart=False):
+            gc.collect()
+            footprint, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return footprint
+
+
+def benchmark_idle_memory(
+        process_counts: Iterable[int] = (10, 100, 1000)
+) -> Dict[int, Dict[str, float]]:
+    """the baseline memory of procmux with only configured (idle) processes, in KiB and bytes per process"""
+    # the first TUI pays for lazy imports and prompt_toolkit's caches, it is left out
+    _idle_footprint(0)
+    empty = _idle_footprint(0)
+    results = {}
+    for process_count in process_counts:
+        footprint = _idle_footprint(process_count)
+        results[process_count] = {
+            'kib': footprint / 1024,
+            'per_process': (footprint - empty) / max(process_count, 1),
+        }
+    return results
+
+
+_output_line = 'x' * 99
+_output_done = 'procmux-output-done'
+
+
+def _output_config(line_count: int) -> ProcMuxConfig:
+    return ProcMuxConfig(procs={
+        'a idle': {
+            'shell': 'sleep 600'
+        },
+        'b output': {
+            'shell': f'yes {_output_line} | head -n {line_count}; echo {_output_done}'
+        },
+    },
+                         signal_server={'enable': False},
+                         watch_config=False)
+
+
+def _output_rate(line_count: int, visible: bool, timeout: float) -> float:
+    """bytes/sec procmux takes in from a process printing line_count lines as fast as it can"""
+    with TUIHarness(_output_config(line_count), autostart=False) as harness:
+        controller = harness.controller
+        output_process = controller.process_list[1]
+        if visible:
+            harness.send_keys('j')
+        started = time.perf_counter()
+        with set_app(harness.application):
+            controller.start_process(output_process)
+            if visible:
+                controller.focus_to_current_terminal()
+        if not harness.run_until(
+                lambda: not output_process.start_queued and not output_process.running,
+                timeout):
+            raise TimeoutError(
+                f'the output was not taken in within {timeout}s')
+        elapsed = time.perf_counter() - started
+        if not visible:
+            harness.send_keys('j')
+        if not harness.wait_for_text(_output_done):
+            raise RuntimeError('the end of the output is missing')
+    return line_count * (len(_output_line) + 1) / elapsed
+
+
+def benchmark_output_throughput(megabytes: float = 20,
+                                timeout: float = 120) -> Dict[str, float]:
+    """
+    sustained bytes/sec of a single process that prints as fast as it can, with its terminal in the background
+    (the UI is idle) and with it shown and focused
+    """
+    line_count = max(1, int(megabytes * 1024 * 1024 / (len(_output_line) + 1)))
+    return {
+        'idle': _output_rate(line_count, False, timeout),
+        'visible': _output_rate(line_count, True, timeout),
+    }
+
+
+def _spawn_config(direct_exec: bool) -> ProcMuxConfig:
+    return ProcMuxConfig(procs={
+        'a selected': {
+            'shell': 'true'
+        },
+        'b uname': {
+            'shell': 'uname -s'
+        },
+    },
+                         signal_server={'enable': False},
+                         watch_config=False,
+                         direct_exec=direct_exec)
+
+
+def benchmark_spawn_latency(spawns: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    ms from starting a process (in the background, its terminal is not on screen) until it ran and exited,
+    with its `shell:` command run through shell_cmd and exec'd directly
+    """
+    results = {}
+    for mode, direct_exec in (('shell', False), ('direct', True)):
+        latencies = []
+        with TUIHarness(_spawn_config(direct_exec),
+                        autostart=False) as harness:
+            process = harness.controller.process_list[1]
+            for _ in range(spawns):
+                started = time.perf_counter()
+                with set_app(harness.application):
+                    harness.controller.start_process(process)
+                if not harness.run_until(
+                        lambda: not process.start_queued and not process.running):
+                    raise TimeoutError(f'{process.name} did not exit within 5s')
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        results[mode] = {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'mean': statistics.mean(latencies),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='procmux TUI keystroke-to-render latency benchmark')
+    parser.add_argument('--processes',
+                        type=int,
+                        nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--keystrokes', type=int, default=200)
+    parser.add_argument(
+        '--memory',
+        action='store_true',
+        help='measure the memory of idle processes instead of the latency')
+    parser.add_argument(
+        '--throughput',
+        type=float,
+        metavar='MB',
+        help='measure the output throughput of a process printing MB instead of the latency')
+    parser.add_argument(
+        '--spawns',
+        type=int,
+        help='measure the latency of this many spawns with and without the shell instead')
+    args = parser.parse_args()
+
+    if args.spawns:
+        print(f'{"exec":>10} {"p50 ms":>8} {"p95 ms":>8} {"mean ms":>8}')
+        for mode, stats in benchmark_spawn_latency(args.spawns).items():
+            print(f'{mode:>10} {stats["p50"]:>8.2f} {stats["p95"]:>8.2f} '
+                  f'{stats["mean"]:>8.2f}')
+        return
+
+    if args.throughput:
+        print(f'{"terminal":>10} {"MB/s":>10}')
+        for mode, rate in benchmark_output_throughput(args.throughput).items():
+            print(f'{mode:>10} {rate / 1024 / 1024:>10.1f}')
+        return
+
+    if args.memory:
+        print(f'{"processes":>10} {"KiB":>10} {"B/process":>10}')
+        for process_count, stats in benchmark_idle_memory(
+                args.processes).items():
+            print(f'{process_count:>10} {stats["kib"]:>10.0f} '
+                  f'{stats["per_process"]:>10.0f}')
+        return
+
+    results = benchmark_keystroke_latency(args.processes, args.keystrokes)
+    print(f'{"processes":>10} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"max ms":>8} {"mean ms":>8}')
+    for process_count, stats in results.items():
+        print(f'{process_count:>10} {stats["p50"]:>8.2f} {stats["p95"]:>8.2f} '
+              f'{stats["p99"]:>8.2f} {stats["max"]:>8.2f} {stats["mean"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
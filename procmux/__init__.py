@@ -1,43 +1,95 @@
 import logging
 import sys
+from typing import Optional
 
-from procmux.args import cli_args
-from procmux.config import ProcMuxConfig, parse_config
-from procmux.log import formatter, logger
-from procmux.server.client import SignalClient
+from procmux.args import parse_cli_args, parse_field_values
+from procmux.config import ProcMuxConfig, parse_client_config, parse_config
+from procmux.log import logger, start_logging
 
 
-def run_app(cfg: ProcMuxConfig):
+def run_app(cfg: ProcMuxConfig,
+            socket_path: Optional[str] = None,
+            restore: bool = False,
+            profile_path: Optional[str] = None):
     if cfg.log_file:
-        file_handler = logging.FileHandler(cfg.log_file)
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        start_logging(logging.FileHandler(cfg.log_file), cfg.log_format)
+    else:
+        # without a handler logging falls back to stderr, which would print over the TUI
+        logger.addHandler(logging.NullHandler())
     from procmux.tui.app import start_tui
 
-    start_tui(cfg)
+    if profile_path is None:
+        start_tui(cfg, socket_path, restore)
+        return
+    from procmux.util.profiling import default_profile_path, profiled
+
+    with profiled(profile_path or default_profile_path(cfg.resolved_state_dir)):
+        start_tui(cfg, socket_path, restore)
+
+
+def run_headless(cfg: ProcMuxConfig,
+                 output_dir: Optional[str] = None,
+                 socket_path: Optional[str] = None):
+    # without a TUI taking over the terminal, stderr is a fine default for the logs
+    start_logging(
+        logging.FileHandler(cfg.log_file) if cfg.log_file else logging.StreamHandler(),
+        cfg.log_format)
+    from procmux.headless.app import start_headless
+
+    start_headless(cfg, output_dir, socket_path)
+
+
+def run_attached(cfg: ProcMuxConfig, config_file: str,
+                 config_override: Optional[str], socket_path: Optional[str]):
+    from procmux.supervisor.launcher import ensure_supervisor
+    from procmux.supervisor.protocol import default_socket_path
+
+    socket_path = socket_path or default_socket_path(cfg)
+    ensure_supervisor(socket_path, config_file, config_override)
+    run_app(cfg, socket_path)
 
 
 def start_cli():
-    config = parse_config(cli_args.config, cli_args.config_override)
+    cli_args = parse_cli_args()
     if cli_args.subcommand == "start":
-        run_app(config)
+        run_app(parse_config(cli_args.config, cli_args.config_override),
+                restore=cli_args.restore,
+                profile_path=cli_args.profile)
+    elif cli_args.subcommand == "serve":
+        cfg = parse_config(cli_args.config, cli_args.config_override)
+        socket_path = cli_args.socket
+        if socket_path == '':
+            from procmux.supervisor.protocol import default_socket_path
+
+            socket_path = default_socket_path(cfg)
+        run_headless(cfg, cli_args.output_dir, socket_path)
+    elif cli_args.subcommand == "attach":
+        run_attached(parse_config(cli_args.config, cli_args.config_override),
+                     cli_args.config, cli_args.config_override,
+                     cli_args.socket)
     else:
+        # the signal-* subcommands are latency sensitive (they are often fired from
+        # editor save hooks), keep prompt_toolkit, ptterm and hiyapyco out of this path
+        from procmux.server.client import SignalClient
+
+        config = parse_client_config(cli_args.config, cli_args.config_override)
         try:
             signal_client = SignalClient(config)
             if cli_args.subcommand == "signal-start":
                 name = cli_args.name
-                signal_client.start_process(name)
+                signal_client.start_process(
+                    name, parse_field_values(cli_args.set))
             elif cli_args.subcommand == "signal-stop":
                 name = cli_args.name
                 signal_client.stop_process(name)
             elif cli_args.subcommand == "signal-restart":
                 name = cli_args.name
-                signal_client.restart_process(name)
+                signal_client.restart_process(
+                    name, parse_field_values(cli_args.set))
             elif cli_args.subcommand == "signal-restart-running":
                 signal_client.restart_running_processes()
             elif cli_args.subcommand == "signal-stop-running":
                 signal_client.stop_running_processes()
-        except ValueError as e:
+        except (ValueError, ConnectionError) as e:
             print(e)
             sys.exit(1)
@@ -1,6 +1,7 @@
 import argparse
 import os
 import sys
+from typing import Dict, List, Optional
 
 parser = argparse.ArgumentParser(description="procmux")
 
@@ -8,6 +9,54 @@ sub_parsers = parser.add_subparsers(help='sub-command help', dest='subcommand')
 parser_start = sub_parsers.add_parser('start', help='start procmux')
 parser_start.add_argument('--config', required=False)
 parser_start.add_argument('--config-override', required=False)
+parser_start.add_argument(
+    '--restore',
+    action='store_true',
+    help=
+    'relaunch the processes that were running when the previous session ended (requires a state dir)'
+)
+parser_start.add_argument(
+    '--profile',
+    nargs='?',
+    const='',
+    required=False,
+    metavar='PATH',
+    help=
+    'profile procmux with cProfile and write the stats to PATH on exit (defaults to <state_dir>/procmux-<pid>.prof)'
+)
+
+parser_serve = sub_parsers.add_parser(
+    'serve',
+    help=
+    'run procmux without the TUI, only supervising the processes and the signal server'
+)
+parser_serve.add_argument('--config', required=False)
+parser_serve.add_argument('--config-override', required=False)
+parser_serve.add_argument(
+    '--output-dir',
+    required=False,
+    help=
+    'write the output of every process to <output-dir>/<process name>.log')
+parser_serve.add_argument(
+    '--socket',
+    nargs='?',
+    const='',
+    required=False,
+    help=
+    'act as a supervisor that TUIs can attach to on this unix socket (defaults to <state_dir>/supervisor.sock)'
+)
+
+parser_attach = sub_parsers.add_parser(
+    'attach',
+    help=
+    'open a TUI attached to a procmux supervisor, starting one in the background if none is running'
+)
+parser_attach.add_argument('--config', required=False)
+parser_attach.add_argument('--config-override', required=False)
+parser_attach.add_argument(
+    '--socket',
+    required=False,
+    help='the supervisor socket (defaults to <state_dir>/supervisor.sock)')
 
 parser_signal_start = sub_parsers.add_parser(
     'signal-start',
@@ -17,6 +66,12 @@ parser_signal_start.add_argument('--name',
                                  type=str,
                                  help='the process name to send the signal to',
                                  required=True)
+parser_signal_start.add_argument(
+    '--set',
+    action='append',
+    default=[],
+    metavar='FIELD=VALUE',
+    help='a value for an interpolation field of the process, can be repeated')
 parser_signal_start.add_argument('--config', required=False)
 parser_signal_start.add_argument('--config-override', required=False)
 
@@ -40,6 +95,12 @@ parser_signal_restart.add_argument(
     type=str,
     help='the process name to send the signal to',
     required=True)
+parser_signal_restart.add_argument(
+    '--set',
+    action='append',
+    default=[],
+    metavar='FIELD=VALUE',
+    help='a value for an interpolation field of the process, can be repeated')
 parser_signal_restart.add_argument('--config', required=False)
 parser_signal_restart.add_argument('--config-override', required=False)
 
@@ -59,25 +120,40 @@ parser_signal_stop_running = sub_parsers.add_parser(
 parser_signal_stop_running.add_argument('--config', required=False)
 parser_signal_stop_running.add_argument('--config-override', required=False)
 
-if len(sys.argv) == 1 or sys.argv[1] not in [
-        'start', 'signal-start', 'signal-stop', 'signal-restart',
-        'signal-restart-running', 'signal-stop-running'
-]:
-    sys.argv.insert(1, 'start')
-    cli_args = parser.parse_args(sys.argv[1:])
-else:
-    cli_args = parser.parse_args()
-
-if not cli_args.config:
-    potential_defaults = [
-        'procmux-config.yml', 'procmux-config.yaml', 'procmux.yml',
-        'procmux.yaml'
-    ]
-    for potential_default in potential_defaults:
-        if os.path.exists(potential_default):
-            cli_args.config = potential_default
-            break
+_subcommands = [
+    'start', 'serve', 'attach', 'signal-start', 'signal-stop', 'signal-restart',
+    'signal-restart-running', 'signal-stop-running'
+]
+
+_potential_default_configs = [
+    'procmux-config.yml', 'procmux-config.yaml', 'procmux.yml', 'procmux.yaml'
+]
+
+
+def parse_field_values(assignments: List[str]) -> Dict[str, str]:
+    field_values = {}
+    for assignment in assignments:
+        field, sep, value = assignment.partition('=')
+        if not sep or not field.strip():
+            parser.error(
+                f'--set expects FIELD=VALUE, got: {assignment!r}')
+        field_values[field.strip()] = value
+    return field_values
+
+
+def parse_cli_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in _subcommands:
+        argv.insert(0, 'start')
+    cli_args = parser.parse_args(argv)
+
     if not cli_args.config:
-        raise RuntimeError(
-            f"{', '.join(potential_defaults)}  config files were not found in the current directory, please use --config to pass a procmux configuration file."
-        )
+        for potential_default in _potential_default_configs:
+            if os.path.exists(potential_default):
+                cli_args.config = potential_default
+                break
+        if not cli_args.config:
+            raise RuntimeError(
+                f"{', '.join(_potential_default_configs)}  config files were not found in the current directory, "
+                "please use --config to pass a procmux configuration file.")
+    return cli_args
@@ -1,19 +1,25 @@
 import os
+import sys
 from dataclasses import dataclass, field, fields
-from typing import Dict, List, Literal, Optional, OrderedDict, Union
+from typing import Dict, List, Literal, Optional, OrderedDict, TYPE_CHECKING, Union
 
-import hiyapyco
-from prompt_toolkit.layout import D, Dimension
-from prompt_toolkit.output import ColorDepth
+from procmux.util.interpolation import Interpolation, InterpolationTemplate, collect_fields, compile_template
 
-from procmux.util.interpolation import Interpolation, parse_interpolations
+# prompt_toolkit and hiyapyco are imported lazily, the signal-* subcommands only need
+# the signal server settings and should not pay for importing either of them
+if TYPE_CHECKING:
+    from prompt_toolkit.layout import Dimension
+
+
+# for the records kept per configured process, dataclasses only support __slots__ from python 3.10 on
+compact = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 
 class MisconfigurationError(Exception):
     pass
 
 
-@dataclass
+@dataclass(**compact)
 class ProcessConfig:
     """
     shell:(str) command to run (exactly one of shell or cmd must be provided).
@@ -23,6 +29,17 @@ class ProcessConfig:
     add_path: string|array - Add entries to the PATH environment variable.
     autostart: bool - Start process when procmux starts.
     stop: "SIGINT"|"SIGTERM"|"SIGKILL" - default will SIGKILL
+    restart: "no"|"on-failure"|"always" - restart the process when it exits (unless it was stopped on purpose)
+    restart_delay: float - seconds to wait before restarting
+    restart_strategy: "stop"|"overlap" - how the signal server (and config reloads) restart a running process:
+        stop it and then start it, or start the new instance first and stop the old one once the new one is ready
+    docs_file: str - file with the docs markup (relative to cwd), read when the docs are opened
+    ports: List[int] - tcp ports the process listens on, procmux warns when another process holds one of them
+    start_priority: int - processes with a higher priority are started first
+    ready_timeout: float - seconds a starting process holds its start slot (see max_concurrent_starts) at most
+    inputs: List[str] - globs (relative to cwd) of the files a one-shot task reads, starting it is skipped while
+        they and its command are unchanged since its last successful run
+    outputs: List[str] - globs of the files the task produces, it is only skipped while each of them matches a file
     """
 
     autostart: bool = False
@@ -34,10 +51,28 @@ class ProcessConfig:
     add_path: Optional[Union[str, List[str]]] = None
     description: Optional[str] = None
     docs: Optional[str] = None
+    docs_file: Optional[str] = None
+    ports: Optional[List[int]] = None
     categories: Optional[List[str]] = None
     meta_tags: Optional[List[str]] = None
+    restart: str = "no"
+    restart_delay: float = 1.0
+    restart_strategy: str = "stop"
+    start_priority: int = 0
+    ready_timeout: float = 30.0
+    inputs: Optional[List[str]] = None
+    outputs: Optional[List[str]] = None
+    _templates: Optional[List[InterpolationTemplate]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _interpolations: Optional[List[Interpolation]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
+        # yaml reads an unquoted `restart: no` as a boolean
+        if self.restart is False:
+            self.restart = "no"
         self.validate()
 
     def validate(self):
@@ -45,12 +80,42 @@ class ProcessConfig:
             raise MisconfigurationError(
                 "shell or cmd is required for every proc definition"
             )
+        if self.restart not in ("no", "on-failure", "always"):
+            raise MisconfigurationError(
+                f'restart must be one of "no", "on-failure" or "always", got "{self.restart}"'
+            )
+        if self.restart_strategy not in ("stop", "overlap"):
+            raise MisconfigurationError(
+                f'restart_strategy must be one of "stop" or "overlap", got "{self.restart_strategy}"'
+            )
+
+    @property
+    def resolved_docs_file(self) -> Optional[str]:
+        if not self.docs_file:
+            return None
+        return os.path.join(self.cwd, os.path.expanduser(self.docs_file))
+
+    def should_restart(self, exit_code: Optional[int]) -> bool:
+        if self.restart == "always":
+            return True
+        return self.restart == "on-failure" and exit_code != 0
+
+    @property
+    def templates(self) -> List[InterpolationTemplate]:
+        # compiled on first use, a config with hundreds of procs should not pay for this up front
+        if self._templates is None:
+            commands = self.cmd if self.cmd else [self.shell]
+            self._templates = [compile_template(c) for c in commands]
+        return self._templates
 
     @property
     def interpolations(self) -> List[Interpolation]:
-        if self.cmd:
-            return parse_interpolations(*self.cmd)
-        return parse_interpolations(self.shell)
+        if self._interpolations is None:
+            self._interpolations = collect_fields(self.templates)
+        return self._interpolations
+
+    def render_command(self, values: Optional[Dict[str, str]] = None) -> List[str]:
+        return [t.render(values or {}) for t in self.templates]
 
 
 @dataclass
@@ -94,6 +159,8 @@ class StyleConfig:
         Literal["DEPTH_8_BIT"],
         Literal["DEPTH_24_BIT"],
     ]:
+        from prompt_toolkit.output import ColorDepth
+
         if self.color_level == "monochrome":
             return ColorDepth.MONOCHROME
         if self.color_level == "ansicolors":
@@ -103,11 +170,15 @@ class StyleConfig:
         return ColorDepth.TRUE_COLOR
 
     @property
-    def width_100(self) -> Dimension:
+    def width_100(self) -> "Dimension":
+        from prompt_toolkit.layout import D
+
         return D(preferred=100 * 100)
 
     @property
-    def height_100(self) -> Dimension:
+    def height_100(self) -> "Dimension":
+        from prompt_toolkit.layout import D
+
         return D(preferred=100 * 100)
 
 
@@ -128,6 +199,7 @@ class KeybindingConfig:
     zoom: List[str] = field(default_factory=lambda: ["c-z"])
     docs: List[str] = field(default_factory=lambda: ["?"])
     toggle_scroll: List[str] = field(default_factory=lambda: ["c-s"])
+    toggle_process_tree: List[str] = field(default_factory=lambda: ["t"])
 
     def __post_init__(self):
         for keybinding_field in fields(KeybindingConfig):
@@ -144,18 +216,39 @@ class SignalServerConfig:
     enable: bool = False
 
 
+@dataclass
+class PeerConfig:
+    """the signal server of another procmux instance, its processes are listed as `<peer>/<process>`"""
+    host: str = "localhost"
+    port: int = 9792
+
+
 @dataclass
 class ProcMuxConfig:
     procs: Dict[str, ProcessConfig] = field(default_factory=dict)
     signal_server: SignalServerConfig = field(default_factory=SignalServerConfig)
+    peers: Dict[str, PeerConfig] = field(default_factory=dict)
     style: StyleConfig = field(default_factory=StyleConfig)
     keybinding: KeybindingConfig = field(default_factory=KeybindingConfig)
     shell_cmd: List[str] = field(
         default_factory=lambda: [os.environ.get("SHELL", "/bin/sh"), "-c"]
     )
+    # opt-in: `shell` commands without shell syntax (a program and its arguments) are run without shell_cmd,
+    # and so without what it sets up (rc files, aliases, a login PATH, a container or nix shell)
+    direct_exec: bool = False
     layout: LayoutConfig = field(default_factory=LayoutConfig)
     log_file: Optional[str] = None
+    # text | json (one object per line, with the name of the process a message is about)
+    log_format: str = 'text'
     enable_mouse: bool = True
+    watch_config: bool = True
+    state_dir: Optional[str] = None
+    # processes starting at a time, 0 for no limit. a process is done starting once it listens on its
+    # declared ports (right after it was spawned when it declares none), it exited or its ready_timeout passed
+    max_concurrent_starts: int = 0
+    # event loop stalls over this budget are logged with a stack sample, 0 disables the monitor
+    slow_callback_ms: float = 100.0
+    config_files: List[str] = field(default_factory=list)
 
     def __post_init__(self):
         def is_dict_like(obj):
@@ -177,6 +270,58 @@ class ProcMuxConfig:
             self.layout = LayoutConfig(**self.layout)
         if is_dict_like(self.signal_server):
             self.signal_server = SignalServerConfig(**self.signal_server)
+        if self.peers is None:
+            self.peers = {}
+        if is_dict_like(self.peers):
+            self.peers = {
+                name: PeerConfig(**peer) if isinstance(peer, dict) else peer
+                for name, peer in self.peers.items()
+            }
+        for name in self.peers:
+            if '/' in name:
+                raise MisconfigurationError(
+                    f'peer names must not contain "/", got "{name}"')
+        if self.log_format not in ("text", "json"):
+            raise MisconfigurationError(
+                f'log_format must be one of "text" or "json", got "{self.log_format}"'
+            )
+
+    @property
+    def resolved_state_dir(self) -> Optional[str]:
+        # procmux keeps its persistent state (remembered values, caches) next to the config
+        config_dir = (
+            os.path.dirname(os.path.abspath(self.config_files[0]))
+            if self.config_files
+            else os.getcwd()
+        )
+        if self.state_dir:
+            return os.path.join(config_dir, os.path.expanduser(self.state_dir))
+        if self.config_files:
+            return os.path.join(config_dir, ".procmux")
+        return None
+
+
+@dataclass
+class ProcsDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def diff_procs(old_procs: Dict[str, ProcessConfig],
+               new_procs: Dict[str, ProcessConfig]) -> ProcsDiff:
+    diff = ProcsDiff()
+    for name, new_proc in new_procs.items():
+        if name not in old_procs:
+            diff.added.append(name)
+        elif old_procs[name] != new_proc:
+            diff.changed.append(name)
+    diff.removed = [name for name in old_procs if name not in new_procs]
+    return diff
 
 
 def parse_config(
@@ -186,7 +331,33 @@ def parse_config(
     if override_config_file:
         config_files.append(override_config_file)
 
+    import hiyapyco
+
     config_dict = hiyapyco.load(
         *config_files, method=hiyapyco.METHOD_SIMPLE, failonmissingfiles=True
     )
-    return ProcMuxConfig(**config_dict)
+    config = ProcMuxConfig(**config_dict)
+    config.config_files = config_files
+    return config
+
+
+def parse_client_config(
+    config_file: str, override_config_file: Optional[str] = None
+) -> ProcMuxConfig:
+    """
+    loads only the signal_server section, which is all the signal client needs.
+    top level keys of the override file replace the ones in the base file, matching
+    the simple merge that parse_config does with hiyapyco.
+    """
+    import yaml
+
+    signal_server = None
+    for path in [config_file, override_config_file]:
+        if not path:
+            continue
+        with open(path) as f:
+            config_dict = yaml.load(
+                f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+        if config_dict.get("signal_server") is not None:
+            signal_server = config_dict["signal_server"]
+    return ProcMuxConfig(signal_server=signal_server or SignalServerConfig())
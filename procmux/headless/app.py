@@ -0,0 +1,10 @@
+from typing import Optional
+
+from procmux.config import ProcMuxConfig
+from procmux.headless.headless_controller import HeadlessController
+
+
+def start_headless(config: ProcMuxConfig,
+                   output_dir: Optional[str] = None,
+                   socket_path: Optional[str] = None):
+    HeadlessController(config, output_dir, socket_path=socket_path).run()
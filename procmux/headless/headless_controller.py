@@ -0,0 +1,390 @@
+import asyncio
+import signal
+from typing import Callable, Dict, List, Optional, Set
+
+from procmux.config import ProcMuxConfig
+from procmux.headless.pty_process_controller import PtyProcessController
+from procmux.log import for_process, logger
+from procmux.process.handover import Handover
+from procmux.process.reaper import Reaper
+from procmux.process.start_queue import StartQueue
+from procmux.process.task_cache import TaskCache
+from procmux.process.tree import ProcessTreeWatcher
+from procmux.server.commands import Command, CommandQueue, RestartProcess, StartProcess, StopProcess
+from procmux.server.server import start_server
+from procmux.tui.state.interpolation_state import InterpolationState
+from procmux.tui.state.process_state import ProcessState
+from procmux.tui.types import Process
+from procmux.util.interpolation import Interpolation
+from procmux.util.loop_monitor import loop_monitor
+from procmux.util.timing import timings
+
+
+class HeadlessController:
+    """
+    supervises the configured processes and the signal server without any UI.
+    everything runs on a single asyncio loop, the signal server hands its work over to it.
+    """
+
+    def __init__(self,
+                 config: ProcMuxConfig,
+                 output_dir: Optional[str] = None,
+                 shutdown_timeout: float = 10.0,
+                 socket_path: Optional[str] = None):
+        self._config = config
+        self._output_dir = output_dir
+        self._socket_path = socket_path
+        self._supervisor_server = None
+        self.output_listeners: List[Callable[[Process, bytes], None]] = []
+        self.state_listeners: List[Callable[[Process], None]] = []
+        self._shutdown_timeout = shutdown_timeout
+        self._process_state = ProcessState(config)
+        self._interpolation_state = InterpolationState(config)
+        self._task_cache: Optional[TaskCache] = None
+        self._process_controllers: Dict[int, PtyProcessController] = {}
+        # process index -> the overlap restart in progress
+        self._handovers: Dict[int, Handover] = {}
+        # instances stopped by (or after) an overlap restart, until they exited
+        self._retiring: Set[PtyProcessController] = set()
+        self._server_controller = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reaper: Optional[Reaper] = None
+        self._start_queue: Optional[StartQueue] = None
+        # only used for the ports (and their conflicts) of the processes
+        self._process_tree_watcher = ProcessTreeWatcher(
+            self._get_running_roots, self._get_declared_ports, lambda: None)
+        self._finished: Optional[asyncio.Future] = None
+        self._quitting = False
+
+    @property
+    def process_list(self) -> List[Process]:
+        return self._process_state.process_list
+
+    def _get_running_roots(self) -> Dict[int, str]:
+        # called from the process tree thread
+        return {
+            c.pid: c.process.name
+            for c in [
+                *self._process_controllers.values(),
+                *(h.new for h in list(self._handovers.values()))
+            ]
+            if c.is_running and c.pid
+        }
+
+    def _get_declared_ports(self) -> Dict[str, List[int]]:
+        return {
+            p.name: p.config.ports
+            for p in self.process_list if p.config.ports
+        }
+
+    def get_process_controller(self,
+                               process: Process) -> Optional[PtyProcessController]:
+        return self._process_controllers.get(process.index)
+
+    def get_process_by_name(self, name: str) -> Optional[Process]:
+        return self._process_state.get_process_by_name(name)
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._finished = self._loop.create_future()
+        self.reaper = Reaper(self._loop.add_reader, self._loop.remove_reader,
+                             self._loop.call_soon_threadsafe)
+        self._task_cache = TaskCache(self._config.resolved_state_dir,
+                                     self._loop.call_soon_threadsafe)
+        self._start_queue = StartQueue(self._config.max_concurrent_starts,
+                                       self._loop.call_soon_threadsafe,
+                                       self._loop.call_later)
+        self._process_controllers.update({
+            p.index: PtyProcessController(self, self._config, p, self._loop,
+                                          self._output_dir)
+            for p in self.process_list
+        })
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            self._loop.add_signal_handler(sig, self.shutdown)
+
+        if self._config.signal_server.enable:
+            commands = CommandQueue(self._loop.call_soon_threadsafe,
+                                    self._execute_command)
+            self._server_controller = start_server(self._config,
+                                                   self._process_state,
+                                                   self._process_controllers,
+                                                   commands,
+                                                   self._interpolation_state,
+                                                   self._process_tree_watcher)
+
+        if self._socket_path:
+            from procmux.supervisor.supervisor_server import SupervisorServer
+
+            self._supervisor_server = SupervisorServer(self, self._socket_path)
+            await self._supervisor_server.start()
+
+        loop_monitor.start(self._loop.call_soon_threadsafe,
+                           self._config.slow_callback_ms)
+        self._process_tree_watcher.start()
+        self.autostart()
+        await self._finished
+        logger.info('headless procmux finished')
+
+    def autostart(self):
+        logger.info('in autostart')
+        for process in self.process_list:
+            if process.config.autostart:
+                logger.info(f'autostarting {process.name}')
+                assert not process.config.interpolations, \
+                    'processes with autostart enabled must not have interpolations/field replacements'
+                self.start_process(process)
+
+    @loop_monitor.tracked('headless.start_process')
+    def start_process(self,
+                      process: Process,
+                      interpolations: Optional[List[Interpolation]] = None):
+        logger.info('in start_process %s',
+                    process.name,
+                    extra=for_process(process.name))
+        if self._quitting:
+            return
+        process_controller = self._process_controllers.get(process.index)
+        if not process_controller:
+            return
+        if interpolations is None and process.config.interpolations:
+            interpolations, missing = self._interpolation_state.resolve(
+                process.name, process.config.interpolations)
+            if missing:
+                logger.error(
+                    f'cannot start {process.name}, no values for fields: {missing}'
+                )
+                return
+        self._start_queue.submit(
+            process, lambda: self._spawn(process_controller, interpolations))
+
+    def _spawn(self, process_controller: PtyProcessController,
+               interpolations: Optional[List[Interpolation]]) -> bool:
+        """returns whether the process was spawned (or is about to be, once its inputs are hashed)"""
+        process = process_controller.process
+        # a start while the inputs are hashed is the same start
+        if self._quitting or process_controller.is_running or self._task_cache.checking(
+                process.name):
+            return False
+        if self._task_cache.start(
+                process.name, process.config, interpolations,
+                lambda up_to_date: self._on_inputs_checked(
+                    process_controller, interpolations, up_to_date)):
+            # it keeps its start slot until then
+            process.start_queued = True
+            return True
+        return self._spawn_checked(process_controller, interpolations)
+
+    def _on_inputs_checked(self, process_controller: PtyProcessController,
+                           interpolations: Optional[List[Interpolation]],
+                           up_to_date: bool):
+        process = process_controller.process
+        process.start_queued = False
+        if up_to_date:
+            logger.info('%s is up to date, not running it',
+                        process.name,
+                        extra=for_process(process.name))
+            process.up_to_date = True
+            for listener in self.state_listeners:
+                listener(process)
+        elif self._spawn_checked(process_controller, interpolations):
+            return
+        self._start_queue.release(process)
+
+    def _spawn_checked(self, process_controller: PtyProcessController,
+                       interpolations: Optional[List[Interpolation]]) -> bool:
+        if self._quitting or process_controller.is_running:
+            return False
+        process_controller.spawn(interpolations)
+        if interpolations:
+            self._interpolation_state.remember(process_controller.process.name,
+                                               interpolations)
+        return process_controller.is_running
+
+    def stop_process(self, process: Process):
+        if self._start_queue.cancel(process):
+            return
+        if self._task_cache.cancel(process.name):
+            # dropped while its inputs were hashed
+            process.start_queued = False
+            self._start_queue.release(process)
+            return
+        self._cancel_handover(process)
+        self._process_controllers[process.index].stop_process()
+
+    def restart_process(self,
+                        process: Process,
+                        interpolations: Optional[List[Interpolation]] = None):
+        """restart_strategy: overlap, see Handover. a process that is not running is started"""
+        old = self._process_controllers.get(process.index)
+        if self._quitting or not old:
+            return
+        if not old.is_running:
+            self.start_process(process, interpolations)
+            return
+        if interpolations is None and process.config.interpolations:
+            interpolations, missing = self._interpolation_state.resolve(
+                process.name, process.config.interpolations)
+            if missing:
+                logger.error(
+                    f'cannot restart {process.name}, no values for fields: {missing}'
+                )
+                return
+        # the newest restart wins
+        self._cancel_handover(process)
+        logger.info('starting a new instance of %s next to the running one',
+                    process.name,
+                    extra=for_process(process.name))
+        new = PtyProcessController(self, self._config, process, self._loop,
+                                   self._output_dir)
+        new.detached = True
+        new.columns, new.rows = old.columns, old.rows
+        new.spawn(interpolations)
+        if not new.is_running:
+            return
+        if interpolations:
+            self._interpolation_state.remember(process.name, interpolations)
+        handover = Handover(old, new, self._process_tree_watcher,
+                            self._loop.call_later, self._on_handover_ready,
+                            self._on_handover_failed)
+        self._handovers[process.index] = handover
+        handover.start()
+
+    def _on_handover_ready(self, handover: Handover):
+        process = handover.process
+        self._handovers.pop(process.index, None)
+        old, new = handover.old, handover.new
+        new.detached = False
+        self._process_controllers[process.index] = new
+        self._retire(old)
+        # the supervisor switches its screen over to the new instance
+        for listener in self.state_listeners:
+            listener(process)
+
+    def _on_handover_failed(self, handover: Handover):
+        self._handovers.pop(handover.process.index, None)
+        # stopped when it was not ready in time
+        self._retire(handover.new)
+
+    def _cancel_handover(self, process: Process):
+        handover = self._handovers.pop(process.index, None)
+        if handover:
+            logger.info('cancelling the overlap restart of %s',
+                        process.name,
+                        extra=for_process(process.name))
+            handover.cancel()
+            self._retire(handover.new)
+
+    def _retire(self, process_controller: PtyProcessController):
+        """stops an instance the process no longer runs as, it is kept until the reaper reports its exit"""
+        process_controller.detached = True
+        if process_controller.is_running:
+            self._retiring.add(process_controller)
+            process_controller.stop_process()
+
+    def on_detached_done(self, process_controller: PtyProcessController):
+        self._retiring.discard(process_controller)
+        if self._quitting and not self._process_state.has_running_processes and not self._retiring:
+            self._finish()
+
+    def _execute_command(self, command: Command):
+        if isinstance(command, StartProcess):
+            self.start_process(command.process, command.interpolations)
+        elif isinstance(command, RestartProcess):
+            self.restart_process(command.process, command.interpolations)
+        elif isinstance(command, StopProcess):
+            self.stop_process(command.process)
+
+    def start_process_with_values(self, process: Process,
+                                  values: Dict[str, str]) -> List[str]:
+        """returns the names of the fields that are missing a value, the process is only started when there are none"""
+        interpolations, missing = self._interpolation_state.resolve(
+            process.name, process.config.interpolations, values)
+        if not missing:
+            self.start_process(process, interpolations)
+        return missing
+
+    def on_process_output(self, process: Process, data: bytes):
+        for listener in self.output_listeners:
+            listener(process, data)
+
+    def on_process_spawned(self, process: Process):
+        process.running = True
+        process.up_to_date = False
+        self._start_queue.on_spawned(process)
+        for listener in self.state_listeners:
+            listener(process)
+
+    @loop_monitor.tracked('headless.on_process_done')
+    def on_process_done(self, process: Process, exit_code: Optional[int]):
+        handover = self._handovers.get(process.index)
+        if handover and handover.new.is_running:
+            logger.info(
+                '%s exited during its overlap restart, the new instance takes over right away',
+                process.name,
+                extra=for_process(process.name))
+            handover.cancel()
+            self._on_handover_ready(handover)
+            return
+        process.running = False
+        self._start_queue.release(process)
+        self._task_cache.finish(process.name, exit_code == 0)
+        for listener in self.state_listeners:
+            listener(process)
+        process_controller = self._process_controllers[process.index]
+        if self._quitting:
+            if not self._process_state.has_running_processes and not self._retiring:
+                self._finish()
+            return
+        if not process_controller.stop_requested and process.config.should_restart(
+                exit_code):
+            logger.info(
+                f'restarting {process.name} in {process.config.restart_delay}s '
+                f'(restart: {process.config.restart}, exit code: {exit_code})')
+            self._loop.call_later(process.config.restart_delay,
+                                  self._restart_if_idle, process)
+
+    def _restart_if_idle(self, process: Process):
+        process_controller = self._process_controllers[process.index]
+        # a manual start or stop in the meantime wins over the restart policy
+        if not process_controller.is_running and not process_controller.stop_requested:
+            self.start_process(process)
+
+    def shutdown(self):
+        if self._quitting:
+            return
+        logger.info('shutting down - stopping all processes')
+        self._quitting = True
+        self._start_queue.clear()
+        self._task_cache.close()
+        for handover in list(self._handovers.values()):
+            self._cancel_handover(handover.process)
+        for process_controller in [*self._process_controllers.values(), *self._retiring]:
+            process_controller.stop_process()
+        if not self._process_state.has_running_processes and not self._retiring:
+            self._finish()
+            return
+        self._loop.call_later(self._shutdown_timeout, self._kill_remaining)
+
+    def _kill_remaining(self):
+        for process_controller in [*self._process_controllers.values(), *self._retiring]:
+            if process_controller.is_running:
+                logger.info(
+                    f'{process_controller.process.name} did not stop within '
+                    f'{self._shutdown_timeout}s - sending SIGKILL')
+                process_controller.kill()
+
+    def _finish(self):
+        loop_monitor.stop()
+        self._process_tree_watcher.stop()
+        logger.info(f'timings:\n{timings.report()}')
+        if self._supervisor_server:
+            self._supervisor_server.close()
+            self._supervisor_server = None
+        if self._server_controller:
+            self._server_controller.stop()
+            self._server_controller = None
+        if self._finished and not self._finished.done():
+            self._finished.set_result(None)
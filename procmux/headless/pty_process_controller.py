@@ -0,0 +1,197 @@
+import asyncio
+import fcntl
+import os
+import signal
+import struct
+import subprocess
+import termios
+from typing import List, Optional, TYPE_CHECKING
+
+from procmux.config import ProcMuxConfig
+from procmux.log import for_process, logger
+from procmux.process.controller import ProcessController
+from procmux.process.output import OutputCapture, output_file_name
+from procmux.process.reaper import ExitStatus
+from procmux.tui.types import Process
+from procmux.util.interpolation import Interpolation
+from procmux.util.timing import timings
+
+if TYPE_CHECKING:
+    from procmux.headless.headless_controller import HeadlessController
+
+_default_columns = 160
+_default_rows = 48
+
+
+def _set_window_size(fd: int, rows: int, columns: int):
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, columns, 0, 0))
+
+
+def _make_controlling_tty():
+    # runs in the child after setsid(), stdin is already the pty slave
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+class PtyProcessController(ProcessController):
+    """
+    runs a process on a plain pty without a terminal emulator,
+    output is kept in an OutputCapture (and optionally a log file).
+    """
+
+    def __init__(self, controller: 'HeadlessController',
+                 config: ProcMuxConfig, process: Process,
+                 loop: asyncio.AbstractEventLoop, output_dir: Optional[str]):
+        super().__init__(config, process)
+        self._controller: HeadlessController = controller
+        self._loop = loop
+        self._popen: Optional[subprocess.Popen] = None
+        self._master_fd: Optional[int] = None
+        self._running = False
+        self._output = OutputCapture(file_path=os.path.join(
+            output_dir, output_file_name(process.name)) if output_dir else None)
+        self.stop_requested = False
+        self.exit_code: Optional[int] = None
+        self.columns = _default_columns
+        self.rows = _default_rows
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._popen.pid if self._popen else None
+
+    def get_output_tail(self, max_lines: int) -> str:
+        return self._output.tail(max_lines)
+
+    @timings.timed('spawn')
+    def spawn(self, interpolations: Optional[List[Interpolation]] = None):
+        logger.info('in spawn for process %s',
+                    self._process.name,
+                    extra=for_process(self._process.name))
+        if self.is_running:
+            logger.info(f'{self._process.name} is already running')
+            return
+
+        cmd = self._get_cmd(interpolations)
+        master_fd, slave_fd = os.openpty()
+        _set_window_size(slave_fd, self.rows, self.columns)
+        self._output.open()
+        try:
+            self._popen = subprocess.Popen(cmd,
+                                           stdin=slave_fd,
+                                           stdout=slave_fd,
+                                           stderr=slave_fd,
+                                           cwd=self._process.config.cwd,
+                                           env=self._get_env(),
+                                           start_new_session=True,
+                                           preexec_fn=_make_controlling_tty)
+        except OSError as e:
+            logger.error(f'failed to spawn {self._process.name}: {e}')
+            self._output.write(f'procmux: failed to spawn {cmd}: {e}\n'.encode())
+            self._output.close()
+            os.close(master_fd)
+            return
+        finally:
+            os.close(slave_fd)
+
+        os.set_blocking(master_fd, False)
+        self._master_fd = master_fd
+        self._loop.add_reader(master_fd, self._read_output)
+        self._running = True
+        self.stop_requested = False
+        self.exit_code = None
+        popen = self._popen
+        self._controller.reaper.watch(
+            popen.pid, lambda status: self._on_exit(popen, status))
+        logger.info('spawned %s with pid %s',
+                    self._process.name,
+                    self._popen.pid,
+                    extra=for_process(self._process.name))
+        if not self.detached:
+            self._controller.on_process_spawned(self._process)
+
+    @timings.timed('pty.output')
+    def _read_output(self) -> int:
+        """returns the number of bytes read, 0 once there is nothing (more) to read"""
+        if self._master_fd is None:
+            return 0
+        try:
+            data = os.read(self._master_fd, 64 * 1024)
+        except BlockingIOError:
+            return 0
+        except OSError:
+            # EIO, every process holding the slave side has exited
+            data = b''
+        if not data:
+            self._close_pty()
+            return 0
+        self._output.write(data)
+        if not self.detached:
+            self._controller.on_process_output(self._process, data)
+        return len(data)
+
+    def write_input(self, data: bytes):
+        if self._master_fd is not None:
+            try:
+                os.write(self._master_fd, data)
+            except OSError as e:
+                logger.error(
+                    f'failed to write input to {self._process.name}: {e}')
+
+    def resize(self, columns: int, rows: int):
+        self.columns = columns
+        self.rows = rows
+        if self._master_fd is not None:
+            # the kernel delivers SIGWINCH to the foreground process group
+            _set_window_size(self._master_fd, rows, columns)
+
+    def _close_pty(self):
+        if self._master_fd is not None:
+            self._loop.remove_reader(self._master_fd)
+            os.close(self._master_fd)
+            self._master_fd = None
+
+    def _on_exit(self, popen: subprocess.Popen, status: ExitStatus):
+        # the reaper collected the status, keep Popen from waiting for it again
+        popen.returncode = status.exit_code
+        self.last_exit = status
+        self._handle_process_done(status.exit_code)
+
+    def _handle_process_done(self, exit_code: Optional[int]):
+        # drain whatever the process wrote right before exiting
+        while self._read_output():
+            pass
+        self._close_pty()
+        self._output.close()
+        self._running = False
+        self.exit_code = exit_code
+        logger.info('%s exited with code %s',
+                    self._process.name,
+                    exit_code,
+                    extra=for_process(self._process.name))
+        if self.detached:
+            self._controller.on_detached_done(self)
+        else:
+            self._controller.on_process_done(self._process, exit_code)
+
+    def _send_signal(self, sig_code: int):
+        if not self._popen:
+            return
+        # signal the whole session so children of `$SHELL -c` wrappers are stopped as well
+        try:
+            os.killpg(self._popen.pid, sig_code)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            self._popen.send_signal(sig_code)
+
+    def stop_process(self):
+        self.stop_requested = True
+        super().stop_process()
+
+    def kill(self):
+        self.stop_requested = True
+        if self.is_running:
+            self._send_signal(signal.SIGKILL)
@@ -1,5 +1,68 @@
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
+
+_listeners: List[QueueListener] = []
+
+
+def for_process(name: str) -> Dict[str, Any]:
+    """`extra` for log calls about a single process, IE: logger.info('%s is done', name, extra=for_process(name))"""
+    return {'process_name': name}
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line, with the process the record is about (if any)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'process': getattr(record, 'process_name', None),
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    hands the record over as is, QueueHandler.prepare would format the message on the calling thread.
+    the message is built by the listener thread, so log calls on hot paths should pass their
+    arguments separately (IE: logger.info('in update filter: %s', text)) instead of using f-strings
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def start_logging(handler: logging.Handler, log_format: str = 'text'):
+    """writes the logs with handler on a background thread, the event loop only enqueues records"""
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else formatter)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    if not _listeners:
+        atexit.register(stop_logging)
+    _listeners.append(listener)
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+
+
+def stop_logging():
+    """flushes every queued record and stops the writer threads"""
+    for queue_handler in [h for h in logger.handlers if isinstance(h, _DeferredQueueHandler)]:
+        logger.removeHandler(queue_handler)
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
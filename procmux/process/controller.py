@@ -0,0 +1,110 @@
+import os
+import signal
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from procmux.config import ProcMuxConfig
+from procmux.log import logger
+from procmux.process.direct_exec import direct_command
+from procmux.process.reaper import ExitStatus
+from procmux.tui.types import Process
+from procmux.util.interpolation import Interpolation
+
+
+class ProcessController(ABC):
+    """
+    spawn and stop logic shared by every way procmux runs a process
+    (ptterm terminals in the TUI, plain ptys in headless mode).
+    nothing in here may import prompt_toolkit.
+    """
+
+    def __init__(self, config: ProcMuxConfig, process: Process):
+        self._config: ProcMuxConfig = config
+        self._process: Process = process
+        # exit code and resource usage of the last run
+        self.last_exit: Optional[ExitStatus] = None
+        # an instance that is not the one procmux runs the process as (the new instance of an overlap restart
+        # until it is ready, the old one after), it does not report its spawn or output, only that it exited
+        self.detached = False
+
+    @property
+    def process(self) -> Process:
+        return self._process
+
+    @property
+    @abstractmethod
+    def is_running(self) -> bool:
+        pass
+
+    @property
+    def pid(self) -> Optional[int]:
+        """the pid of the top process, None when it is not running (or not local)"""
+        return None
+
+    @abstractmethod
+    def get_output_tail(self, max_lines: int) -> str:
+        """on the event loop only, it writes the output"""
+
+    def _get_path_additions(self) -> List[str]:
+        add_path = self._process.config.add_path
+        if not add_path:
+            return []
+        if isinstance(add_path, str):
+            return [add_path]
+        return list(add_path)
+
+    def _get_env_updates(self) -> Dict[str, str]:
+        env = {
+            key: value or ''
+            for key, value in (self._process.config.env or {}).items()
+        }
+        path_additions = self._get_path_additions()
+        if path_additions:
+            env['PATH'] = os.pathsep.join(
+                [*path_additions,
+                 env.get('PATH', os.environ.get('PATH', ''))])
+        return env
+
+    def _get_env(self) -> Dict[str, str]:
+        return {**os.environ, **self._get_env_updates()}
+
+    def _before_exec(self):
+        # runs in the forked child right before exec
+        os.chdir(self._process.config.cwd)
+        os.environ.update(self._get_env_updates())
+
+    def _get_cmd(
+            self,
+            interpolations: Optional[List[Interpolation]] = None) -> List[str]:
+        proc_config = self._process.config
+        values = {i.field: i.value for i in interpolations or []}
+        cmd = []
+        if proc_config.shell:
+            command = proc_config.render_command(values)
+            if self._config.direct_exec:
+                path = self._get_env_updates().get('PATH',
+                                                   os.environ.get('PATH', ''))
+                argv = direct_command(command[0], path, proc_config.cwd)
+                if argv:
+                    return argv
+            cmd.extend(self._config.shell_cmd)
+            cmd.extend(command)
+        elif proc_config.cmd:
+            cmd = proc_config.render_command(values)
+        return cmd
+
+    def _get_stop_signal(self) -> int:
+        return getattr(signal, self._process.config.stop)
+
+    @abstractmethod
+    def _send_signal(self, sig_code: int):
+        pass
+
+    def stop_process(self):
+        logger.info(f'in stop process: {self._process.name}')
+        if self.is_running:
+            try:
+                self._send_signal(self._get_stop_signal())
+            except Exception as e:
+                logger.error(
+                    f'failed to kill process: {self._process.name} {e}')
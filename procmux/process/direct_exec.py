@@ -0,0 +1,55 @@
+import os
+import shlex
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+# anything the shell would expand, redirect, chain or glob. quotes are fine, shlex splits them the same way
+_shell_syntax = frozenset('|&;<>()$`\\*?[]{}~#\n')
+
+# keywords and builtins that act on the shell itself (or mean something else as a program)
+_shell_words = frozenset([
+    '!', '.', ':', 'alias', 'builtin', 'case', 'cd', 'command', 'coproc', 'do',
+    'done', 'elif', 'else', 'esac', 'eval', 'exec', 'exit', 'export', 'fi',
+    'for', 'function', 'hash', 'if', 'read', 'readonly', 'return', 'select',
+    'set', 'shift', 'source', 'then', 'time', 'trap', 'type', 'ulimit',
+    'umask', 'unset', 'until', 'wait', 'while'
+])
+
+# (program, PATH) -> the absolute path of the executable, None when it is not on the PATH
+_executables: Dict[Tuple[str, str], Optional[str]] = {}
+
+
+def resolve_executable(program: str, path: str, cwd: str) -> Optional[str]:
+    if os.sep in program:
+        executable = os.path.abspath(os.path.join(cwd, program))
+        if os.path.isfile(executable) and os.access(executable, os.X_OK):
+            return executable
+        return None
+    key = (program, path)
+    if key in _executables:
+        executable = _executables[key]
+        # moved or removed since (a virtualenv that was recreated), looked up again
+        if executable is None or os.access(executable, os.X_OK):
+            return executable
+    executable = _executables[key] = shutil.which(program, path=path)
+    return executable
+
+
+def direct_command(command: str, path: str, cwd: str) -> Optional[List[str]]:
+    """
+    the argv to exec a `shell:` command with, without a shell in between.
+    None when it needs the shell (shell syntax, a builtin, a program that is not on the PATH)
+    """
+    if _shell_syntax.intersection(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    # FOO=bar program sets a variable for the program
+    if not argv or argv[0] in _shell_words or '=' in argv[0]:
+        return None
+    executable = resolve_executable(argv[0], path, cwd)
+    if not executable:
+        return None
+    return [executable, *argv[1:]]
@@ -0,0 +1,90 @@
+import time
+from typing import Any, Callable, Optional
+
+from procmux.log import logger
+from procmux.process.controller import ProcessController
+from procmux.process.tree import ProcessTreeWatcher
+from procmux.tui.types import Process
+
+# seconds between checks of whether the new instance is ready
+check_interval = 0.2
+
+
+class Handover:
+    """
+    restart_strategy: overlap. the new instance of a process runs (detached) next to the old one, which keeps
+    serving until the new process tree listens on the declared ports (on any tcp port when none are declared).
+    on_ready is called then, the controller swaps the instances and stops the old one.
+    on_failed is called when the new instance exits or is not ready within ready_timeout (it is stopped then),
+    the old one is left running. runs on the event loop.
+    """
+
+    def __init__(self, old: ProcessController, new: ProcessController,
+                 watcher: ProcessTreeWatcher,
+                 call_later: Callable[[float, Callable[[], None]], Any],
+                 on_ready: Callable[['Handover'], None],
+                 on_failed: Callable[['Handover'], None]):
+        """call_later returns a handle with a cancel method"""
+        self.old = old
+        self.new = new
+        self._watcher = watcher
+        self._call_later = call_later
+        self._on_ready = on_ready
+        self._on_failed = on_failed
+        self._deadline = time.monotonic() + new.process.config.ready_timeout
+        self._timer: Optional[Any] = None
+        self.finished = False
+
+    @property
+    def process(self) -> Process:
+        return self.new.process
+
+    def start(self):
+        self._check()
+
+    def cancel(self):
+        self.finished = True
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _is_ready(self) -> bool:
+        pid = self.new.pid
+        if not pid:
+            return False
+        if not self._watcher.available:
+            # the instances cannot be told apart without /proc, the new one takes over right away
+            return True
+        listening = {
+            p.port
+            for p in self._watcher.ports.get(pid, [])
+            if p.protocol.startswith('tcp')
+        }
+        declared = self.process.config.ports
+        return set(declared) <= listening if declared else bool(listening)
+
+    def _fail(self, reason: str):
+        self.finished = True
+        logger.error(f'{reason}, {self.process.name} keeps running as it was')
+        self._on_failed(self)
+
+    def _check(self):
+        self._timer = None
+        if self.finished:
+            return
+        if not self.new.is_running:
+            self._fail(f'the new instance of {self.process.name} exited before it was ready')
+        elif self._is_ready():
+            self.finished = True
+            logger.info(
+                f'the new instance of {self.process.name} is ready, stopping the old one'
+            )
+            self._on_ready(self)
+        elif time.monotonic() >= self._deadline:
+            self.new.stop_process()
+            self._fail(
+                f'the new instance of {self.process.name} is not ready after '
+                f'{self.process.config.ready_timeout}s')
+        else:
+            self._watcher.refresh_soon()
+            self._timer = self._call_later(check_interval, self._check)
@@ -0,0 +1,57 @@
+import os
+import re
+from typing import BinaryIO, Optional
+
+from procmux.log import logger
+
+
+class OutputCapture:
+    """
+    keeps the most recent output of a process in memory, bounded by max_bytes,
+    and optionally appends everything to a log file.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024,
+                 file_path: Optional[str] = None):
+        self._max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._file_path = file_path
+        self._file: Optional[BinaryIO] = None
+
+    def open(self):
+        if self._file_path and not self._file:
+            try:
+                os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
+                self._file = open(self._file_path, 'ab', buffering=0)
+            except OSError as e:
+                logger.error(
+                    f'failed to open output file {self._file_path}: {e}')
+
+    def write(self, data: bytes):
+        self._buffer += data
+        overflow = len(self._buffer) - self._max_bytes
+        if overflow > 0:
+            del self._buffer[:overflow]
+        if self._file:
+            try:
+                self._file.write(data)
+            except OSError as e:
+                logger.error(
+                    f'failed to write output file {self._file_path}: {e}')
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def tail(self, max_lines: int) -> str:
+        text = self._buffer.decode('utf-8', errors='replace').replace(
+            '\r\n', '\n')
+        return '\n'.join(text.split('\n')[-max_lines:])
+
+
+_unsafe_file_chars = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def output_file_name(process_name: str) -> str:
+    return _unsafe_file_chars.sub('_', process_name).strip('_') + '.log'
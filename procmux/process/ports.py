@@ -0,0 +1,231 @@
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+_tcp_listen = '0A'
+_udp_unconnected = '07'
+_socket_tables = ('tcp', 'tcp6', 'udp', 'udp6')
+# owner of sockets that do not belong to any managed process
+OUTSIDE = 0
+
+
+@dataclass(frozen=True)
+class ListeningPort:
+    protocol: str
+    address: str
+    port: int
+    inode: int
+
+    def __str__(self) -> str:
+        return f'{self.port}/{self.protocol}'
+
+
+def _decode_address(hex_address: str) -> str:
+    raw = bytes.fromhex(hex_address)
+    if len(raw) == 4:
+        return socket.inet_ntop(socket.AF_INET, raw[::-1])
+    # ipv6 addresses are printed as four host order 32 bit words
+    return socket.inet_ntop(
+        socket.AF_INET6, b''.join(raw[i:i + 4][::-1] for i in range(0, 16, 4)))
+
+
+def read_listening_sockets(proc_dir: str = '/proc') -> Dict[int, ListeningPort]:
+    """inode -> port of every listening tcp socket and bound, unconnected udp socket on the machine"""
+    sockets = {}
+    for table in _socket_tables:
+        try:
+            with open(f'{proc_dir}/net/{table}') as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        listening_state = _tcp_listen if table.startswith('tcp') else _udp_unconnected
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 10 or fields[3] != listening_state:
+                continue
+            local_address, local_port = fields[1].split(':')
+            port = int(local_port, 16)
+            inode = int(fields[9])
+            if not port or not inode:
+                continue
+            sockets[inode] = ListeningPort(protocol=table,
+                                           address=_decode_address(local_address),
+                                           port=port,
+                                           inode=inode)
+    return sockets
+
+
+class PortScanner:
+    """
+    maps listening sockets to the pids holding them.
+    /proc/net is read every scan, but the fds of the managed pids are only read when a listening socket
+    shows up whose owner is not known yet. a socket's inode never changes, so once its owner is found
+    (or it is known to belong to a process outside procmux) it is not looked up again while it exists.
+    """
+
+    def __init__(self, proc_dir: str = '/proc'):
+        self._proc_dir = proc_dir
+        # inode -> owning pid, OUTSIDE for sockets no managed process holds
+        self._owners: Dict[int, int] = {}
+        self._pids: Set[int] = set()
+
+    def _socket_inodes(self, pid: int) -> Set[int]:
+        fd_dir = f'{self._proc_dir}/{pid}/fd'
+        inodes = set()
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return inodes
+        for fd in fds:
+            try:
+                target = os.readlink(f'{fd_dir}/{fd}')
+            except OSError:
+                continue
+            if target.startswith('socket:['):
+                inodes.add(int(target[8:-1]))
+        return inodes
+
+    def scan(self, pids: Iterable[int]) -> Dict[int, List[ListeningPort]]:
+        """pid -> ports it listens on (for the given pids), sockets held by other processes are under OUTSIDE"""
+        pids = set(pids)
+        sockets = read_listening_sockets(self._proc_dir)
+        # a socket is only known to be outside procmux for the pids that were checked
+        new_pids = bool(pids - self._pids)
+        self._pids = pids
+        owners = {
+            inode: owner
+            for inode, owner in self._owners.items()
+            if inode in sockets and (owner in pids or (owner == OUTSIDE and not new_pids))
+        }
+        unknown = sockets.keys() - owners.keys()
+        if unknown:
+            for pid in sorted(pids):
+                for inode in self._socket_inodes(pid) & unknown:
+                    owners.setdefault(inode, pid)
+            for inode in unknown - owners.keys():
+                owners[inode] = OUTSIDE
+        self._owners = owners
+
+        ports: Dict[int, List[ListeningPort]] = {}
+        for inode, owner in owners.items():
+            ports.setdefault(owner, []).append(sockets[inode])
+        for pid_ports in ports.values():
+            pid_ports.sort(key=lambda p: (p.port, p.protocol))
+        return ports
+
+
+@dataclass(frozen=True)
+class PortConflict:
+    port: int
+    # the process that declared the port, None when the conflict is about an undeclared port
+    process: Optional[str] = None
+    holders: Tuple[str, ...] = ()
+    outside: bool = False
+
+    def involves(self, name: str) -> bool:
+        return name == self.process or name in self.holders
+
+    def __str__(self) -> str:
+        if self.outside:
+            return f'port {self.port} of {self.process} is held by a process outside procmux'
+        if self.process:
+            return f'port {self.port} of {self.process} is held by {", ".join(self.holders)}'
+        return f'port {self.port} is held by {", ".join(self.holders)}'
+
+
+def find_conflicts(declared: Dict[str, List[int]],
+                   ports: Dict[Optional[str], List[ListeningPort]]) -> List[PortConflict]:
+    """
+    declared: process name -> the ports it declares.
+    ports: process name (None for processes outside procmux) -> the ports it listens on.
+    only tcp is considered, udp sockets commonly share ports on purpose
+    """
+    holders: Dict[int, Set[Optional[str]]] = {}
+    for name, name_ports in ports.items():
+        for listening_port in name_ports:
+            if listening_port.protocol.startswith('tcp'):
+                holders.setdefault(listening_port.port, set()).add(name)
+    conflicts = []
+    for port, names in sorted(holders.items()):
+        managed = tuple(sorted(n for n in names if n is not None))
+        if len(managed) > 1:
+            conflicts.append(PortConflict(port, holders=managed))
+    for name, declared_ports in sorted(declared.items()):
+        for port in declared_ports:
+            names = holders.get(port, set())
+            if None in names:
+                conflicts.append(PortConflict(port, name, outside=True))
+            elif names and name not in names and len(names) == 1:
+                conflicts.append(PortConflict(port, name, holders=tuple(names)))
+    return conflicts
+
+
+class PortWaiter:
+    """
+    polls until ports are listened on, on a background thread that only runs while something is waited for.
+    /proc/net is read where there is one, elsewhere a connection to localhost is attempted.
+    on_ready is called (on that thread) with the key of a wait once all of its ports are listened on.
+    """
+
+    def __init__(self, on_ready: Callable[[Hashable], None], interval: float = 0.1,
+                 proc_dir: str = '/proc'):
+        self._on_ready = on_ready
+        self._interval = interval
+        self._proc_dir = proc_dir
+        self._use_proc = os.path.exists(f'{proc_dir}/net/tcp')
+        self._waits: Dict[Hashable, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def wait(self, key: Hashable, ports: Iterable[int]):
+        with self._lock:
+            self._waits[key] = set(ports)
+            if not self._thread:
+                self._thread = threading.Thread(target=self._poll,
+                                                name='procmux-port-waiter',
+                                                daemon=True)
+                self._thread.start()
+
+    def cancel(self, key: Hashable):
+        with self._lock:
+            self._waits.pop(key, None)
+
+    def close(self):
+        self._stop_event.set()
+
+    def _is_listening(self, port: int) -> bool:
+        try:
+            with socket.create_connection(('localhost', port), timeout=self._interval):
+                return True
+        except OSError:
+            return False
+
+    def _listening_ports(self, ports: Set[int]) -> Set[int]:
+        if self._use_proc:
+            return {
+                p.port
+                for p in read_listening_sockets(self._proc_dir).values()
+                if p.protocol.startswith('tcp')
+            }
+        return {port for port in ports if self._is_listening(port)}
+
+    def _poll(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                if not self._waits:
+                    self._thread = None
+                    return
+                waits = dict(self._waits)
+            listening = self._listening_ports(set().union(*waits.values()))
+            for key, ports in waits.items():
+                if ports <= listening:
+                    with self._lock:
+                        # cancelled (or waited for again) in the meantime
+                        if self._waits.get(key) is not ports:
+                            continue
+                        del self._waits[key]
+                    self._on_ready(key)
+            self._stop_event.wait(self._interval)
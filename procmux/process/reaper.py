@@ -0,0 +1,80 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from procmux.log import logger
+
+
+@dataclass
+class ExitStatus:
+    pid: int
+    # like Popen.returncode, -N when the process was killed by signal N.
+    # None when the exit status could not be collected (IE: somebody else reaped the child)
+    exit_code: Optional[int]
+    user_time: float = 0.0
+    system_time: float = 0.0
+    # kilobytes on linux, bytes on macOS
+    max_rss_kb: int = 0
+
+
+def _collect(pid: int) -> ExitStatus:
+    try:
+        _, status, rusage = os.wait4(pid, 0)
+    except ChildProcessError:
+        return ExitStatus(pid, None)
+    return ExitStatus(pid,
+                      os.waitstatus_to_exitcode(status),
+                      user_time=rusage.ru_utime,
+                      system_time=rusage.ru_stime,
+                      max_rss_kb=rusage.ru_maxrss)
+
+
+class Reaper:
+    """
+    the single place that waits for the processes procmux spawns.
+    on linux every child gets a pidfd registered with the event loop, it becomes readable once the child
+    exited and the exit status (and rusage) is collected with wait4 right away, without any thread.
+    where pidfds are not available a thread per child blocks in wait4 instead.
+    callbacks always run on the event loop.
+    """
+
+    def __init__(self, add_reader: Callable[[int, Callable[[], None]], None],
+                 remove_reader: Callable[[int], None],
+                 call_soon_threadsafe: Callable[[Callable[[], None]], None]):
+        self._add_reader = add_reader
+        self._remove_reader = remove_reader
+        self._call_soon_threadsafe = call_soon_threadsafe
+        self._pidfds: Dict[int, int] = {}
+
+    def watch(self, pid: int, callback: Callable[[ExitStatus], None]):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError) as e:
+            if not isinstance(e, AttributeError):
+                logger.info(f'pidfd_open({pid}) failed ({e}), waiting for it on a thread')
+            threading.Thread(target=self._wait_on_thread,
+                             args=(pid, callback),
+                             name=f'procmux-wait-{pid}',
+                             daemon=True).start()
+            return
+        self._pidfds[pid] = pidfd
+        self._add_reader(pidfd, lambda: self._reap(pid, callback))
+
+    def _wait_on_thread(self, pid: int, callback: Callable[[ExitStatus],
+                                                           None]):
+        status = _collect(pid)
+        self._call_soon_threadsafe(lambda: callback(status))
+
+    def _reap(self, pid: int, callback: Callable[[ExitStatus], None]):
+        pidfd = self._pidfds.pop(pid)
+        self._remove_reader(pidfd)
+        os.close(pidfd)
+        # the pidfd only becomes readable once the child exited, so this never blocks
+        callback(_collect(pid))
+
+    def close(self):
+        for pidfd in self._pidfds.values():
+            self._remove_reader(pidfd)
+            os.close(pidfd)
+        self._pidfds.clear()
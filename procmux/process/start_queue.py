@@ -0,0 +1,125 @@
+import heapq
+import itertools
+from typing import Any, Callable, Dict, List, Tuple
+
+from procmux.log import for_process, logger
+from procmux.process.ports import PortWaiter
+from procmux.tui.types import Process
+
+
+class StartQueue:
+    """
+    every start (autostart, keybindings, the signal server, restarts and session restores) goes through here.
+    starts requested in the same pass of the event loop are spawned highest start_priority first, and with
+    max_concurrent set no more than that many processes are starting at a time. a process holds its slot
+    until it is ready: its declared ports are listened on (right after the spawn when it declares none),
+    it exited, or its ready_timeout passed.
+    runs on the event loop, schedule must be safe to call from any thread.
+    """
+
+    def __init__(self, max_concurrent: int,
+                 schedule: Callable[[Callable[[], None]], Any],
+                 call_later: Callable[[float, Callable[[], None]], Any]):
+        """call_later returns a handle with a cancel method"""
+        self._max_concurrent = max_concurrent
+        self._schedule = schedule
+        self._call_later = call_later
+        self._port_waiter = PortWaiter(
+            lambda index: schedule(lambda: self._on_ports_ready(index)))
+        # (-priority, sequence, process index), entries of cancelled starts are skipped when popped
+        self._heap: List[Tuple[int, int, int]] = []
+        self._queued: Dict[int, Tuple[Process, Callable[[], bool]]] = {}
+        # process index -> the process and the handle of its ready timeout
+        self._starting: Dict[int, Tuple[Process, Any]] = {}
+        self._sequence = itertools.count()
+        self._drain_scheduled = False
+
+    @property
+    def limited(self) -> bool:
+        return self._max_concurrent > 0
+
+    def submit(self, process: Process, spawn: Callable[[], bool]):
+        """spawn returns whether the process was started, it does not hold a slot otherwise"""
+        if process.index in self._queued:
+            logger.info('%s is already waiting to start',
+                        process.name,
+                        extra=for_process(process.name))
+            return
+        self._queued[process.index] = (process, spawn)
+        process.start_queued = True
+        heapq.heappush(self._heap, (-process.config.start_priority,
+                                    next(self._sequence), process.index))
+        self._schedule_drain()
+
+    def cancel(self, process: Process) -> bool:
+        """drops a start that did not get a slot yet, returns whether there was one"""
+        process.start_queued = False
+        return self._queued.pop(process.index, None) is not None
+
+    def clear(self):
+        for process, _ in list(self._queued.values()):
+            self.cancel(process)
+        self._port_waiter.close()
+
+    def on_spawned(self, process: Process):
+        if process.index not in self._starting:
+            return
+        if process.config.ports:
+            self._port_waiter.wait(process.index, process.config.ports)
+        else:
+            self.release(process)
+
+    def release(self, process: Process):
+        """the process is ready (or done), its slot goes to the next start"""
+        starting = self._starting.pop(process.index, None)
+        if not starting:
+            return
+        _, timeout_handle = starting
+        timeout_handle.cancel()
+        self._port_waiter.cancel(process.index)
+        if self._queued:
+            self._schedule_drain()
+
+    def _schedule_drain(self):
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            self._schedule(self._drain)
+
+    def _drain(self):
+        self._drain_scheduled = False
+        while self._heap and (not self.limited
+                              or len(self._starting) < self._max_concurrent):
+            _, _, index = heapq.heappop(self._heap)
+            entry = self._queued.pop(index, None)
+            if not entry:
+                continue
+            process, spawn = entry
+            process.start_queued = False
+            if self.limited:
+                timeout_handle = self._call_later(
+                    process.config.ready_timeout,
+                    lambda p=process: self._on_ready_timeout(p))
+                self._starting[index] = (process, timeout_handle)
+            try:
+                spawned = spawn()
+            except Exception as e:
+                logger.error(f'failed to start {process.name}: {e}')
+                spawned = False
+            if not spawned:
+                self.release(process)
+
+    def _on_ports_ready(self, index: int):
+        starting = self._starting.get(index)
+        if starting:
+            process, _ = starting
+            logger.info('%s is listening on its ports',
+                        process.name,
+                        extra=for_process(process.name))
+            self.release(process)
+
+    def _on_ready_timeout(self, process: Process):
+        if process.index in self._starting:
+            logger.info(
+                f'{process.name} is not ready after {process.config.ready_timeout}s, '
+                'giving up its start slot')
+            self.release(process)
@@ -0,0 +1,194 @@
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from procmux.config import ProcessConfig
+from procmux.log import logger
+from procmux.util.interpolation import Interpolation
+
+# path -> (mtime in ns, size, content digest)
+FileStats = Dict[str, Tuple[int, int, str]]
+
+_read_size = 1024 * 1024
+
+
+@dataclass
+class _Run:
+    fingerprint: str
+    files: FileStats = field(default_factory=dict)
+
+
+def _expand(cwd: str, patterns: List[str]) -> List[str]:
+    """the files matching the globs, directories stand for every file below them"""
+    paths = set()
+    for pattern in patterns:
+        for match in glob.glob(os.path.join(cwd, os.path.expanduser(pattern)),
+                               recursive=True):
+            if os.path.isdir(match):
+                for root, _, files in os.walk(match):
+                    paths.update(os.path.join(root, f) for f in files)
+            else:
+                paths.add(match)
+    return sorted(paths)
+
+
+def _digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_read_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TaskCache:
+    """
+    skips one-shot tasks (processes with `inputs`) whose inputs did not change since their last successful run.
+    an input is only read again when its mtime or size changed, the digests of the last successful run of
+    every task are persisted to tasks.json in the state dir.
+    runs on the event loop, the inputs are hashed on a worker thread. schedule must be safe to call from any thread.
+    """
+
+    _file_name = 'tasks.json'
+
+    def __init__(self, state_dir: Optional[str],
+                 schedule: Callable[[Callable[[], None]], Any]):
+        self._path: Optional[str] = os.path.join(
+            state_dir, self._file_name) if state_dir else None
+        self._schedule = schedule
+        self._runs: Optional[Dict[str, _Run]] = None
+        # the fingerprint of the inputs a running task was started with, recorded once it succeeds
+        self._started: Dict[str, _Run] = {}
+        # task name -> the token of the hashing in progress, a cancelled (or superseded) one is ignored
+        self._checks: Dict[str, object] = {}
+        self._hashing = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='procmux-task-cache')
+
+    def _load(self) -> Dict[str, _Run]:
+        if self._runs is None:
+            self._runs = {}
+            if self._path and os.path.exists(self._path):
+                try:
+                    with open(self._path) as f:
+                        self._runs = {
+                            name: _Run(run['fingerprint'], {
+                                path: tuple(stats)
+                                for path, stats in run['files'].items()
+                            })
+                            for name, run in json.load(f).items()
+                        }
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.error(
+                        f'failed to read the task cache from {self._path}: {e}')
+        return self._runs
+
+    def _save(self):
+        if not self._path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(
+                    {
+                        name: {
+                            'fingerprint': run.fingerprint,
+                            'files': run.files
+                        }
+                        for name, run in self._load().items()
+                    },
+                    f,
+                    sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f'failed to persist the task cache to {self._path}: {e}')
+
+    def _hash_inputs(self, process_config: ProcessConfig, cmd: List[str],
+                     known: FileStats) -> _Run:
+        run = _Run('')
+        h = hashlib.sha256(json.dumps(cmd).encode())
+        for path in _expand(process_config.cwd, process_config.inputs or []):
+            try:
+                stat = os.stat(path)
+                stats = known.get(path)
+                if not stats or stats[:2] != (stat.st_mtime_ns, stat.st_size):
+                    stats = (stat.st_mtime_ns, stat.st_size, _digest(path))
+            except OSError:
+                # removed in the meantime (or unreadable), it is not an input of this run
+                continue
+            run.files[path] = stats
+            h.update(f'\0{os.path.relpath(path, process_config.cwd)}\0{stats[2]}'.encode())
+        run.fingerprint = h.hexdigest()
+        return run
+
+    def start(self, name: str, process_config: ProcessConfig,
+              interpolations: Optional[List[Interpolation]],
+              done: Callable[[bool], None]) -> bool:
+        """
+        hashes the inputs of the task, done(up_to_date) is called on the event loop once they are. when it is not
+        up to date it is about to run with its current inputs.
+        returns False for processes without inputs (done is not called), they always run
+        """
+        self._started.pop(name, None)
+        self._checks.pop(name, None)
+        if not process_config.inputs:
+            return False
+        last = self._load().get(name)
+        # another command (or other field values) is another task
+        cmd = process_config.render_command(
+            {i.field: i.value
+             for i in interpolations or []})
+        known = last.files if last else {}
+        token = self._checks[name] = object()
+
+        def hash_inputs():
+            try:
+                run: Optional[_Run] = self._hash_inputs(process_config, cmd, known)
+                outputs_exist = all(
+                    _expand(process_config.cwd, [o])
+                    for o in process_config.outputs or [])
+            except Exception as e:
+                logger.error(f'failed to hash the inputs of {name}: {e}')
+                run, outputs_exist = None, False
+            self._schedule(lambda: self._on_hashed(name, token, last, run,
+                                                   outputs_exist, done))
+
+        self._hashing.submit(hash_inputs)
+        return True
+
+    def _on_hashed(self, name: str, token: object, last: Optional[_Run],
+                   run: Optional[_Run], outputs_exist: bool,
+                   done: Callable[[bool], None]):
+        if self._checks.get(name) is not token:
+            return
+        del self._checks[name]
+        if run and last and last.fingerprint == run.fingerprint and outputs_exist:
+            done(True)
+            return
+        if run:
+            self._started[name] = run
+        done(False)
+
+    def checking(self, name: str) -> bool:
+        return name in self._checks
+
+    def cancel(self, name: str) -> bool:
+        """drops the hashing of the inputs in progress (done is not called), returns whether there was one"""
+        return self._checks.pop(name, None) is not None
+
+    def close(self):
+        self._checks.clear()
+        self._hashing.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, name: str, succeeded: bool):
+        run = self._started.pop(name, None)
+        if not run:
+            return
+        if succeeded:
+            self._load()[name] = run
+        else:
+            self._load().pop(name, None)
+        self._save()
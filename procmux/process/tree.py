@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from procmux.log import for_process, logger
+from procmux.process.ports import OUTSIDE, ListeningPort, PortConflict, PortScanner, find_conflicts
+
+_clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_page_kb = (os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096) // 1024
+
+
+@dataclass
+class ProcInfo:
+    pid: int
+    ppid: int
+    command: str
+    start_time: int
+    cpu_ticks: int = 0
+    rss_kb: int = 0
+    # of a single core, since the previous refresh
+    cpu_percent: float = 0.0
+
+
+@dataclass
+class TreeNode:
+    info: ProcInfo
+    depth: int
+
+
+class ProcessTable:
+    """
+    an incrementally refreshed view of /proc (linux only, `available` is False elsewhere).
+    the ppid map is kept between refreshes: only pids that appeared (and the children of pids that
+    vanished, they get reparented) are read in full, the stat of the processes in the watched trees is
+    re-read every refresh for their cpu and rss.
+    """
+
+    def __init__(self, proc_dir: str = '/proc'):
+        self._proc_dir = proc_dir
+        self._procs: Dict[int, ProcInfo] = {}
+        self._children: Dict[int, List[int]] = {}
+        self._last_refresh: Optional[float] = None
+        self.available = os.path.isdir(os.path.join(proc_dir, 'self'))
+
+    def _read_stat(self, pid: int) -> Optional[List[str]]:
+        try:
+            with open(f'{self._proc_dir}/{pid}/stat', 'rb') as f:
+                stat = f.read().decode(errors='replace')
+        except OSError:
+            return None
+        # the command name is in parentheses and may contain spaces (or parentheses)
+        return [stat[stat.index('(') + 1:stat.rindex(')')]] + stat[stat.rindex(')') + 2:].split()
+
+    def _read_command(self, pid: int, name: str) -> str:
+        try:
+            with open(f'{self._proc_dir}/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read()
+        except OSError:
+            return name
+        return cmdline.replace(b'\0', b' ').decode(errors='replace').strip() or f'[{name}]'
+
+    def _read(self, pid: int) -> Optional[ProcInfo]:
+        stat = self._read_stat(pid)
+        if not stat:
+            return None
+        return ProcInfo(pid=pid,
+                        ppid=int(stat[2]),
+                        command=self._read_command(pid, stat[0]),
+                        start_time=int(stat[20]),
+                        cpu_ticks=int(stat[12]) + int(stat[13]),
+                        rss_kb=int(stat[22]) * _page_kb)
+
+    def _list_pids(self) -> Set[int]:
+        return {int(e.name) for e in os.scandir(self._proc_dir) if e.name.isdigit()}
+
+    def _rebuild_children(self):
+        children: Dict[int, List[int]] = {}
+        for info in self._procs.values():
+            children.setdefault(info.ppid, []).append(info.pid)
+        for pids in children.values():
+            pids.sort()
+        self._children = children
+
+    def refresh(self, roots: Iterable[int]):
+        if not self.available:
+            return
+        now = time.monotonic()
+        elapsed = now - self._last_refresh if self._last_refresh else 0.0
+        self._last_refresh = now
+
+        pids = self._list_pids()
+        vanished = self._procs.keys() - pids
+        to_read = pids - self._procs.keys()
+        for pid in vanished:
+            to_read.update(self._children.get(pid, ()))
+            del self._procs[pid]
+        for pid in to_read & pids:
+            info = self._read(pid)
+            if info:
+                self._procs[pid] = info
+        if vanished or to_read:
+            self._rebuild_children()
+
+        reused = False
+        for root in roots:
+            for pid in self._walk_pids(root):
+                reused |= self._update_usage(pid, elapsed)
+        if reused:
+            self._rebuild_children()
+
+    def _update_usage(self, pid: int, elapsed: float) -> bool:
+        """returns True when the pid turned out to be reused"""
+        info = self._procs.get(pid)
+        stat = self._read_stat(pid)
+        if not info or not stat:
+            return False
+        if int(stat[20]) != info.start_time:
+            new_info = self._read(pid)
+            if new_info:
+                self._procs[pid] = new_info
+            return True
+        cpu_ticks = int(stat[12]) + int(stat[13])
+        if elapsed:
+            info.cpu_percent = (cpu_ticks - info.cpu_ticks) / _clock_ticks / elapsed * 100
+        info.cpu_ticks = cpu_ticks
+        info.rss_kb = int(stat[22]) * _page_kb
+        return False
+
+    def _walk_pids(self, root: int) -> List[int]:
+        pids = []
+        stack = [root]
+        while stack:
+            pid = stack.pop()
+            if pid in self._procs:
+                pids.append(pid)
+                stack.extend(self._children.get(pid, ()))
+        return pids
+
+    def tree(self, root: int) -> List[TreeNode]:
+        """the root and all of its descendants, depth first. the nodes are copies, safe to hand to another thread"""
+        nodes = []
+        stack = [(root, 0)]
+        while stack:
+            pid, depth = stack.pop()
+            info = self._procs.get(pid)
+            if not info:
+                continue
+            nodes.append(TreeNode(replace(info), depth))
+            stack.extend((child, depth + 1) for child in reversed(self._children.get(pid, ())))
+        return nodes
+
+
+class ProcessTreeWatcher:
+    """
+    refreshes a ProcessTable (and the ports the trees listen on) on a background thread,
+    so scanning /proc never runs on the event loop
+    """
+
+    def __init__(self,
+                 get_roots: Callable[[], Dict[int, str]],
+                 get_declared_ports: Callable[[], Dict[str, List[int]]],
+                 on_update: Callable[[], None],
+                 interval: float = 1.0):
+        """get_roots returns the pids of the running managed processes mapped to their names"""
+        self._get_roots = get_roots
+        self._get_declared_ports = get_declared_ports
+        self._on_update = on_update
+        self._interval = interval
+        self._table = ProcessTable()
+        self._port_scanner = PortScanner()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # changes of the trees (cpu, rss) only call on_update while they are shown
+        self.show_trees = False
+        # the following are replaced as a whole on every refresh.
+        # root pid -> tree
+        self.trees: Dict[int, List[TreeNode]] = {}
+        # root pid -> ports listened on by any process in its tree
+        self.ports: Dict[int, List[ListeningPort]] = {}
+        self.conflicts: List[PortConflict] = []
+
+    @property
+    def available(self) -> bool:
+        return self._table.available
+
+    def start(self):
+        if self._thread or not self.available:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch,
+                                        name='procmux-process-tree',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop_event.set()
+            self._wake_event.set()
+            self._thread.join(1)
+            self._thread = None
+
+    def refresh_soon(self):
+        """refreshes without waiting for the rest of the interval"""
+        self._wake_event.set()
+
+    def refresh(self):
+        roots = self._get_roots()
+        self._table.refresh(roots)
+        trees = {root: self._table.tree(root) for root in roots}
+
+        pid_ports = self._port_scanner.scan(node.info.pid
+                                            for tree in trees.values()
+                                            for node in tree)
+        ports = {
+            root: sorted({p for node in tree for p in pid_ports.get(node.info.pid, ())},
+                         key=lambda p: (p.port, p.protocol))
+            for root, tree in trees.items()
+        }
+        named_ports: Dict[Optional[str], List[ListeningPort]] = {
+            roots[root]: root_ports for root, root_ports in ports.items()
+        }
+        named_ports[None] = pid_ports.get(OUTSIDE, [])
+        conflicts = find_conflicts(self._get_declared_ports(), named_ports)
+        for conflict in set(conflicts) - set(self.conflicts):
+            # shown next to the process as well, the log only records when it started
+            logger.info('port conflict: %s',
+                        conflict,
+                        extra=for_process(conflict.process) if conflict.process else None)
+
+        changed = ports != self.ports or conflicts != self.conflicts or (
+            self.show_trees and trees != self.trees)
+        self.trees, self.ports, self.conflicts = trees, ports, conflicts
+        if changed:
+            self._on_update()
+
+    def _watch(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f'failed to refresh the process tree: {e}')
+            self._wake_event.wait(self._interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                return
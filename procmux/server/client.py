@@ -1,5 +1,6 @@
 import http.client
 import json
+from typing import Dict, Optional
 from urllib.parse import quote
 
 from procmux.config import ProcMuxConfig
@@ -25,10 +26,22 @@ class SignalClient:
             return body_json['error']
         return body.decode()
 
-    def restart_process(self, name: str):
+    def _field_values_request_args(self,
+                                   field_values: Optional[Dict[str, str]]) -> dict:
+        if not field_values:
+            return {}
+        return {
+            "body": json.dumps(field_values).encode(),
+            "headers": {"Content-Type": "application/json"},
+        }
+
+    def restart_process(self,
+                        name: str,
+                        field_values: Optional[Dict[str, str]] = None):
         name = quote(name)
         conn = http.client.HTTPConnection(self._base_url, self._port)
-        conn.request("POST", f"/restart-by-name/{name}")
+        conn.request("POST", f"/restart-by-name/{name}",
+                     **self._field_values_request_args(field_values))
         response = conn.getresponse()
         if response.status != 200:
             raise ValueError(
@@ -67,10 +80,13 @@ class SignalClient:
             )
         conn.close()
 
-    def start_process(self, name: str):
+    def start_process(self,
+                      name: str,
+                      field_values: Optional[Dict[str, str]] = None):
         name = quote(name)
         conn = http.client.HTTPConnection(self._base_url, self._port)
-        conn.request("POST", f"/start-by-name/{name}")
+        conn.request("POST", f"/start-by-name/{name}",
+                     **self._field_values_request_args(field_values))
         response = conn.getresponse()
         if response.status != 200:
             raise ValueError(
@@ -89,3 +105,27 @@ class SignalClient:
         data = response.read()
         conn.close()
         return data
+
+    def get_timings(self) -> dict:
+        conn = http.client.HTTPConnection(self._base_url, self._port)
+        conn.request("GET", "/timings")
+        response = conn.getresponse()
+        if response.status != 200:
+            raise ValueError(
+                f"Failed to get timings: {response.status} {self._get_error_message(response)}"
+            )
+        data = json.loads(response.read().decode())
+        conn.close()
+        return data["timings"]
+
+    def get_loop_stats(self) -> dict:
+        conn = http.client.HTTPConnection(self._base_url, self._port)
+        conn.request("GET", "/loop")
+        response = conn.getresponse()
+        if response.status != 200:
+            raise ValueError(
+                f"Failed to get event loop stats: {response.status} {self._get_error_message(response)}"
+            )
+        data = json.loads(response.read().decode())
+        conn.close()
+        return data["loop"]
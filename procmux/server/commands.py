@@ -0,0 +1,93 @@
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from procmux.log import logger
+from procmux.tui.types import Process
+from procmux.util.interpolation import Interpolation
+from procmux.util.loop_monitor import loop_monitor
+
+
+@dataclass
+class StartProcess:
+    process: Process
+    interpolations: Optional[List[Interpolation]] = None
+
+
+@dataclass
+class StopProcess:
+    process: Process
+
+
+@dataclass
+class RestartProcess:
+    """restart_strategy: overlap, the new instance replaces the old one once it is ready (started when not running)"""
+    process: Process
+    interpolations: Optional[List[Interpolation]] = None
+
+
+@dataclass
+class ReadState:
+    """runs read on the event loop, for state only the loop may touch (IE: a terminal's screen). no redraw follows"""
+    read: Callable[[], Any]
+
+
+Command = Union[StartProcess, StopProcess, RestartProcess, ReadState]
+
+
+class CommandQueue:
+    """
+    hands the signal server's commands over to the event loop, the only thread that may touch
+    the processes and the UI. every command submitted until the loop gets around to it is
+    applied in the same pass, followed by a single on_batch_done (IE: one redraw).
+    ReadState commands are run by the queue itself.
+    """
+
+    def __init__(self,
+                 schedule: Callable[[Callable[[], None]], None],
+                 execute: Callable[[Command], Any],
+                 on_batch_done: Optional[Callable[[], None]] = None):
+        self._schedule = schedule
+        self._execute = execute
+        self._on_batch_done = on_batch_done
+        self._queue: 'queue.SimpleQueue[Tuple[Command, Future]]' = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._drain_scheduled = False
+
+    def submit(self, command: Command) -> Future:
+        """thread safe, the future resolves with whatever executing the command returned"""
+        future: Future = Future()
+        self._queue.put((command, future))
+        with self._lock:
+            if self._drain_scheduled:
+                return future
+            self._drain_scheduled = True
+        self._schedule(self.drain)
+        return future
+
+    @loop_monitor.tracked('server.commands')
+    def drain(self):
+        with self._lock:
+            # anything submitted from here on schedules another drain
+            self._drain_scheduled = False
+        executed = 0
+        while True:
+            try:
+                command, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if isinstance(command, ReadState):
+                    future.set_result(command.read())
+                    continue
+                executed += 1
+                future.set_result(self._execute(command))
+            except Exception as e:
+                logger.error(f'failed to execute {command}: {e}')
+                future.set_exception(e)
+        if executed and self._on_batch_done:
+            self._on_batch_done()
@@ -0,0 +1,256 @@
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from procmux.config import PeerConfig
+from procmux.log import logger
+
+# seconds the peer holds a poll of its process list / of the output of a process before answering unchanged.
+# the output poll is kept short, a newly selected process is only picked up once the held poll returns
+processes_poll_timeout = 20
+output_poll_timeout = 5
+# seconds before reconnecting to an unreachable peer, doubled (up to the max) while it stays unreachable
+retry_delay = 1.0
+max_retry_delay = 30.0
+# on top of the time a poll is held
+request_timeout = 5
+
+
+class PeerError(Exception):
+    pass
+
+
+class _ConnectionPool:
+    """keep-alive connections to one peer, shared by every thread that talks to it"""
+
+    def __init__(self, host: str, port: int):
+        self._host = host
+        self._port = port
+        self._idle: List[http.client.HTTPConnection] = []
+        self._in_use: Set[http.client.HTTPConnection] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """returns a connection and whether it was used before"""
+        with self._lock:
+            if self._closed:
+                raise PeerError('the connection pool is closed')
+            conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            if not conn:
+                conn = http.client.HTTPConnection(self._host, self._port)
+            self._in_use.add(conn)
+        return conn, reused
+
+    def _release(self, conn: http.client.HTTPConnection, keep: bool):
+        with self._lock:
+            self._in_use.discard(conn)
+            if keep and not self._closed:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def request(self,
+                method: str,
+                path: str,
+                body: Optional[bytes] = None,
+                timeout: float = request_timeout
+                ) -> Tuple[int, Optional[str], bytes]:
+        """returns the status, the etag and the body of the response"""
+        headers = {"Content-Type": "application/json"} if body else {}
+        while True:
+            conn, reused = self._acquire()
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except socket.timeout:
+                self._release(conn, keep=False)
+                raise
+            except (OSError, http.client.HTTPException):
+                self._release(conn, keep=False)
+                # the peer may have closed an idle connection in the meantime, that is retried on a new one
+                if reused:
+                    continue
+                raise
+            self._release(conn, keep=not response.will_close)
+            return response.status, response.getheader('ETag'), data
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            connections = [*self._idle, *self._in_use]
+            self._idle = []
+        for conn in connections:
+            # wakes up a thread blocked on a held poll
+            if conn.sock:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            conn.close()
+
+
+def _error_message(status: int, data: bytes) -> str:
+    try:
+        return f'{status} {json.loads(data.decode())["error"]}'
+    except (ValueError, KeyError, TypeError):
+        return f'{status} {data.decode(errors="replace")}'
+
+
+class PeerClient:
+    """
+    a live view of another procmux instance through its signal server.
+    the process list (and the output of the process being tailed) are long polled on background threads and
+    start/stop/restart are sent from a worker thread, so a slow or unreachable peer never blocks the caller.
+    the callbacks are called on those threads.
+    """
+
+    def __init__(self, name: str, config: PeerConfig,
+                 on_processes: Callable[[Optional[List[Dict[str, Any]]]], None],
+                 on_output: Callable[[str, str], None]):
+        """
+        on_processes gets the peer's process list whenever it changes, None when the peer became unreachable.
+        on_output gets the name of the tailed process and its output whenever that changes.
+        """
+        self.name = name
+        self._pool = _ConnectionPool(config.host, config.port)
+        self._on_processes = on_processes
+        self._on_output = on_output
+        self._stop_event = threading.Event()
+        self._tail_event = threading.Event()
+        self._tailed: Optional[str] = None
+        self._reachable: Optional[bool] = None
+        self._commands = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f'procmux-peer-{name}')
+
+    def start(self):
+        for target, kind in ((self._poll_processes, 'processes'),
+                             (self._poll_output, 'output')):
+            threading.Thread(target=target,
+                             name=f'procmux-peer-{self.name}-{kind}',
+                             daemon=True).start()
+
+    def close(self):
+        self._stop_event.set()
+        self._tail_event.set()
+        self._commands.shutdown(wait=False)
+        self._pool.close()
+
+    def tail(self, process_name: Optional[str]):
+        """follows the output of one of the peer's processes (None to stop)"""
+        if process_name == self._tailed:
+            return
+        self._tailed = process_name
+        self._tail_event.set()
+        if process_name and not self._stop_event.is_set():
+            # shown right away, the poll thread may still be held on the previously tailed process
+            self._commands.submit(self._fetch_output, process_name)
+
+    def start_process(self, process_name: str,
+                      field_values: Optional[Dict[str, str]] = None) -> Future:
+        return self._commands.submit(
+            self._post, f'/start-by-name/{quote(process_name)}', field_values)
+
+    def stop_process(self, process_name: str) -> Future:
+        return self._commands.submit(self._post,
+                                     f'/stop-by-name/{quote(process_name)}')
+
+    def restart_process(self, process_name: str,
+                        field_values: Optional[Dict[str, str]] = None) -> Future:
+        return self._commands.submit(
+            self._post, f'/restart-by-name/{quote(process_name)}', field_values)
+
+    def _post(self, path: str, field_values: Optional[Dict[str, str]] = None):
+        body = json.dumps(field_values).encode() if field_values else None
+        status, _, data = self._pool.request('POST', path, body)
+        if status != 200:
+            raise PeerError(_error_message(status, data))
+
+    def _get(self, path: str, etag: Optional[str],
+             hold: float) -> Tuple[Optional[str], Dict[str, Any]]:
+        if etag:
+            path = f'{path}?wait={quote(etag)}&timeout={hold}'
+        status, new_etag, data = self._pool.request('GET', path,
+                                                    timeout=hold + request_timeout)
+        if status != 200:
+            raise PeerError(_error_message(status, data))
+        return new_etag, json.loads(data.decode())
+
+    def _set_reachable(self, reachable: bool, reason: str = ''):
+        # called on every poll, only the transitions are logged
+        if reachable == self._reachable:
+            return
+        was_reachable = self._reachable
+        self._reachable = reachable
+        if reachable:
+            logger.info('connected to peer %s', self.name)
+            # the output poll backs off while the peer is unreachable
+            self._tail_event.set()
+        else:
+            if was_reachable:
+                logger.warning('peer %s became unreachable: %s', self.name, reason)
+            else:
+                logger.info('peer %s is not reachable: %s', self.name, reason)
+            self._on_processes(None)
+
+    def _poll_processes(self):
+        etag = None
+        delay = retry_delay
+        while not self._stop_event.is_set():
+            try:
+                new_etag, body = self._get('/', etag, processes_poll_timeout)
+            except (OSError, ValueError, http.client.HTTPException, PeerError) as e:
+                if self._stop_event.is_set():
+                    return
+                self._set_reachable(False, str(e))
+                etag = None
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, max_retry_delay)
+                continue
+            delay = retry_delay
+            self._set_reachable(True)
+            if new_etag != etag:
+                etag = new_etag
+                self._on_processes(body['process_list'])
+
+    def _fetch_output(self, process_name: str):
+        try:
+            _, body = self._get(f'/output/{quote(process_name)}', None, 0)
+        except (OSError, ValueError, http.client.HTTPException, PeerError) as e:
+            if self._reachable:
+                logger.info('failed to get the output of %s from peer %s: %s', process_name, self.name, e)
+            return
+        if self._tailed == process_name:
+            self._on_output(process_name, body['output'])
+
+    def _poll_output(self):
+        etag = None
+        tailed = None
+        while not self._stop_event.is_set():
+            self._tail_event.clear()
+            if self._tailed != tailed:
+                tailed, etag = self._tailed, None
+            if not tailed:
+                self._tail_event.wait()
+                continue
+            try:
+                new_etag, body = self._get(f'/output/{quote(tailed)}', etag,
+                                           output_poll_timeout)
+            except (OSError, ValueError, http.client.HTTPException, PeerError):
+                # the process list poll reports the peer being unreachable, retried when that changes
+                etag = None
+                self._tail_event.wait(max_retry_delay if not self._reachable else retry_delay)
+                continue
+            if new_etag != etag:
+                etag = new_etag
+                if self._tailed == tailed:
+                    self._on_output(tailed, body['output'])
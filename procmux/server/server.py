@@ -1,196 +1,476 @@
 import http.server
 import json
+import socket
 import socketserver
 import threading
+import zlib
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import asdict
 from http import HTTPStatus
 from time import sleep, time
-from typing import Any, Callable, Dict, Optional, Tuple, Union
-from urllib.parse import unquote
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlsplit
 
 from procmux.config import ProcMuxConfig
 from procmux.log import logger
-from procmux.tui.controller.terminal_controller import TerminalController
+from procmux.process.controller import ProcessController
+from procmux.process.tree import ProcessTreeWatcher
+from procmux.server.commands import CommandQueue, ReadState, RestartProcess, StartProcess, StopProcess
+from procmux.tui.state.interpolation_state import InterpolationState
 from procmux.tui.state.process_state import ProcessState
 from procmux.tui.types import Process
+from procmux.util.interpolation import Interpolation
+from procmux.util.loop_monitor import loop_monitor
+from procmux.util.timing import timings
 
 # Timeout (in seconds) for restarting a process
 # maybe this can come from a query parameter later on
 timeout = 5
 
+# number of trailing output lines returned by GET /output/<name>
+output_tail_lines = 200
+
+# longest a GET with ?wait=<etag> is held (in seconds), and how often the held response is rebuilt
+long_poll_timeout = 25
+long_poll_interval = 0.2
+
+# routes that get their own timing histogram, anything else is recorded as "unknown"
+_timed_routes = {
+    '', 'output', 'timings', 'loop', 'stop-by-name', 'start-by-name',
+    'restart-by-name', 'restart-running', 'stop-running'
+}
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # kept alive connections outlive serve_forever, they are closed on stop
+        self._connections: set = set()
+        self._connections_lock = threading.Lock()
+        self.closing = False
+
+    def process_request(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._connections_lock:
+            self._connections.discard(request)
+        super().shutdown_request(request)
+
+    def close_connections(self):
+        self.closing = True
+        with self._connections_lock:
+            connections = list(self._connections)
+        for request in connections:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle_error(self, request, client_address):
+        # the default prints a traceback to stderr, right over the TUI
+        logger.info(f'signal server connection from {client_address} failed',
+                    exc_info=True)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{zlib.crc32(body):08x}"'
+
 
 def start_server(
     cfg: ProcMuxConfig,
     process_state: ProcessState,
-    terminal_controllers: Dict[int, TerminalController],
-    start_process_callback: Callable[[Process], None],
+    terminal_controllers: Dict[int, ProcessController],
+    commands: CommandQueue,
+    interpolation_state: InterpolationState,
+    process_tree_watcher: Optional[ProcessTreeWatcher] = None,
 ):
+    """
+    the handlers only read state on the server threads, everything that starts or stops
+    a process is submitted to the commands queue and applied by the event loop.
+    only local processes are served, the entries of peers (see PeerClient) are skipped
+    """
 
     active_httpd = None
 
     def _start_server():
 
         class SignalServer(http.server.SimpleHTTPRequestHandler):
+            # keep-alive, peers keep their connections open between polls
+            protocol_version = 'HTTP/1.1'
 
             def __init__(self, request: bytes, client_address: Tuple[str, int],
                          server: socketserver.BaseServer):
                 super().__init__(request, client_address, server)
 
             def log_error(self, _format: str, *args: Any) -> None:
-                logger.error(*args)
-                pass
+                logger.error(_format, *args)
 
             def log_request(self,
                             code: Union[str, int] = "-",
                             size: Union[str, int] = "-") -> None:
-                logger.info(f"Request: {self.path} {code} {size}")
+                logger.info("Request: %s %s %s", self.path, code, size)
 
             def log_message(self, _format: str, *args: Any) -> None:
-                logger.info.format(*args)
+                logger.info(_format, *args)
 
-            def _send_ok(self, body: bytes):
+            def _send_ok(self, body: bytes, etag: Optional[str] = None):
                 self.send_response(HTTPStatus.OK)
                 self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
                 self.end_headers()
                 self.wfile.write(body)
 
             def _send_error(self, code: int, message: str):
+                body = json.dumps({"error": message}).encode()
                 self.send_response(code)
                 self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
                 self.end_headers()
-                self.wfile.write(json.dumps({"error": message}).encode())
+                self.wfile.write(body)
+
+            def _send_when_changed(self, build_body: Callable[[], bytes]):
+                """
+                long polling: a request with ?wait=<etag> is held until the body no longer has that
+                etag (or for `timeout` seconds at most), so a peer learns about changes right away
+                without asking over and over. the body is built on the event loop, which writes the
+                state it is built from (IE: a terminal's screen)
+                """
+                try:
+                    self._send_ok(*self._await_body(build_body))
+                except FutureTimeoutError:
+                    self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                     "Timed out waiting for the event loop")
+
+            def _await_body(self, build_body: Callable[[], bytes]) -> Tuple[bytes, str]:
+                def build() -> bytes:
+                    return commands.submit(ReadState(build_body)).result(timeout)
+
+                body = build()
+                wait = self.query.get('wait', [None])[0]
+                if wait:
+                    try:
+                        wait_timeout = min(float(self.query['timeout'][0]),
+                                           long_poll_timeout)
+                    except (KeyError, ValueError):
+                        wait_timeout = long_poll_timeout
+                    deadline = time() + wait_timeout
+                    while _etag(body) == wait and time() < deadline and not self.server.closing:
+                        sleep(long_poll_interval)
+                        body = build()
+                return body, _etag(body)
+
+            def _await_commands(self, futures: List[Future]) -> bool:
+                """
+                returns False (after sending a 500) when a command failed or the event loop did not get to it in time
+                """
+                try:
+                    for future in futures:
+                        future.result(timeout)
+                except FutureTimeoutError:
+                    self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                     "Timed out waiting for the event loop")
+                    return False
+                except Exception as e:
+                    self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+                    return False
+                return True
+
+            def _read_field_values(self) -> Dict[str, str]:
+                content_length = int(self.headers.get('Content-Length') or 0)
+                if not content_length:
+                    return {}
+                body = json.loads(self.rfile.read(content_length).decode())
+                if not isinstance(body, dict):
+                    raise ValueError(
+                        'request body must be a JSON object of field names to values'
+                    )
+                return {str(k): str(v) for k, v in body.items()}
+
+            def _resolve_interpolations(
+                self,
+                process: Process,
+                overrides: Optional[Dict[str, str]] = None
+            ) -> Optional[List[Interpolation]]:
+                """
+                returns None (after sending a 400) when a field has no provided,
+                remembered or default value
+                """
+                if not process.config.interpolations:
+                    return []
+                interpolations, missing = interpolation_state.resolve(
+                    process.name, process.config.interpolations, overrides)
+                if missing:
+                    self._send_error(
+                        HTTPStatus.BAD_REQUEST,
+                        f'Process requires values for fields: {", ".join(missing)}'
+                    )
+                    return None
+                return interpolations
+
+            def _local_processes(self) -> List[Process]:
+                return [p for p in process_state.process_list if not p.peer]
 
             def _identify_process_by_name(self) -> Optional[Process]:
-                name = self.path.split('/')[-1]
-                name = unquote(name)
+                # the name is everything after the route, the name of a peer entry contains a slash
+                name = unquote(self.route.split('/', 2)[-1])
                 for process in process_state.process_list:
                     if process.name == name:
                         return process
                 return None
 
-            def handle_get_process_list(self):
+            def _get_last_exit(self, process: Process) -> Optional[Dict[str, Any]]:
+                terminal_controller = terminal_controllers.get(process.index)
+                if not terminal_controller or not terminal_controller.last_exit:
+                    return None
+                return asdict(terminal_controller.last_exit)
+
+            def _get_ports(self, process: Process) -> List[str]:
+                terminal_controller = terminal_controllers.get(process.index)
+                if not process_tree_watcher or not terminal_controller:
+                    return []
+                return [
+                    str(p) for p in process_tree_watcher.ports.get(
+                        terminal_controller.pid, [])
+                ]
+
+            def _build_process_list(self) -> bytes:
                 process_list = [{
                     "name": p.name,
                     "running": p.running,
+                    "up_to_date": p.up_to_date,
                     "index": p.index,
-                    "scroll_mode": p.scroll_mode
-                } for p in process_state.process_list]
-                resp = json.dumps({"process_list": process_list}).encode()
-                self._send_ok(bytes(resp))
+                    "scroll_mode": p.scroll_mode,
+                    "last_exit": self._get_last_exit(p),
+                    "ports": self._get_ports(p)
+                } for p in self._local_processes()]
+                port_conflicts = [
+                    str(c) for c in process_tree_watcher.conflicts
+                ] if process_tree_watcher else []
+                return json.dumps({
+                    "process_list": process_list,
+                    "port_conflicts": port_conflicts
+                }).encode()
+
+            def handle_get_process_list(self):
+                self._send_when_changed(self._build_process_list)
+
+            def handle_get_output_by_name(self):
+                process = self._identify_process_by_name()
+                if process and not process.peer:
+
+                    def build_output() -> bytes:
+                        # the TUI only creates a terminal controller once a process is first started
+                        terminal_controller = terminal_controllers.get(
+                            process.index)
+                        output = terminal_controller.get_output_tail(
+                            output_tail_lines) if terminal_controller else ''
+                        return json.dumps({
+                            "name": process.name,
+                            "running": process.running,
+                            "output": output
+                        }).encode()
+
+                    self._send_when_changed(build_output)
+                    return
+                self._send_error(HTTPStatus.NOT_FOUND, "Process not found")
 
             def handle_stop_by_name(self):
                 process = self._identify_process_by_name()
                 if process:
-                    terminal_controller = terminal_controllers.get(
-                        process.index)
-                    if terminal_controller:
-                        terminal_controller.stop_process()
+                    if self._await_commands(
+                            [commands.submit(StopProcess(process))]):
                         self._send_ok(b'{}')
-                        return
+                    return
                 self._send_error(HTTPStatus.NOT_FOUND, "Process not found")
 
             def handle_start_by_name(self):
+                try:
+                    field_values = self._read_field_values()
+                except ValueError as e:
+                    self._send_error(HTTPStatus.BAD_REQUEST,
+                                     f'Invalid request body: {e}')
+                    return
                 process = self._identify_process_by_name()
                 if process:
-                    if process.config.interpolations:
-                        self._send_error(
-                            HTTPStatus.BAD_REQUEST,
-                            'Process requires interpolations, it cannot be remotely signaled to start'
-                        )
+                    interpolations = self._resolve_interpolations(
+                        process, field_values)
+                    if interpolations is None:
                         return
 
-                    start_process_callback(process)
-                    self._send_ok(b'{}')
+                    if self._await_commands(
+                            [commands.submit(StartProcess(process, interpolations))]):
+                        self._send_ok(b'{}')
                     return
                 self._send_error(HTTPStatus.NOT_FOUND, "Process not found")
 
             def _wait_for_process_stop(
-                    self, terminal_controller: TerminalController):
+                    self, *process_controllers: ProcessController):
                 start_time = time()
-                while terminal_controller.is_running:
+                while any(c.is_running for c in process_controllers):
                     if time() - start_time > timeout:
                         raise TimeoutError("Failed to stop process")
                     sleep(0.1)
 
             def handle_restart_by_name(self):
+                try:
+                    field_values = self._read_field_values()
+                except ValueError as e:
+                    self._send_error(HTTPStatus.BAD_REQUEST,
+                                     f'Invalid request body: {e}')
+                    return
                 process = self._identify_process_by_name()
                 if process:
-                    if process.config.interpolations:
-                        self._send_error(
-                            HTTPStatus.BAD_REQUEST,
-                            'Process requires interpolations, it cannot be remotely signaled to start'
-                        )
+                    interpolations = self._resolve_interpolations(
+                        process, field_values)
+                    if interpolations is None:
+                        return
 
+                    if process.config.restart_strategy == 'overlap':
+                        # answered once the new instance runs, the old one is stopped when the new one is ready
+                        if self._await_commands([
+                                commands.submit(
+                                    RestartProcess(process, interpolations))
+                        ]):
+                            self._send_ok(b'{}')
+                        return
+                    # the TUI only creates a terminal controller once a process is first started
                     terminal_controller = terminal_controllers.get(
                         process.index)
                     if terminal_controller:
-                        terminal_controller.stop_process()
+                        if not self._await_commands(
+                                [commands.submit(StopProcess(process))]):
+                            return
                         try:
                             self._wait_for_process_stop(terminal_controller)
                         except TimeoutError:
                             self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
                                              "Failed to stop process")
                             return
-                        start_process_callback(process)
+                    if self._await_commands([
+                        commands.submit(
+                            StartProcess(process, interpolations))
+                    ]):
                         self._send_ok(b'{}')
-                        return
+                    return
                 self._send_error(HTTPStatus.NOT_FOUND, "Process not found")
 
             def handle_restart_running(self):
-                running_processes = [
-                    p for p in process_state.process_list
-                    if p.running and not p.config.interpolations
-                ]
-                for process in running_processes:
-                    if process.running:
-                        terminal_controller = terminal_controllers.get(
-                            process.index)
-                        if terminal_controller:
-                            terminal_controller.stop_process()
-                            try:
-                                self._wait_for_process_stop(
-                                    terminal_controller)
-                            except TimeoutError:
-                                self._send_error(
-                                    HTTPStatus.INTERNAL_SERVER_ERROR,
-                                    "Failed to stop process")
-                                return
-                            start_process_callback(process)
-                self._send_ok(b'{}')
+                restarts = []
+                for process in self._local_processes():
+                    if not process.running or process.index not in terminal_controllers:
+                        continue
+                    interpolations, missing = interpolation_state.resolve(
+                        process.name, process.config.interpolations)
+                    if missing:
+                        logger.info(
+                            f'skipping restart of {process.name}, no values for fields: {missing}'
+                        )
+                        continue
+                    restarts.append((process, interpolations))
+                overlaps = [(p, i) for p, i in restarts
+                            if p.config.restart_strategy == 'overlap']
+                restarts = [(p, i) for p, i in restarts
+                            if p.config.restart_strategy != 'overlap']
+                # every stop is applied in one pass of the event loop, then every start
+                if not self._await_commands([
+                        commands.submit(StopProcess(process))
+                        for process, _ in restarts
+                ]):
+                    return
+                try:
+                    self._wait_for_process_stop(*[
+                        terminal_controllers[process.index]
+                        for process, _ in restarts
+                    ])
+                except TimeoutError:
+                    self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                     "Failed to stop process")
+                    return
+                if self._await_commands([
+                        commands.submit(StartProcess(process, interpolations))
+                        for process, interpolations in restarts
+                ] + [
+                        commands.submit(RestartProcess(process, interpolations))
+                        for process, interpolations in overlaps
+                ]):
+                    self._send_ok(b'{}')
 
             def handle_stop_running(self):
-                running_processes = [
-                    p for p in process_state.process_list if p.running
-                ]
-                for process in running_processes:
-                    terminal_controller = terminal_controllers.get(
-                        process.index)
-                    if terminal_controller:
-                        terminal_controller.stop_process()
-                self._send_ok(b'{}')
+                if self._await_commands([
+                        commands.submit(StopProcess(p))
+                        for p in self._local_processes()
+                        if p.running and p.index in terminal_controllers
+                ]):
+                    self._send_ok(b'{}')
+
+            def handle_get_timings(self):
+                self._send_ok(json.dumps({"timings": timings.snapshot()}).encode())
+
+            def handle_get_loop(self):
+                self._send_ok(json.dumps({"loop": loop_monitor.snapshot()}).encode())
+
+            def _parse_path(self):
+                url = urlsplit(self.path)
+                self.route = url.path
+                self.query = parse_qs(url.query)
+
+            def _timer_name(self) -> str:
+                route = self.route.split('/')[1]
+                if route not in _timed_routes:
+                    route = 'unknown'
+                if 'wait' in self.query:
+                    # held long polls would swamp the latencies of the plain requests
+                    return f'server.{self.command} /{route} (long poll)'
+                return f'server.{self.command} /{route}'
 
             def do_GET(self):
-                if self.path == '/':
+                self._parse_path()
+                with timings.measure(self._timer_name()):
+                    self._do_GET()
+
+            def do_POST(self):
+                self._parse_path()
+                with timings.measure(self._timer_name()):
+                    self._do_POST()
+
+            def _do_GET(self):
+                if self.route == '/':
                     self.handle_get_process_list()
+                elif self.route.startswith('/output/'):
+                    self.handle_get_output_by_name()
+                elif self.route == '/timings':
+                    self.handle_get_timings()
+                elif self.route == '/loop':
+                    self.handle_get_loop()
                 else:
                     self._send_error(HTTPStatus.NOT_FOUND,
                                      "Endpoint not found")
 
-            def do_POST(self):
-                if self.path.startswith('/stop-by-name/'):
+            def _do_POST(self):
+                if self.route.startswith('/stop-by-name/'):
                     self.handle_stop_by_name()
-                elif self.path.startswith('/start-by-name/'):
+                elif self.route.startswith('/start-by-name/'):
                     self.handle_start_by_name()
-                elif self.path.startswith('/restart-by-name/'):
+                elif self.route.startswith('/restart-by-name/'):
                     self.handle_restart_by_name()
-                elif self.path.startswith('/restart-running'):
+                elif self.route.startswith('/restart-running'):
                     self.handle_restart_running()
-                elif self.path.startswith('/stop-running'):
+                elif self.route.startswith('/stop-running'):
                     self.handle_stop_running()
                 else:
                     self._send_error(HTTPStatus.NOT_FOUND,
                                      "Endpoint not found")
 
-        with socketserver.TCPServer(
+        # threaded, a held long poll must not keep other requests waiting
+        with _ThreadingServer(
             (cfg.signal_server.host, cfg.signal_server.port),
                 SignalServer) as httpd:
             nonlocal active_httpd
@@ -210,6 +490,7 @@ def start_server(
         def stop(self):
             if active_httpd:
                 active_httpd.shutdown()
+                active_httpd.close_connections()
             if self.thread:
                 self.thread.join(5)
 
@@ -0,0 +1,52 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from procmux.log import logger
+
+
+def is_supervisor_listening(socket_path: str) -> bool:
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def ensure_supervisor(socket_path: str,
+                      config_file: str,
+                      config_override: Optional[str] = None,
+                      timeout: float = 10.0):
+    """starts a detached `procmux serve --socket` unless a supervisor is already listening"""
+    if is_supervisor_listening(socket_path):
+        return
+    cmd = [
+        sys.executable, '-m', 'procmux.main', 'serve', '--config',
+        os.path.abspath(config_file), '--socket', socket_path
+    ]
+    if config_override:
+        cmd.extend(['--config-override', os.path.abspath(config_override)])
+    logger.info(f'starting a supervisor: {cmd}')
+    # a new session keeps the supervisor (and its processes) alive after the terminal closes
+    supervisor = subprocess.Popen(cmd,
+                                  stdin=subprocess.DEVNULL,
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL,
+                                  start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_supervisor_listening(socket_path):
+            return
+        if supervisor.poll() is not None:
+            raise RuntimeError(
+                f'the supervisor exited with code {supervisor.returncode} before listening on {socket_path}'
+            )
+        time.sleep(0.05)
+    raise RuntimeError(
+        f'the supervisor did not listen on {socket_path} within {timeout}s')
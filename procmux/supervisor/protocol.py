@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import pyte
+
+from procmux.config import ProcMuxConfig
+
+# messages are single line JSON objects with a "type" key, one per line.
+#
+# viewer -> supervisor:
+#   {"type": "start", "name": ..., "values": {field: value}}
+#   {"type": "stop", "name": ...}
+#   {"type": "input", "name": ..., "data": ...}
+#   {"type": "resize", "name": ..., "columns": ..., "rows": ...}
+#
+# supervisor -> viewer:
+#   {"type": "processes", "processes": [{"name": ..., "running": ...}]}
+#   {"type": "screen", "name": ..., "full": bool, "columns": ..., "rows": ..., "cursor": [x, y],
+#    "show_cursor": bool, "app_cursor_keys": bool, "lines": {row: [[style, text], ...]}}
+#   {"type": "error", "message": ...}
+#
+# a "full" screen message carries every non-blank line, the viewer clears everything else.
+# all other screen messages only carry the lines that changed since the previous one.
+
+_max_socket_path_length = 100
+
+_ansi_color_names = {
+    'black': 'ansiblack',
+    'red': 'ansired',
+    'green': 'ansigreen',
+    'brown': 'ansiyellow',
+    'blue': 'ansiblue',
+    'magenta': 'ansimagenta',
+    'cyan': 'ansicyan',
+    'white': 'ansigray',
+    'brightblack': 'ansibrightblack',
+    'brightred': 'ansibrightred',
+    'brightgreen': 'ansibrightgreen',
+    'brightbrown': 'ansibrightyellow',
+    'brightblue': 'ansibrightblue',
+    'brightmagenta': 'ansibrightmagenta',
+    'brightcyan': 'ansibrightcyan',
+    'brightwhite': 'ansiwhite',
+}
+
+_DECCKM = 1 << 5
+
+StyledLine = List[Tuple[str, str]]
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+class MessageReader:
+    """reassembles newline delimited messages from arbitrary socket reads"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        self._buffer += data
+        *lines, rest = self._buffer.split(b'\n')
+        self._buffer = bytearray(rest)
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def default_socket_path(config: ProcMuxConfig) -> str:
+    state_dir = config.resolved_state_dir or os.getcwd()
+    path = os.path.join(state_dir, 'supervisor.sock')
+    if len(path) <= _max_socket_path_length:
+        return path
+    # unix socket paths are limited to ~108 bytes, fall back to a short, stable path
+    digest = hashlib.sha1(path.encode()).hexdigest()[:12]
+    return os.path.join('/tmp', f'procmux-{os.getuid()}-{digest}.sock')
+
+
+def _color(color: str) -> str:
+    if color in _ansi_color_names:
+        return _ansi_color_names[color]
+    if len(color) == 6:
+        return f'#{color}'
+    return ''
+
+
+def char_style(char: pyte.screens.Char) -> str:
+    fg = _color(char.fg) if char.fg != 'default' else ''
+    bg = _color(char.bg) if char.bg != 'default' else ''
+    parts = []
+    if fg:
+        parts.append(f'fg:{fg}')
+    if bg:
+        parts.append(f'bg:{bg}')
+    if char.bold:
+        parts.append('bold')
+    if char.italics:
+        parts.append('italic')
+    if char.underscore:
+        parts.append('underline')
+    if char.blink:
+        parts.append('blink')
+    if char.reverse:
+        parts.append('reverse')
+    return ' '.join(parts)
+
+
+def serialize_line(screen: pyte.Screen, row_index: int) -> StyledLine:
+    row = screen.buffer[row_index]
+    # trailing cells with the default style are dropped, the viewer pads blank space itself
+    last_column = -1
+    for column in sorted(row.keys(), reverse=True):
+        char = row[column]
+        if char.data != ' ' or char_style(char):
+            last_column = column
+            break
+    runs: StyledLine = []
+    current_style = None
+    current_text: List[str] = []
+    for column in range(last_column + 1):
+        char = row[column]
+        style = char_style(char)
+        if style != current_style and current_text:
+            runs.append((current_style, ''.join(current_text)))
+            current_text = []
+        current_style = style
+        current_text.append(char.data)
+    if current_text:
+        runs.append((current_style, ''.join(current_text)))
+    return runs
+
+
+def screen_message(name: str, screen: pyte.Screen, full: bool) -> Dict[str, Any]:
+    rows = range(screen.lines) if full else sorted(screen.dirty)
+    lines = {}
+    for row_index in rows:
+        if row_index >= screen.lines:
+            continue
+        line = serialize_line(screen, row_index)
+        if line or not full:
+            lines[str(row_index)] = line
+    return {
+        'type': 'screen',
+        'name': name,
+        'full': full,
+        'columns': screen.columns,
+        'rows': screen.lines,
+        'cursor': [screen.cursor.x, screen.cursor.y],
+        'show_cursor': not screen.cursor.hidden,
+        'app_cursor_keys': _DECCKM in screen.mode,
+        'lines': lines,
+    }
@@ -0,0 +1,238 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set, TYPE_CHECKING
+
+import pyte
+
+from procmux.log import logger
+from procmux.supervisor.launcher import is_supervisor_listening
+from procmux.supervisor.protocol import MessageReader, encode, screen_message
+from procmux.tui.types import Process
+
+if TYPE_CHECKING:
+    from procmux.headless.headless_controller import HeadlessController
+    from procmux.headless.pty_process_controller import PtyProcessController
+
+
+class _MirrorScreen(pyte.Screen):
+    """a screen emulated on the supervisor side, answers terminal queries (DSR, DA) through the pty"""
+
+    def __init__(self, columns: int, rows: int,
+                 process_controller: 'PtyProcessController'):
+        super().__init__(columns, rows)
+        self.process_controller = process_controller
+
+    def write_process_input(self, data: str):
+        self.process_controller.write_input(data.encode())
+
+
+class _Viewer:
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.needs_resync = False
+
+
+class SupervisorServer:
+    """
+    keeps a screen per process and streams it to any number of attached viewers over a unix socket.
+    screen updates are coalesced and only the changed lines are sent,
+    a viewer that cannot keep up is skipped and gets a full snapshot once it has drained.
+    """
+
+    flush_interval = 0.03
+    max_pending_bytes = 1024 * 1024
+
+    def __init__(self, controller: 'HeadlessController', socket_path: str):
+        self._controller = controller
+        self._socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._screens: Dict[str, _MirrorScreen] = {}
+        self._streams: Dict[str, pyte.ByteStream] = {}
+        self._viewers: List[_Viewer] = []
+        self._dirty: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def start(self):
+        self._remove_stale_socket()
+        os.makedirs(os.path.dirname(self._socket_path) or '.', exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle_viewer,
+                                                       path=self._socket_path)
+        os.chmod(self._socket_path, 0o600)
+        self._controller.output_listeners.append(self.on_process_output)
+        self._controller.state_listeners.append(self.on_process_state_change)
+        logger.info(f'supervisor listening on {self._socket_path}')
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self._socket_path):
+            return
+        if is_supervisor_listening(self._socket_path):
+            raise RuntimeError(
+                f'another supervisor is already listening on {self._socket_path}'
+            )
+        os.unlink(self._socket_path)
+
+    def close(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for viewer in self._viewers:
+            viewer.writer.close()
+        self._viewers.clear()
+        if self._server:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self._socket_path)
+            except OSError:
+                pass
+
+    def _get_screen(self, process: Process) -> Optional[_MirrorScreen]:
+        screen = self._screens.get(process.name)
+        process_controller = self._controller.get_process_controller(process)
+        # a new screen for the new instance after an overlap restart
+        if screen is None or screen.process_controller is not process_controller:
+            if not process_controller:
+                return None
+            screen = _MirrorScreen(process_controller.columns,
+                                   process_controller.rows, process_controller)
+            self._screens[process.name] = screen
+            self._streams[process.name] = pyte.ByteStream(screen)
+        return screen
+
+    def on_process_output(self, process: Process, data: bytes):
+        if self._get_screen(process) is None:
+            return
+        self._streams[process.name].feed(data)
+        self._dirty.add(process.name)
+        self._schedule_flush()
+
+    def on_process_state_change(self, process: Process):
+        if process.running:
+            screen = self._get_screen(process)
+            if screen is not None:
+                # a fresh run starts on a clean screen
+                screen.reset()
+                self._broadcast_screen(process.name, full=True)
+        self._broadcast(self._processes_message())
+
+    def _processes_message(self):
+        return {
+            'type': 'processes',
+            'processes': [{
+                'name': p.name,
+                'running': p.running,
+                'up_to_date': p.up_to_date
+            } for p in self._controller.process_list],
+        }
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(
+                self.flush_interval, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            self._broadcast_screen(name, full=False)
+        for viewer in self._viewers:
+            if viewer.needs_resync and not self._is_backed_up(viewer):
+                viewer.needs_resync = False
+                self._send_snapshot(viewer)
+
+    def _broadcast_screen(self, name: str, full: bool):
+        screen = self._screens.get(name)
+        if screen is None:
+            return
+        data = encode(screen_message(name, screen, full))
+        screen.dirty.clear()
+        for viewer in self._viewers:
+            if not viewer.needs_resync:
+                self._write(viewer, data)
+
+    def _broadcast(self, message):
+        data = encode(message)
+        for viewer in self._viewers:
+            self._write(viewer, data)
+
+    def _is_backed_up(self, viewer: _Viewer) -> bool:
+        return viewer.writer.transport.get_write_buffer_size(
+        ) > self.max_pending_bytes
+
+    def _write(self, viewer: _Viewer, data: bytes):
+        if viewer.writer.is_closing():
+            return
+        if self._is_backed_up(viewer):
+            # partial updates are useless once one is dropped, resync with a snapshot later
+            viewer.needs_resync = True
+            self._schedule_flush()
+            return
+        viewer.writer.write(data)
+
+    def _send_snapshot(self, viewer: _Viewer):
+        self._write(viewer, encode(self._processes_message()))
+        for name, screen in self._screens.items():
+            self._write(viewer, encode(screen_message(name, screen, full=True)))
+
+    async def _handle_viewer(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        viewer = _Viewer(writer)
+        self._viewers.append(viewer)
+        logger.info(f'viewer attached ({len(self._viewers)} attached)')
+        self._send_snapshot(viewer)
+        message_reader = MessageReader()
+        try:
+            while True:
+                data = await reader.read(64 * 1024)
+                if not data:
+                    break
+                for message in message_reader.feed(data):
+                    self._handle_message(viewer, message)
+        except (ConnectionError, ValueError) as e:
+            logger.error(f'dropping viewer: {e}')
+        finally:
+            if viewer in self._viewers:
+                self._viewers.remove(viewer)
+            writer.close()
+            logger.info(f'viewer detached ({len(self._viewers)} attached)')
+
+    def _handle_message(self, viewer: _Viewer, message):
+        message_type = message.get('type')
+        process = self._controller.get_process_by_name(message.get('name', ''))
+        if not process:
+            self._write(
+                viewer,
+                encode({
+                    'type': 'error',
+                    'message': f'unknown process: {message.get("name")}'
+                }))
+            return
+        process_controller = self._controller.get_process_controller(process)
+        if message_type == 'start':
+            missing = self._controller.start_process_with_values(
+                process, message.get('values') or {})
+            if missing:
+                self._write(
+                    viewer,
+                    encode({
+                        'type': 'error',
+                        'message': f'cannot start {process.name}, no values for fields: {missing}'
+                    }))
+        elif message_type == 'stop':
+            self._controller.stop_process(process)
+        elif message_type == 'input':
+            process_controller.write_input(message['data'].encode())
+        elif message_type == 'resize':
+            columns, rows = int(message['columns']), int(message['rows'])
+            if columns < 1 or rows < 1:
+                return
+            if (columns, rows) == (process_controller.columns,
+                                   process_controller.rows):
+                return
+            process_controller.resize(columns, rows)
+            screen = self._get_screen(process)
+            screen.resize(rows, columns)
+            self._broadcast_screen(process.name, full=True)
+        else:
+            logger.error(f'unknown supervisor message type: {message_type}')
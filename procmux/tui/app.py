@@ -1,8 +1,13 @@
 from __future__ import unicode_literals
 
+import time
+from typing import Optional, Tuple
+
 from prompt_toolkit.application import Application
+from prompt_toolkit.input import Input
 from prompt_toolkit.key_binding import DynamicKeyBindings
 from prompt_toolkit.layout import ConditionalContainer, DynamicContainer, FloatContainer, HSplit, Layout, VSplit, Window
+from prompt_toolkit.output import Output
 from prompt_toolkit.styles import Style
 
 from procmux.config import ProcMuxConfig
@@ -12,9 +17,14 @@ from procmux.tui.view.help import HelpPanel
 from procmux.tui.view.process_description import ProcessDescriptionPanel
 from procmux.tui.view.side_bar import SideBar
 from procmux.tui.view.terminal import TerminalPanel
+from procmux.util.timing import timings
 
 
-def start_tui(config: ProcMuxConfig):
+def create_application(config: ProcMuxConfig,
+                       socket_path: Optional[str] = None,
+                       input: Optional[Input] = None,
+                       output: Optional[Output] = None
+                       ) -> Tuple[Application, TUIController]:
     terminal_placeholder = Window(
         style=f'bg:{config.style.placeholder_terminal_bg_color}',
         width=config.style.width_100,
@@ -23,7 +33,14 @@ def start_tui(config: ProcMuxConfig):
     dynamic_container = DynamicContainer(get_container=lambda: None)
     float_container = FloatContainer(content=dynamic_container, floats=[])
 
-    controller = TUIController(config, terminal_placeholder, float_container)
+    if socket_path:
+        from procmux.tui.controller.attached_tui_controller import AttachedTUIController
+
+        controller = AttachedTUIController(config, terminal_placeholder,
+                                           float_container, socket_path)
+    else:
+        controller = TUIController(config, terminal_placeholder,
+                                   float_container)
 
     side_bar = SideBar(controller)
 
@@ -65,7 +82,30 @@ def start_tui(config: ProcMuxConfig):
             get_key_bindings=controller.get_app_keybindings),
         style=Style(list((controller.config.style.style_classes
                           or {}).items())),
-        color_depth=controller.config.style.color_depth)
+        color_depth=controller.config.style.color_depth,
+        input=input,
+        output=output)
+
+    render_started = [0.0]
+
+    def _before_render(_):
+        render_started[0] = time.perf_counter()
+
+    def _after_render(_):
+        timings.record('tui.render',
+                       (time.perf_counter() - render_started[0]) * 1000)
+
+    application.before_render += _before_render
+    application.after_render += _after_render
+    return application, controller
+
 
-    controller.autostart()
+def start_tui(config: ProcMuxConfig,
+              socket_path: Optional[str] = None,
+              restore: bool = False):
+    application, controller = create_application(config, socket_path)
+    if restore:
+        controller.restore_session()
+    else:
+        controller.autostart()
     application.run()
@@ -0,0 +1,96 @@
+from typing import Any, Dict, Optional
+
+from prompt_toolkit.application import get_app
+from prompt_toolkit.layout import FloatContainer, Window
+
+from procmux.config import ProcMuxConfig
+from procmux.log import logger
+from procmux.tui.controller.remote_terminal_controller import RemoteTerminalController
+from procmux.tui.controller.supervisor_connection import SupervisorConnection
+from procmux.tui.controller.tui_controller import TUIController
+from procmux.tui.keybindings import DocumentedKeybindings
+from procmux.tui.types import Process
+from procmux.util.loop_monitor import loop_monitor
+
+
+class AttachedTUIController(TUIController):
+    """
+    a TUI that views processes owned by a supervisor (`procmux serve --socket`).
+    quitting only detaches the viewer, the processes keep running in the supervisor.
+    """
+
+    def __init__(self, config: ProcMuxConfig, terminal_placeholder: Window,
+                 float_container: FloatContainer, socket_path: str):
+        self._connection = SupervisorConnection(socket_path,
+                                                self.on_supervisor_message,
+                                                self.on_supervisor_disconnect)
+        super().__init__(config, terminal_placeholder, float_container)
+
+    def _start_services(self, config: ProcMuxConfig):
+        # the supervisor runs the signal server and owns the processes
+        self._connection.connect()
+
+    def _create_terminal_controller(
+            self, config: ProcMuxConfig,
+            process: Process) -> RemoteTerminalController:
+        return RemoteTerminalController(self, config, process)
+
+    def send(self, message: Dict[str, Any]):
+        self._connection.send(message)
+
+    def _get_remote_terminal_controller(
+            self, name: str) -> Optional[RemoteTerminalController]:
+        process = self._process_state.get_process_by_name(name)
+        if not process:
+            return None
+        return self._get_or_create_terminal_controller(process)
+
+    def on_supervisor_message(self, message: Dict[str, Any]):
+        message_type = message.get('type')
+        if message_type == 'screen':
+            terminal_controller = self._get_remote_terminal_controller(
+                message['name'])
+            if terminal_controller:
+                terminal_controller.apply_screen(message)
+        elif message_type == 'processes':
+            for remote_process in message['processes']:
+                process = self._process_state.get_process_by_name(
+                    remote_process['name'])
+                if process:
+                    process.running = remote_process['running']
+                    process.up_to_date = remote_process.get('up_to_date', False)
+                    if process.running:
+                        # stopping it goes through its terminal controller
+                        self._get_or_create_terminal_controller(process)
+        elif message_type == 'error':
+            logger.error(f'supervisor: {message["message"]}')
+        self.refresh_app()
+
+    def on_supervisor_disconnect(self):
+        logger.info('the supervisor went away - detaching')
+        self._quit()
+
+    def autostart(self):
+        # autostart already happened in the supervisor
+        pass
+
+    def reload_config(self):
+        pass
+
+    def _add_terminal_keybindings(self, kb: DocumentedKeybindings):
+        if self.current_terminal is not self._terminal_placeholder:
+            kb.register_configured_keybinding_sans_event(
+                self.config.keybinding.switch_focus, self.switch_focus,
+                'switch focus')
+            kb.register_configured_keybinding_sans_event(
+                self.config.keybinding.zoom, self.zoom, 'zoom')
+
+    def quit(self):
+        logger.info('in quit - detaching from the supervisor')
+        application = get_app()
+        if not application or self.quitting:
+            return
+        self._tui_state.quitting = True
+        loop_monitor.stop()
+        self._connection.close()
+        application.exit()
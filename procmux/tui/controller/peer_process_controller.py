@@ -0,0 +1,75 @@
+from concurrent.futures import Future
+from typing import List, Optional
+
+from procmux.config import ProcMuxConfig
+from procmux.log import for_process, logger
+from procmux.process.controller import ProcessController
+from procmux.server.peer_client import PeerClient
+from procmux.tui.types import Process
+from procmux.tui.view.peer_output import PeerOutput
+from procmux.util.interpolation import Interpolation
+
+
+class PeerProcessController(ProcessController):
+    """
+    stands in for a TerminalController for a process of a peer (another procmux instance),
+    it is started and stopped through the peer's signal server and its output is tailed from there.
+    """
+
+    def __init__(self, client: PeerClient, config: ProcMuxConfig,
+                 process: Process, remote_name: str):
+        super().__init__(config, process)
+        self._client = client
+        # the name of the process in the peer's config
+        self.remote_name = remote_name
+        self._output = ''
+        self._terminal: Optional[PeerOutput] = None
+
+    @property
+    def terminal(self) -> Optional[PeerOutput]:
+        return self._terminal
+
+    @property
+    def is_running(self) -> bool:
+        return self._process.running
+
+    def set_output(self, output: str):
+        self._output = output
+        if not self._terminal:
+            self._terminal = PeerOutput(lambda: self._output,
+                                        width=self._config.style.width_100,
+                                        height=self._config.style.height_100)
+
+    def _log_failure(self, action: str, future: Future):
+        if not future.cancelled() and future.exception():
+            logger.error('peer %s failed to %s %s: %s',
+                         self._client.name,
+                         action,
+                         self.remote_name,
+                         future.exception(),
+                         extra=for_process(self._process.name))
+
+    def spawn_terminal(self,
+                       run_in_background: bool,
+                       interpolations: Optional[List[Interpolation]] = None):
+        logger.info(f'asking peer {self._client.name} to start {self.remote_name}')
+        self._client.start_process(
+            self.remote_name, {i.field: i.value
+                               for i in interpolations or []}
+        ).add_done_callback(lambda f: self._log_failure('start', f))
+
+    def stop_process(self):
+        logger.info(f'asking peer {self._client.name} to stop {self.remote_name}')
+        self._client.stop_process(self.remote_name).add_done_callback(
+            lambda f: self._log_failure('stop', f))
+
+    def _send_signal(self, sig_code: int):
+        # the peer signals its own processes
+        self.stop_process()
+
+    def get_output_tail(self, max_lines: int) -> str:
+        return '\n'.join(self._output.split('\n')[-max_lines:])
+
+    def on_scroll_mode_change(self, scroll_mode: bool):
+        # the output is a tail fetched from the peer, there is no scrollback to page through
+        pass
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from procmux.config import ProcMuxConfig
+from procmux.log import logger
+from procmux.process.controller import ProcessController
+from procmux.tui.state.remote_screen_state import RemoteScreenState
+from procmux.tui.types import Process
+from procmux.tui.view.remote_terminal import RemoteTerminal
+from procmux.util.interpolation import Interpolation
+
+if TYPE_CHECKING:
+    from procmux.tui.controller.attached_tui_controller import AttachedTUIController
+
+
+class RemoteTerminalController(ProcessController):
+    """
+    stands in for a TerminalController when the TUI is attached to a supervisor,
+    the process itself runs (and keeps running) in the supervisor.
+    """
+
+    def __init__(self, controller: 'AttachedTUIController',
+                 config: ProcMuxConfig, process: Process):
+        super().__init__(config, process)
+        self._controller: AttachedTUIController = controller
+        self._screen_state = RemoteScreenState()
+        self._terminal: Optional[RemoteTerminal] = None
+
+    @property
+    def terminal(self) -> Optional[RemoteTerminal]:
+        return self._terminal
+
+    @property
+    def is_running(self) -> bool:
+        return self._process.running
+
+    def apply_screen(self, message: Dict[str, Any]):
+        self._screen_state.apply(message)
+        if not self._terminal:
+            self._terminal = RemoteTerminal(self._screen_state,
+                                            self._send_input,
+                                            self._send_resize,
+                                            width=self._config.style.width_100,
+                                            height=self._config.style.height_100)
+
+    def _send_input(self, data: str):
+        self._controller.send({
+            'type': 'input',
+            'name': self._process.name,
+            'data': data
+        })
+
+    def _send_resize(self, columns: int, rows: int):
+        self._controller.send({
+            'type': 'resize',
+            'name': self._process.name,
+            'columns': columns,
+            'rows': rows
+        })
+
+    def spawn_terminal(self,
+                       run_in_background: bool,
+                       interpolations: Optional[List[Interpolation]] = None):
+        logger.info(f'asking the supervisor to start {self._process.name}')
+        self._controller.send({
+            'type': 'start',
+            'name': self._process.name,
+            'values': {i.field: i.value
+                       for i in interpolations or []}
+        })
+
+    def stop_process(self):
+        logger.info(f'asking the supervisor to stop {self._process.name}')
+        self._controller.send({'type': 'stop', 'name': self._process.name})
+
+    def _send_signal(self, sig_code: int):
+        # the supervisor signals its own processes
+        self.stop_process()
+
+    def get_output_tail(self, max_lines: int) -> str:
+        return self._screen_state.get_text(max_lines)
+
+    def on_scroll_mode_change(self, scroll_mode: bool):
+        # the screen lives in the supervisor, there is no local scrollback to page through
+        pass
@@ -0,0 +1,57 @@
+import socket
+from typing import Any, Callable, Dict, Optional
+
+from prompt_toolkit.eventloop import get_event_loop
+
+from procmux.log import logger
+from procmux.supervisor.protocol import MessageReader, encode
+
+
+class SupervisorConnection:
+    """a viewer's unix socket connection to the supervisor, read on the prompt_toolkit event loop"""
+
+    def __init__(self, socket_path: str,
+                 on_message: Callable[[Dict[str, Any]], None],
+                 on_disconnect: Callable[[], None]):
+        self._socket_path = socket_path
+        self._on_message = on_message
+        self._on_disconnect = on_disconnect
+        self._reader = MessageReader()
+        self._socket: Optional[socket.socket] = None
+
+    def connect(self):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(self._socket_path)
+        get_event_loop().add_reader(self._socket.fileno(), self._read)
+
+    def send(self, message: Dict[str, Any]):
+        if not self._socket:
+            return
+        try:
+            self._socket.sendall(encode(message))
+        except OSError as e:
+            logger.error(f'failed to send {message["type"]} to the supervisor: {e}')
+            self._handle_disconnect()
+
+    def _read(self):
+        try:
+            data = self._socket.recv(256 * 1024)
+        except OSError as e:
+            logger.error(f'lost the supervisor connection: {e}')
+            data = b''
+        if not data:
+            self._handle_disconnect()
+            return
+        for message in self._reader.feed(data):
+            self._on_message(message)
+
+    def _handle_disconnect(self):
+        if self._socket:
+            self.close()
+            self._on_disconnect()
+
+    def close(self):
+        if self._socket:
+            get_event_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
@@ -1,27 +1,151 @@
 import os
-import signal
-import sys
-from typing import List, Optional, TYPE_CHECKING
+import select
+import time
+from typing import Any, Callable, List, Optional, Tuple, TYPE_CHECKING
 
+from prompt_toolkit.application import get_app
+from prompt_toolkit.eventloop import get_event_loop
 from ptterm import Terminal
 
 from procmux.config import ProcMuxConfig
-from procmux.log import logger
+from procmux.log import for_process, logger
+from procmux.process.controller import ProcessController
+from procmux.process.reaper import ExitStatus
 from procmux.tui.state.terminal_state import TerminalState
 from procmux.tui.types import Process
-from procmux.util.interpolation import interpolate, Interpolation
+from procmux.util.interpolation import Interpolation
+from procmux.util.timing import timings
 
 if TYPE_CHECKING:
     from procmux.tui.controller.tui_controller import TUIController
 
+# bytes per read from the pty, and at most per event loop iteration
+_read_size = 64 * 1024
+_max_batch_size = 512 * 1024
+# output (without line breaks to skip at) waiting to be parsed, the pty is not read any further until it is
+_max_pending_size = 4 * 1024 * 1024
+# seconds between feeding the output of a terminal that is not on screen to the emulator
+_background_feed_interval = 0.25
+# shorter delays are not worth a timer, the output is fed in the next event loop iteration
+_min_feed_delay = 0.01
 
-class TerminalController:
+# seconds a terminal that was hidden keeps its old size once it is shown again, so flipping through the
+# process list does not reflow (and SIGWINCH) every terminal on the way
+resize_debounce = 0.15
+
+
+def _skip_scrolled_off(text: str, screen: Any) -> str:
+    """
+    the lines of a batch that would scroll off the history right away are not parsed at all.
+    not for full screen programs (scroll regions, the alternate screen, private modes set within the batch)
+    """
+    if screen.margins is not None or screen.in_alternate_screen:
+        return text
+    start = len(text)
+    for _ in range(screen.lines + screen.get_history_limit()):
+        start = text.rfind('\n', 0, start)
+        if start <= 0:
+            return text
+    if text.find('\x1b[?', 0, start) != -1:
+        return text
+    return text[start + 1:]
+
+
+class _OutputReader:
+    """
+    replaces ptterm's reader, which reads 4k per event loop iteration and parses (and repaints) every chunk on its
+    own. the pty is drained in large reads, the output collects until the emulator is fed all of it at once: right
+    away for a terminal on screen (unless parsing is what keeps the loop busy), every _background_feed_interval for
+    the others. a process printing faster than it can be parsed only has the tail of its output parsed, the screen
+    and the history show the same
+    """
+
+    def __init__(self, ptterm_process: Any, is_shown: Callable[[], bool],
+                 call_later: Callable[[float, Callable[[], None]], Any]):
+        self._process = ptterm_process
+        self._is_shown = is_shown
+        self._call_later = call_later
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._feed_scheduled = False
+        # how long feeding the last batch took
+        self._feed_seconds = 0.0
+        self._paused = False
+
+    def read(self):
+        pty_terminal = self._process.terminal
+        size = 0
+        while size < _max_batch_size:
+            data = pty_terminal.read_text(_read_size)
+            if not data:
+                break
+            self._pending.append(data)
+            size += len(data)
+        if pty_terminal.closed:
+            pty_terminal.disconnect_reader()
+        if not size:
+            return
+        self._pending_size += size
+        if self._pending_size > _max_pending_size:
+            self._trim()
+            if self._pending_size > _max_pending_size:
+                pty_terminal.disconnect_reader()
+                self._paused = True
+        if not self._feed_scheduled:
+            self._feed_scheduled = True
+            # parsing takes up at most a third of the time of a terminal on screen that is flooded with output
+            delay = 2 * self._feed_seconds if self._is_shown(
+            ) else _background_feed_interval
+            if delay < _min_feed_delay:
+                get_event_loop().call_from_executor(self._feed)
+            else:
+                self._call_later(delay, self._feed)
+
+    def _trim(self):
+        text = _skip_scrolled_off(''.join(self._pending), self._process.screen)
+        self._pending = [text]
+        self._pending_size = len(text)
+
+    @timings.timed('terminal.output')
+    def flush(self) -> bool:
+        """feeds the pending output to the emulator right away, returns whether there was any"""
+        fed = bool(self._pending)
+        if fed:
+            self._trim()
+            text = self._pending[0]
+            self._pending = []
+            self._pending_size = 0
+            started = time.perf_counter()
+            self._process.stream.feed(text)
+            self._feed_seconds = time.perf_counter() - started
+        if self._paused:
+            self._paused = False
+            if not self._process.suspended:
+                self._process.terminal.connect_reader()
+        return fed
+
+    def _feed(self):
+        self._feed_scheduled = False
+        if self.flush():
+            self._process.invalidate()
+
+
+class TerminalController(ProcessController):
 
     def __init__(self, controller: 'TUIController', config: ProcMuxConfig,
                  process: Process):
+        super().__init__(config, process)
         self._controller: TUIController = controller
-        self._config: ProcMuxConfig = config
         self._terminal_state = TerminalState(process)
+        # the output tail recorded by the previous session, shown until the process runs again
+        self.restored_output = ''
+        self._size: Optional[Tuple[int, int]] = None
+        self._pending_size: Optional[Tuple[int, int]] = None
+        self._apply_size: Optional[Callable[[int, int], None]] = None
+        self._last_render = -1
+        self._shown_at = 0.0
+        self._resize_timer = None
+        self._output_reader: Optional[_OutputReader] = None
 
     @property
     def terminal(self) -> Optional[Terminal]:
@@ -32,112 +156,229 @@ class TerminalController:
         return self._terminal_state.is_running
 
     @property
-    def _process(self) -> Process:
-        return self._terminal_state.process
-
-    def _export_env_vars(self) -> bool:
-        if self._process.config.env:
-            for key, value in self._process.config.env.items():
-                os.environ[key] = value or ''
-            return True
-        return False
-
-    def _adjust_path(self):
-        proc_config = self._process.config
-        if proc_config.add_path:
-            if type(proc_config.add_path) == str:
-                paths = [proc_config.add_path]
-            paths = proc_config.add_path
-            for p in paths:
-                sys.path.append(p)
-
-    def _change_working_directory(self):
-        os.chdir(self._process.config.cwd)
-
-    def _get_cmd(
-            self,
-            interpolations: Optional[List[Interpolation]] = None) -> List[str]:
-        proc_config = self._process.config
-        cmd = []
-        if proc_config.shell:
-            cmd.extend(self._config.shell_cmd)
-            cmd.append(interpolate(proc_config.shell, interpolations))
-        elif proc_config.cmd:
-            cmd = [interpolate(c, interpolations) for c in proc_config.cmd]
-        return cmd
-
-    def stop_process(self):
-        logger.info(f'in top process: {self._process.name}')
-        if self.is_running and self.terminal:
-            stop_signal = self._process.config.stop
-            sig_code = getattr(signal, stop_signal)
-            try:
-                if hasattr(self.terminal.process.terminal, 'send_signal'):
-                    logger.info(
-                        f'stopping process {self._process.name} with defined signal {stop_signal}'
-                    )
-                    self.terminal.process.terminal.send_signal(sig_code)
-                else:
-                    logger.info(
-                        f'killing process {self._process.name} using x-platform process kill()'
-                        f' - disregarding defined kill sig')
-                    self._kill()
-            except Exception as e:
-                logger.error(
-                    f'failed to kill process: {self._process.name} {e}')
+    def pid(self) -> Optional[int]:
+        if not self.terminal or not self.is_running:
+            return None
+        return self.terminal.process.terminal.pid
+
+    def _send_signal(self, sig_code: int):
+        if not self.terminal:
+            return
+        if hasattr(self.terminal.process.terminal, 'send_signal'):
+            logger.info(
+                f'stopping process {self._process.name} with defined signal {self._process.config.stop}'
+            )
+            self.terminal.process.terminal.send_signal(sig_code)
+        else:
+            logger.info(
+                f'killing process {self._process.name} using x-platform process kill()'
+                f' - disregarding defined kill sig')
+            self._kill()
 
     def _kill(self):
         if self.is_running and self.terminal:
             try:
-                logger.info(f'running kill() on process {self._process.name}')
+                logger.info('running kill() on process %s',
+                            self._process.name,
+                            extra=for_process(self._process.name))
                 self.terminal.terminal_control.process.kill()
             except Exception as e:
                 logger.error(
                     f'failed to kill process name: {self._process.name} {e}')
 
+    def _watch_exit(self, ptterm_process: Any):
+        # replaces ptterm's _waitpid (a blocking waitpid on an executor thread per process) with the central reaper
+        pty_terminal = ptterm_process.terminal
+        pty_terminal._waitpid = lambda: self._controller.reaper.watch(
+            pty_terminal.pid, lambda status: self._on_exit(ptterm_process, status))
+
+    def _fork_without_delay(self, pty_terminal: Any):
+        """
+        ptterm sleeps 0.1s after forking, so a resize cannot reach the child while it still runs python with
+        prompt_toolkit's handlers. the child resets SIGWINCH and then closes every fd it inherited, the end of a
+        pipe tells exactly when
+        """
+
+        def start():
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                pty_terminal._in_child()
+            os.close(write_fd)
+            try:
+                os.read(read_fd, 1)
+            finally:
+                os.close(read_fd)
+            pty_terminal.pid = pid
+            pty_terminal._waitpid()
+
+        pty_terminal.start = start
+
+    def _manage_size(self, ptterm_process: Any):
+        """
+        ptterm resizes a terminal (a screen reflow, plus TIOCSWINSZ which makes the process redraw) whenever it is
+        rendered at another size. the terminal that stays on screen is still resized right away, one that was
+        hidden is resized once it stayed on screen for resize_debounce
+        """
+        self._size = self._pending_size = None
+        self._last_render = -1
+        self._apply_size = ptterm_process.set_size
+        start = ptterm_process.start
+
+        def start_keeping_size():
+            # ptterm sizes the pty to 120x24 right before forking, it already has the size it is rendered at
+            ptterm_process.set_size = lambda width, height: None
+            try:
+                start()
+            finally:
+                ptterm_process.set_size = self._request_size
+
+        ptterm_process.set_size = self._request_size
+        ptterm_process.start = start_keeping_size
+
+    def _request_size(self, width: int, height: int):
+        # called by ptterm every time the terminal is rendered
+        app = get_app()
+        render_counter = app.render_counter if app else 0
+        now = time.monotonic()
+        if self._last_render < render_counter - 1:
+            # it was not part of the previous render
+            self._shown_at = now
+        self._last_render = render_counter
+        self._controller.terminal_size = (width, height)
+        if self._output_reader:
+            # rendered right after this, with the output that is still waiting
+            self._output_reader.flush()
+        if (width, height) == self._size:
+            self._pending_size = None
+            return
+        if self._size is None or now - self._shown_at >= resize_debounce:
+            self._resize(width, height)
+            return
+        self._pending_size = (width, height)
+        if not self._resize_timer:
+            self._resize_timer = self._controller.call_later(
+                resize_debounce, self._apply_pending_size)
+
+    def _is_shown(self) -> bool:
+        app = get_app()
+        return bool(app) and self._last_render == app.render_counter
+
+    def _apply_pending_size(self):
+        self._resize_timer = None
+        app = get_app()
+        # a terminal that was hidden again (not part of the last render) keeps its size until it is shown next
+        if not self._pending_size or not app or self._last_render != app.render_counter:
+            return
+        self._resize(*self._pending_size)
+        self._controller.refresh_app()
+
+    def _resize(self, width: int, height: int):
+        self._size = (width, height)
+        self._pending_size = None
+        self._apply_size(width, height)
+
+    def _drain_output(self, ptterm_process: Any):
+        # the exit can be noticed before the last output was read, which would be lost once the pty is closed
+        pty_terminal = ptterm_process.terminal
+        if not self._output_reader or pty_terminal.master is None or pty_terminal.closed:
+            return
+        if select.select([pty_terminal.master], [], [], 0)[0]:
+            self._output_reader.read()
+        self._output_reader.flush()
+
+    def _on_exit(self, ptterm_process: Any, status: ExitStatus):
+        self.last_exit = status
+        self._drain_output(ptterm_process)
+        pty_terminal = ptterm_process.terminal
+        # the same cleanup ptterm does once waitpid returns
+        pty_terminal.disconnect_reader()
+        os.close(pty_terminal.master)
+        os.close(pty_terminal.slave)
+        pty_terminal.master = None
+        pty_terminal.ready_f.set_result(None)
+
     def _handle_process_done(self):
-        logger.info(f'{self._process.name} is done')
+        exit_code = self.last_exit.exit_code if self.last_exit else None
+        logger.info('%s is done (exit code: %s)',
+                    self._process.name,
+                    exit_code,
+                    extra=for_process(self._process.name))
         self._terminal_state.running = False
-        self._controller.on_process_done(self._process)
+        if self.detached:
+            self._controller.on_detached_done(self)
+        else:
+            self._controller.on_process_done(self._process)
 
     def _handle_process_spawned(self):
-        logger.info(
-            f'created terminal {self.terminal} for process {self._process.name}'
-        )
+        logger.info('created terminal %s for process %s',
+                    self.terminal,
+                    self._process.name,
+                    extra=for_process(self._process.name))
         self._terminal_state.running = True
-        self._controller.on_process_spawned(self._process)
+        if not self.detached:
+            self._controller.on_process_spawned(self._process)
 
+    @timings.timed('spawn')
     def spawn_terminal(self,
                        run_in_background: bool,
                        interpolations: Optional[List[Interpolation]] = None):
-        logger.info(f'in spawn terminal for process {self._process.name}')
+        logger.info('in spawn terminal for process %s',
+                    self._process.name,
+                    extra=for_process(self._process.name))
         if self.is_running:
             logger.info(
                 f'{self._process.name} terminal already running - returning existing terminal - {self.terminal}'
             )
             return
 
-        def before_exec():
-            self._change_working_directory()
-            self._export_env_vars()
-            self._adjust_path()
-
         self._terminal_state.terminal = Terminal(
             command=self._get_cmd(interpolations),
             width=self._config.style.width_100,
             height=self._config.style.height_100,
             style='class:terminal',
-            before_exec_func=before_exec,
+            before_exec_func=self._before_exec,
             done_callback=self._handle_process_done)
+        self._output_reader = _OutputReader(self.terminal.process,
+                                            self._is_shown,
+                                            self._controller.call_later)
+        self.terminal.process.terminal._input_ready_callbacks[:] = [
+            self._output_reader.read
+        ]
+        self.last_exit = None
+        self._manage_size(self.terminal.process)
+        if hasattr(self.terminal.process.terminal, '_waitpid'):
+            self._watch_exit(self.terminal.process)
+            self._fork_without_delay(self.terminal.process.terminal)
         if run_in_background:
             logger.info(
                 f'rendering ptterm in the background, because {self._process.name} is not actively selected'
             )
             if self.terminal:
-                self.terminal.terminal_control.create_content(width=100,
-                                                              height=100)
+                # at the size the terminals are shown at, so showing it later does not resize it
+                width, height = self._controller.terminal_size
+                self.terminal.terminal_control.create_content(width=width,
+                                                              height=height)
         self._handle_process_spawned()
 
+    def get_output_tail(self, max_lines: int) -> str:
+        if not self.terminal:
+            return '\n'.join(self.restored_output.split('\n')[-max_lines:])
+        if self._output_reader:
+            self._output_reader.flush()
+        data_buffer = self.terminal.process.screen.pt_screen.data_buffer
+        if not data_buffer:
+            return ''
+        last_row = max(data_buffer)
+        lines = []
+        for row_index in range(max(min(data_buffer), last_row - max_lines + 1),
+                               last_row + 1):
+            row = data_buffer[row_index]
+            line = ''.join(row[x].char
+                           for x in range(max(row) + 1)) if row else ''
+            lines.append(line.rstrip())
+        return '\n'.join(lines)
+
     def on_scroll_mode_change(self, scroll_mode: bool):
         if self.terminal and self._terminal_state.scroll_mode != scroll_mode:
             self._terminal_state.scroll_mode = scroll_mode
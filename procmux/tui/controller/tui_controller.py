@@ -1,26 +1,43 @@
 from copy import deepcopy
 from functools import cached_property
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from prompt_toolkit.application import get_app
 from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.eventloop import get_event_loop
 from prompt_toolkit.layout import FloatContainer, Window
 from prompt_toolkit.mouse_events import MouseEvent, MouseEventType
 from ptterm import Terminal
 
-from procmux.config import ProcMuxConfig
-from procmux.log import logger
+from procmux.config import ProcMuxConfig, ProcessConfig, diff_procs, parse_config
+from procmux.log import for_process, logger
+from procmux.process.handover import Handover
+from procmux.process.reaper import Reaper
+from procmux.process.start_queue import StartQueue
+from procmux.process.task_cache import TaskCache
+from procmux.process.ports import ListeningPort, PortConflict
+from procmux.process.tree import ProcessTreeWatcher, TreeNode
+from procmux.server.commands import Command, CommandQueue, RestartProcess, StartProcess, StopProcess
+from procmux.server.peer_client import PeerClient
 from procmux.server.server import start_server
+from procmux.tui.controller.peer_process_controller import PeerProcessController
 from procmux.tui.controller.terminal_controller import TerminalController
 from procmux.tui.interpolation_dialog import InterpolationDialog
 from procmux.tui.keybindings import DocumentedKeybindings
+from procmux.tui.state.interpolation_state import InterpolationState
 from procmux.tui.state.process_state import ProcessState
+from procmux.tui.state.session_state import SessionJournal, SessionSnapshot
 from procmux.tui.state.tui_state import TUIState
 from procmux.tui.types import FocusTarget, FocusWidget, Process
+from procmux.util.config_watcher import ConfigWatcher
 from procmux.util.interpolation import Interpolation
+from procmux.util.loop_monitor import loop_monitor
+from procmux.util.timers import Timer, Timers
+from procmux.util.timing import timings
 
 
 class TUIController:
+    session_tail_lines = 100
 
     def __init__(self, config: ProcMuxConfig, terminal_placeholder: Window,
                  float_container: FloatContainer):
@@ -28,20 +45,64 @@ class TUIController:
         self._float_container = float_container
         self._tui_state: TUIState = TUIState(config)
         self._process_state: ProcessState = ProcessState(config)
-        self._terminal_controllers: Dict[int, TerminalController] = \
-            self._create_terminal_controllers(config, self._process_state.process_list)
+        self._interpolation_state: InterpolationState = InterpolationState(
+            config)
+        # created when a process is first started, see _get_or_create_terminal_controller
+        self._terminal_controllers: Dict[int, TerminalController] = {}
         self._filter_change_handlers: List[Callable[[str], None]] = []
+        # keyed by the state the keybindings depend on, see _keybindings_key
+        self._keybindings_cache: Dict[Tuple[FocusWidget, bool, bool, bool],
+                                      DocumentedKeybindings] = {}
+        self._session_journal = SessionJournal(config.resolved_state_dir)
+        self._task_cache = TaskCache(config.resolved_state_dir,
+                                     get_event_loop().call_from_executor)
+        self._previous_session = SessionSnapshot()
 
         self._server_controller = None
-        if config.signal_server.enable:
-
-            def _start_process_and_refresh(process: Process):
-                self.start_process(process)
-                self.refresh_app()
+        self._config_watcher: Optional[ConfigWatcher] = None
+        self._peers: Dict[str, PeerClient] = {}
+        # process index -> the overlap restart in progress
+        self._handovers: Dict[int, Handover] = {}
+        # instances stopped by (or after) an overlap restart, until they exited
+        self._retiring: Set[TerminalController] = set()
+        # the size of the terminal area when a terminal was last rendered, background terminals start at it
+        self.terminal_size: Tuple[int, int] = (100, 100)
+        loop = get_event_loop()
+        # the prompt_toolkit event loop has no timers of its own
+        self._timers = Timers(loop.call_from_executor)
+        self.reaper = Reaper(loop.add_reader, loop.remove_reader,
+                             loop.call_from_executor)
+        self._start_queue = StartQueue(config.max_concurrent_starts,
+                                       loop.call_from_executor,
+                                       self.call_later)
+        self._process_tree_watcher = ProcessTreeWatcher(
+            self._get_running_roots, self._get_declared_ports,
+            lambda: loop.call_from_executor(self.refresh_app))
+        self._start_services(config)
+        loop_monitor.start(get_event_loop().call_from_executor,
+                           config.slow_callback_ms)
+
+    def _start_services(self, config: ProcMuxConfig):
+        self._previous_session = self._session_journal.open()
+        self._process_tree_watcher.start()
 
+        if config.signal_server.enable:
+            commands = CommandQueue(get_event_loop().call_from_executor,
+                                    self._execute_command, self.refresh_app)
             self._server_controller = start_server(config, self._process_state,
                                                    self._terminal_controllers,
-                                                   _start_process_and_refresh)
+                                                   commands,
+                                                   self._interpolation_state,
+                                                   self._process_tree_watcher)
+
+        if config.watch_config and config.config_files:
+            loop = get_event_loop()
+            self._config_watcher = ConfigWatcher(
+                config.config_files,
+                lambda: loop.call_from_executor(self.reload_config))
+            self._config_watcher.start()
+
+        self._connect_peers(config)
 
     @property
     def float_container(self) -> FloatContainer:
@@ -49,7 +110,9 @@ class TUIController:
 
     @cached_property
     def config(self) -> ProcMuxConfig:
-        return deepcopy(self._tui_state.config)
+        config = self._tui_state.config
+        # the views only read the settings, the (possibly thousands of) proc configs are not copied
+        return deepcopy(config, {id(config.procs): config.procs})
 
     @property
     def zoomed_in(self) -> bool:
@@ -59,6 +122,10 @@ class TUIController:
     def filter_mode(self) -> bool:
         return self._tui_state.filter_mode
 
+    @property
+    def show_process_tree(self) -> bool:
+        return self._tui_state.show_process_tree
+
     @property
     def docs_open(self) -> bool:
         return self._tui_state.docs_open
@@ -89,37 +156,265 @@ class TUIController:
     def is_selected_process_running(self) -> bool:
         return self._process_state.is_selected_process_running
 
+    @property
+    def is_selected_process_queued(self) -> bool:
+        return bool(self.selected_process
+                    and self.selected_process.start_queued)
+
     def is_selected_process(self, process: Process) -> bool:
         if self.selected_process:
             return self.selected_process.index == process.index
         return False
 
-    def start_process(self, process: Optional[Process] = None):
-        logger.info(f'in start_process {process.name if process else ""}')
+    @loop_monitor.tracked('tui.start_process')
+    def start_process(
+            self,
+            process: Optional[Process] = None,
+            interpolations: Optional[List[Interpolation]] = None):
+        logger.info('in start_process %s',
+                    process.name if process else '',
+                    extra=for_process(process.name) if process else None)
         if process:
-            self.start_process_in_terminal(process)
+            self.start_process_in_terminal(process, interpolations)
             return
         if self.selected_process:
-            self.start_process_in_terminal(self.selected_process)
+            self.start_process_in_terminal(self.selected_process,
+                                           interpolations)
 
     def stop_process(self):
         logger.info('in stop_process')
+        if self.selected_process and self._cancel_start(self.selected_process):
+            return
+        if self.selected_process:
+            self._cancel_handover(self.selected_process)
         if self.current_terminal_controller:
             self.current_terminal_controller.stop_process()
 
+    def _execute_command(self, command: Command):
+        if isinstance(command, StartProcess):
+            self.start_process(command.process, command.interpolations)
+        elif isinstance(command, RestartProcess):
+            self.restart_process(command.process, command.interpolations)
+        elif isinstance(command, StopProcess):
+            if self._cancel_start(command.process):
+                return
+            self._cancel_handover(command.process)
+            terminal_controller = self._terminal_controllers.get(
+                command.process.index)
+            if terminal_controller:
+                terminal_controller.stop_process()
+
+    def _cancel_start(self, process: Process) -> bool:
+        """drops a start that is waiting for a slot or for its inputs to be hashed, returns whether there was one"""
+        if self._start_queue.cancel(process):
+            return True
+        if self._task_cache.cancel(process.name):
+            process.start_queued = False
+            self._start_queue.release(process)
+            self.refresh_app()
+            return True
+        return False
+
+    @loop_monitor.tracked('tui.on_process_spawned')
     def on_process_spawned(self, process: Process):
-        logger.info(f'in on process spawned: {process.name}')
+        logger.info('in on process spawned: %s',
+                    process.name,
+                    extra=for_process(process.name))
         process.running = True
+        process.up_to_date = False
+        self._start_queue.on_spawned(process)
 
+    @loop_monitor.tracked('tui.on_process_done')
     def on_process_done(self, process: Process):
-        logger.info(f'in on process done: {process.name}')
+        logger.info('in on process done: %s',
+                    process.name,
+                    extra=for_process(process.name))
+        handover = self._handovers.get(process.index)
+        if handover and handover.new.is_running:
+            logger.info(
+                '%s exited during its overlap restart, the new instance takes over right away',
+                process.name,
+                extra=for_process(process.name))
+            handover.cancel()
+            self._on_handover_ready(handover)
+            return
         process.running = False
-        if self.quitting and not self._process_state.has_running_processes:
+        self._start_queue.release(process)
+        terminal_controller = self._terminal_controllers.get(process.index)
+        if terminal_controller:
+            last_exit = terminal_controller.last_exit
+            self._task_cache.finish(process.name, last_exit is not None
+                                    and last_exit.exit_code == 0)
+            self._session_journal.record_stopped(
+                process.name,
+                terminal_controller.get_output_tail(self.session_tail_lines))
+        if not any(p.index == process.index for p in self.process_list):
+            logger.info('%s was removed from the config, dropping its terminal',
+                        process.name,
+                        extra=for_process(process.name))
+            self._terminal_controllers.pop(process.index, None)
+        elif process.restart_pending and not self.quitting:
+            logger.info('restarting %s with its updated config',
+                        process.name,
+                        extra=for_process(process.name))
+            process.restart_pending = False
+            self.start_process(process,
+                               self._remembered_interpolations(process))
+        if self.quitting and not self._process_state.has_running_processes and not self._retiring:
             self._quit()
         self.refresh_app()
 
     # /Processes
 
+    # Overlap restarts
+
+    def restart_process(self,
+                        process: Process,
+                        interpolations: Optional[List[Interpolation]] = None):
+        """restart_strategy: overlap, see Handover. a process that is not running is started"""
+        if self.quitting or process.peer:
+            return
+        old = self._terminal_controllers.get(process.index)
+        if not isinstance(old, TerminalController) or not old.is_running:
+            self.start_process(process, interpolations)
+            return
+        if interpolations is None and process.config.interpolations:
+            interpolations = self._remembered_interpolations(process)
+            if interpolations is None:
+                logger.error('cannot restart %s, not every field has a value',
+                             process.name,
+                             extra=for_process(process.name))
+                return
+        # the newest restart wins
+        self._cancel_handover(process)
+        logger.info('starting a new instance of %s next to the running one',
+                    process.name,
+                    extra=for_process(process.name))
+        new = self._create_terminal_controller(self._tui_state.config, process)
+        new.detached = True
+        new.spawn_terminal(True, interpolations)
+        if not new.is_running:
+            logger.error('failed to start a new instance of %s',
+                         process.name,
+                         extra=for_process(process.name))
+            return
+        if interpolations:
+            self._interpolation_state.remember(process.name, interpolations)
+        self._session_journal.record_started(
+            process.name, {i.field: i.value
+                           for i in interpolations or []})
+        handover = Handover(old, new, self._process_tree_watcher,
+                            self.call_later, self._on_handover_ready,
+                            self._on_handover_failed)
+        self._handovers[process.index] = handover
+        handover.start()
+
+    def _on_handover_ready(self, handover: Handover):
+        process = handover.process
+        self._handovers.pop(process.index, None)
+        old, new = handover.old, handover.new
+        new.detached = False
+        self._terminal_controllers[process.index] = new
+        process.scroll_mode = False
+        app = get_app()
+        if app and old.terminal and app.layout.has_focus(old.terminal):
+            app.layout.focus(new.terminal)
+        self._retire(old)
+        self.refresh_app()
+
+    def _on_handover_failed(self, handover: Handover):
+        self._handovers.pop(handover.process.index, None)
+        # stopped when it was not ready in time
+        self._retire(handover.new)
+        self.refresh_app()
+
+    def _cancel_handover(self, process: Process):
+        handover = self._handovers.pop(process.index, None)
+        if handover:
+            logger.info('cancelling the overlap restart of %s',
+                        process.name,
+                        extra=for_process(process.name))
+            handover.cancel()
+            self._retire(handover.new)
+
+    def _retire(self, terminal_controller: TerminalController):
+        """stops an instance the process no longer runs as, it is kept until the reaper reports its exit"""
+        terminal_controller.detached = True
+        if terminal_controller.is_running:
+            self._retiring.add(terminal_controller)
+            terminal_controller.stop_process()
+
+    def on_detached_done(self, terminal_controller: TerminalController):
+        self._retiring.discard(terminal_controller)
+        if self.quitting and not self._process_state.has_running_processes and not self._retiring:
+            self._quit()
+
+    # /Overlap restarts
+
+    # Config reload
+
+    @loop_monitor.tracked('tui.reload_config')
+    def reload_config(self):
+        logger.info('in reload_config')
+        if self.quitting:
+            return
+        config = self._tui_state.config
+        try:
+            new_config = parse_config(*config.config_files)
+        except Exception as e:
+            logger.error(
+                f'failed to reload config, keeping the current config: {e}')
+            return
+        self.apply_procs_change(new_config.procs)
+
+    def apply_procs_change(self, new_procs: Dict[str, ProcessConfig]):
+        config = self._tui_state.config
+        diff = diff_procs(config.procs, new_procs)
+        if diff.empty:
+            logger.info('config reloaded - no process changes detected')
+            return
+        logger.info(f'applying config changes - added: {diff.added} '
+                    f'removed: {diff.removed} changed: {diff.changed}')
+        config.procs = new_procs
+
+        for name in diff.removed:
+            process = self._process_state.get_process_by_name(name)
+            if not process:
+                continue
+            self._process_state.remove_process(process)
+            self._cancel_handover(process)
+            terminal_controller = self._terminal_controllers.get(
+                process.index)
+            if terminal_controller and terminal_controller.is_running:
+                # the terminal controller is dropped once the process is done
+                terminal_controller.stop_process()
+            else:
+                self._terminal_controllers.pop(process.index, None)
+
+        for name in diff.changed:
+            process = self._process_state.get_process_by_name(name)
+            if not process:
+                continue
+            process.config = new_procs[name]
+            terminal_controller = self._terminal_controllers.get(
+                process.index)
+            if terminal_controller and terminal_controller.is_running:
+                if process.config.restart_strategy == 'overlap':
+                    self.restart_process(
+                        process, self._remembered_interpolations(process))
+                else:
+                    process.restart_pending = True
+                    terminal_controller.stop_process()
+
+        for name in diff.added:
+            process = self._process_state.add_process(name, new_procs[name])
+            if process.config.autostart and not process.config.interpolations:
+                self.start_process(process)
+
+        self.refresh_app()
+
+    # /Config reload
+
     # Terminal
 
     @property
@@ -135,36 +430,113 @@ class TUIController:
             return self.current_terminal_controller.terminal
         return self._terminal_placeholder
 
-    def start_process_in_terminal(self, process: Process):
-        logger.info(f'starting {process.name} in terminal')
+    def start_process_in_terminal(
+            self,
+            process: Process,
+            interpolations: Optional[List[Interpolation]] = None):
+        logger.info('starting %s in terminal',
+                    process.name,
+                    extra=for_process(process.name))
         if self.quitting:
             return  # if procmux is in the process of quitting, don't start a new process
 
-        terminal_controller = self._terminal_controllers[process.index]
+        terminal_controller = self._get_or_create_terminal_controller(process)
         if terminal_controller:
             run_in_background = self.selected_process is None or self.selected_process.index != process.index
-            interpolations: List[Interpolation] = []
 
-            if len(process.config.interpolations) > 0:
-                id = InterpolationDialog(process, run_in_background,
-                                         self.config, self.float_container,
-                                         self.on_finish_interpolation)
+            if interpolations is None and len(
+                    process.config.interpolations) > 0:
+                id = InterpolationDialog(
+                    process, run_in_background, self.config,
+                    self.float_container, self.on_finish_interpolation,
+                    self._interpolation_state.get_values(process.name))
                 self._tui_state.open_modal(id.get_keybindings())
                 id.start_interpolation()
                 return
 
-            terminal_controller.spawn_terminal(run_in_background,
-                                               interpolations)
+            self._spawn_terminal(process, run_in_background, interpolations)
+
+    def _spawn_terminal(self, process: Process, run_in_background: bool,
+                        interpolations: Optional[List[Interpolation]]):
+        self._start_queue.submit(
+            process, lambda: self._spawn_now(process, run_in_background,
+                                             interpolations))
+        self.refresh_app()
+
+    def _spawn_now(self, process: Process, run_in_background: bool,
+                   interpolations: Optional[List[Interpolation]]) -> bool:
+        """returns whether a local process was spawned (or is about to be, once its inputs are hashed)"""
+        terminal_controller = self._terminal_controllers.get(process.index)
+        # a start while the inputs are hashed is the same start
+        if self.quitting or not terminal_controller or terminal_controller.is_running \
+                or self._task_cache.checking(process.name):
+            return False
+        if isinstance(terminal_controller,
+                      TerminalController) and self._task_cache.start(
+                          process.name, process.config, interpolations,
+                          lambda up_to_date: self._on_inputs_checked(
+                              process, run_in_background, interpolations,
+                              up_to_date)):
+            # it keeps its start slot (and shows as waiting) until then
+            process.start_queued = True
+            return True
+        return self._spawn_checked(process, run_in_background, interpolations)
+
+    def _on_inputs_checked(self, process: Process, run_in_background: bool,
+                           interpolations: Optional[List[Interpolation]],
+                           up_to_date: bool):
+        process.start_queued = False
+        self.refresh_app()
+        if up_to_date:
+            logger.info('%s is up to date, not running it',
+                        process.name,
+                        extra=for_process(process.name))
+            process.up_to_date = True
+        elif self._spawn_checked(process, run_in_background, interpolations):
+            return
+        self._start_queue.release(process)
+
+    def _spawn_checked(self, process: Process, run_in_background: bool,
+                       interpolations: Optional[List[Interpolation]]) -> bool:
+        terminal_controller = self._terminal_controllers.get(process.index)
+        if self.quitting or not terminal_controller or terminal_controller.is_running:
+            return False
+        # the selection may have moved on while the start was queued
+        run_in_background = run_in_background or not self.is_selected_process(
+            process)
+        terminal_controller.spawn_terminal(run_in_background, interpolations)
+        # ptterm forks a terminal that is on screen when it is first rendered, the redraw requested when the start
+        # was submitted may have happened already
+        self.refresh_app()
+        if process.peer:
+            # the peer remembers its own values and sessions, and queues its own starts
+            return False
+        if interpolations:
+            self._interpolation_state.remember(process.name, interpolations)
+        self._session_journal.record_started(
+            process.name, {i.field: i.value
+                           for i in interpolations or []})
+        # processes of a supervisor (attached mode) are reported running by it, not through on_process_spawned
+        return isinstance(terminal_controller,
+                          TerminalController) and terminal_controller.is_running
+
+    def call_later(self, delay: float,
+                   callback: Callable[[], None]) -> Timer:
+        return self._timers.call_later(delay, callback)
+
+    def _remembered_interpolations(
+            self, process: Process) -> Optional[List[Interpolation]]:
+        interpolations, missing = self._interpolation_state.resolve(
+            process.name, process.config.interpolations)
+        return None if missing else interpolations
 
     def on_finish_interpolation(self, process: Process,
                                 run_in_background: bool,
                                 interpolations: Optional[List[Interpolation]]):
         self._tui_state.close_modal()
         self.focus_to_sidebar()
-        terminal_controller = self._terminal_controllers[process.index]
-        if interpolations and terminal_controller:
-            terminal_controller.spawn_terminal(run_in_background,
-                                               interpolations)
+        if interpolations and process.index in self._terminal_controllers:
+            self._spawn_terminal(process, run_in_background, interpolations)
 
     # /Terminal
 
@@ -209,7 +581,7 @@ class TUIController:
 
     def focus_to_current_terminal(self) -> bool:
         logger.info('focusing on current terminal')
-        if isinstance(self.current_terminal, Terminal):
+        if self.current_terminal is not self._terminal_placeholder:
             application = get_app()
             if application:
                 logger.info('focusing on selected process terminal')
@@ -249,13 +621,23 @@ class TUIController:
     # Sidebar
 
     def on_sidebar_mouse_event(self, event: MouseEvent):
-        logger.info(f'in sidebar mouse event: {event}')
+        logger.info('in sidebar mouse event: %s', event)
         if event.event_type == MouseEventType.MOUSE_UP:
             _, y = event.position
             self._process_state.set_selected_process_by_y_pos(y)
+            self._on_selection_change()
             self.focus_to_sidebar()
 
+    def _on_selection_change(self):
+        self._session_journal.record_selected(
+            self.selected_process.name if self.selected_process else None)
+        self._tail_selected_peer_process()
+
     def move_process_selection(self, direction: int):
+        self._move_process_selection(direction)
+        self._on_selection_change()
+
+    def _move_process_selection(self, direction: int):
         if not self.selected_process:
             self._process_state.select_first_process()
             return
@@ -294,6 +676,8 @@ class TUIController:
         self._filter_change_handlers.append(handler)
 
     def on_filter_change(self):
+        self._session_journal.record_filter(self._process_state.filter_text)
+        self._tail_selected_peer_process()
         for handler in self._filter_change_handlers:
             handler(self._process_state.filter_text)
 
@@ -305,7 +689,7 @@ class TUIController:
         self.focused_widget = FocusWidget.SIDE_BAR_FILTER
 
     def update_filter(self, buffer: Buffer):
-        logger.info(f'in update filter: {buffer.text}')
+        logger.info('in update filter: %s', buffer.text)
         self._process_state.apply_filter(buffer.text)
         self.on_filter_change()
 
@@ -322,6 +706,118 @@ class TUIController:
 
     # /Filter
 
+    # Process tree
+
+    # the following two are called from the process tree thread
+
+    def _get_running_roots(self) -> Dict[int, str]:
+        roots = {}
+        for terminal_controller in [
+                *self._terminal_controllers.values(),
+                *(h.new for h in list(self._handovers.values()))
+        ]:
+            pid = terminal_controller.pid
+            if pid:
+                roots[pid] = terminal_controller.process.name
+        return roots
+
+    def _get_declared_ports(self) -> Dict[str, List[int]]:
+        return {
+            p.name: p.config.ports
+            for p in self._process_state.process_list if p.config.ports
+        }
+
+    def toggle_process_tree(self):
+        logger.info('in toggle_process_tree')
+        self._tui_state.show_process_tree = not self.show_process_tree
+        self._process_tree_watcher.show_trees = self.show_process_tree
+        self._process_tree_watcher.refresh_soon()
+
+    def _get_pid(self, process: Process) -> Optional[int]:
+        terminal_controller = self._terminal_controllers.get(process.index)
+        return terminal_controller.pid if terminal_controller else None
+
+    def get_process_tree(self, process: Process) -> List[TreeNode]:
+        return self._process_tree_watcher.trees.get(self._get_pid(process), [])
+
+    def get_listening_ports(self, process: Process) -> List[ListeningPort]:
+        return self._process_tree_watcher.ports.get(self._get_pid(process), [])
+
+    def get_port_conflicts(self, process: Process) -> List[PortConflict]:
+        return [
+            c for c in self._process_tree_watcher.conflicts
+            if c.involves(process.name)
+        ]
+
+    # Peers
+
+    def _connect_peers(self, config: ProcMuxConfig):
+        loop = get_event_loop()
+        for name, peer_config in config.peers.items():
+            # the callbacks are called on the peer client's threads
+            client = PeerClient(
+                name, peer_config,
+                lambda processes, peer=name: loop.call_from_executor(
+                    lambda: self._sync_peer(peer, processes)),
+                lambda remote_name, output, peer=name: loop.call_from_executor(
+                    lambda: self._set_peer_output(peer, remote_name, output)))
+            self._peers[name] = client
+            client.start()
+
+    def _sync_peer(self, peer: str,
+                   processes: Optional[List[Dict[str, Any]]]):
+        """applies the process list of a peer, None when the peer is unreachable"""
+        entries = {p.name: p for p in self.process_list if p.peer == peer}
+        if processes is None:
+            for process in entries.values():
+                process.stale = True
+            self.refresh_app()
+            return
+        for remote_process in processes:
+            process = entries.pop(f'{peer}/{remote_process["name"]}',
+                                  None) or self._add_peer_process(
+                                      peer, remote_process['name'])
+            process.running = remote_process['running']
+            process.up_to_date = remote_process.get('up_to_date', False)
+            process.stale = False
+        for process in entries.values():
+            logger.info(f'{process.name} is gone from peer {peer}')
+            self._process_state.remove_process(process)
+            self._terminal_controllers.pop(process.index, None)
+        self._tail_selected_peer_process()
+        self.refresh_app()
+
+    def _add_peer_process(self, peer: str, remote_name: str) -> Process:
+        # the category lets the entries of a peer be filtered with `cat:<peer>`
+        process_config = ProcessConfig(cmd=[remote_name],
+                                       description=f'{remote_name} on {peer}',
+                                       categories=[peer])
+        process = self._process_state.add_process(f'{peer}/{remote_name}',
+                                                  process_config)
+        process.peer = peer
+        self._terminal_controllers[process.index] = PeerProcessController(
+            self._peers[peer], self._tui_state.config, process, remote_name)
+        return process
+
+    def _set_peer_output(self, peer: str, remote_name: str, output: str):
+        process = self._process_state.get_process_by_name(
+            f'{peer}/{remote_name}')
+        terminal_controller = self._terminal_controllers.get(
+            process.index) if process else None
+        if isinstance(terminal_controller, PeerProcessController):
+            terminal_controller.set_output(output)
+            self.refresh_app()
+
+    def _tail_selected_peer_process(self):
+        selected = self.selected_process
+        for peer, client in self._peers.items():
+            terminal_controller = self._terminal_controllers.get(
+                selected.index) if selected and selected.peer == peer else None
+            client.tail(terminal_controller.remote_name
+                        if terminal_controller else None)
+
+    # /Peers
+
     # Docs
 
     def view_docs(self):
@@ -333,7 +829,7 @@ class TUIController:
         self.toggle_docs()
 
     def toggle_docs(self):
-        logger.info(f'setting docks_open to {not self.docs_open}')
+        logger.info('setting docks_open to %s', not self.docs_open)
         self._tui_state.docs_open = not self.docs_open
         if self.docs_open:
             self.focused_widget = FocusWidget.DOCS
@@ -367,7 +863,7 @@ class TUIController:
     # Scroll
 
     def on_scroll_mode_change(self, process: Process):
-        terminal_controller = self._terminal_controllers[process.index]
+        terminal_controller = self._terminal_controllers.get(process.index)
         if terminal_controller:
             terminal_controller.on_scroll_mode_change(process.scroll_mode)
 
@@ -383,10 +879,23 @@ class TUIController:
 
     # Keybindings
 
+    @timings.timed('tui.get_app_keybindings')
     def get_app_keybindings(self) -> DocumentedKeybindings:
         if self.modal_open:
             return self._tui_state.modal_keybindings
 
+        key = self._keybindings_key()
+        kb = self._keybindings_cache.get(key)
+        if kb is None:
+            kb = self._keybindings_cache[key] = self._build_app_keybindings()
+        return kb
+
+    def _keybindings_key(self) -> Tuple[FocusWidget, bool, bool, bool]:
+        return (self.focused_widget, self.is_selected_process_running,
+                self.is_selected_process_queued,
+                self.current_terminal is not self._terminal_placeholder)
+
+    def _build_app_keybindings(self) -> DocumentedKeybindings:
         kb = DocumentedKeybindings()
         if self.focused_widget == FocusWidget.DOCS:
             self._add_docs_keybindings(kb)
@@ -416,7 +925,8 @@ class TUIController:
         kb.register_configured_keybinding_sans_event(
             self.config.keybinding.down, self.sidebar_down, 'down')
 
-        if self.selected_process and self.selected_process.running:
+        if self.is_selected_process_running or self.is_selected_process_queued:
+            # stopping a process that waits for a start slot drops the start
             kb.register_configured_keybinding_sans_event(
                 self.config.keybinding.stop, self.stop_process, 'stop')
         else:
@@ -432,10 +942,15 @@ class TUIController:
         kb.register_configured_keybinding_sans_event(
             self.config.keybinding.docs, self.view_docs, 'docs')
 
+        if self._process_tree_watcher.available:
+            kb.register_configured_keybinding_sans_event(
+                self.config.keybinding.toggle_process_tree,
+                self.toggle_process_tree, 'tree')
+
         return kb
 
     def _add_terminal_keybindings(self, kb: DocumentedKeybindings):
-        if isinstance(self.current_terminal, Terminal):
+        if self.current_terminal is not self._terminal_placeholder:
             kb.register_configured_keybinding_sans_event(
                 self.config.keybinding.switch_focus, self.switch_focus,
                 'switch focus')
@@ -447,15 +962,19 @@ class TUIController:
 
     # /Keybindings
 
-    def _create_terminal_controllers(
-        self,
-        config: ProcMuxConfig,
-        process_list: List[Process],
-    ) -> Dict[int, TerminalController]:
-        return {
-            p.index: TerminalController(self, config, p)
-            for p in process_list
-        }
+    def _get_or_create_terminal_controller(
+            self, process: Process) -> TerminalController:
+        # most configured processes never run in a session, they get no terminal controller until they do
+        terminal_controller = self._terminal_controllers.get(process.index)
+        if not terminal_controller:
+            terminal_controller = self._create_terminal_controller(
+                self._tui_state.config, process)
+            self._terminal_controllers[process.index] = terminal_controller
+        return terminal_controller
+
+    def _create_terminal_controller(self, config: ProcMuxConfig,
+                                    process: Process) -> TerminalController:
+        return TerminalController(self, config, process)
 
     def autostart(self):
         logger.info('in autostart')
@@ -466,6 +985,37 @@ class TUIController:
                     'processes with autostart enabled must not have interpolations/field replacements'
                 self.start_process(process)
 
+    def restore_session(self):
+        """relaunches only what was running when the previous session ended, instead of autostarting"""
+        session = self._previous_session
+        logger.info(f'restoring session - running: {list(session.running)}')
+        for name, tail in session.tails.items():
+            process = self._process_state.get_process_by_name(name)
+            if process:
+                self._get_or_create_terminal_controller(
+                    process).restored_output = tail
+        if session.filter_text:
+            self._process_state.apply_filter(session.filter_text)
+            self.on_filter_change()
+        if session.selected:
+            for y_pos, process in enumerate(self.filtered_process_list):
+                if process.name == session.selected:
+                    self._process_state.set_selected_process_by_y_pos(y_pos)
+                    self._on_selection_change()
+                    break
+        for name, values in session.running.items():
+            process = self._process_state.get_process_by_name(name)
+            if not process:
+                logger.info(f'{name} is no longer configured, not restoring it')
+                continue
+            interpolations, missing = self._interpolation_state.resolve(
+                name, process.config.interpolations, values)
+            if missing:
+                logger.error(
+                    f'cannot restore {name}, no values for fields: {missing}')
+                continue
+            self.start_process(process, interpolations)
+
     def quit(self):
         logger.info('in quit')
         application = get_app()
@@ -478,10 +1028,37 @@ class TUIController:
         if self._server_controller:
             self._server_controller.stop()
 
+        if self._config_watcher:
+            self._config_watcher.stop()
+
+        loop_monitor.stop()
+        self._process_tree_watcher.stop()
+        self._start_queue.clear()
+        self._task_cache.close()
+        for handover in list(self._handovers.values()):
+            self._cancel_handover(handover.process)
+        # the processes of peers keep running, quitting only disconnects from them
+        for client in self._peers.values():
+            client.close()
+        logger.info(f'timings:\n{timings.report()}')
+
+        # the session is closed before stopping anything, so it still lists what was running
+        for process in self.process_list:
+            if process.peer:
+                continue
+            terminal_controller = self._terminal_controllers.get(process.index)
+            if terminal_controller and terminal_controller.terminal:
+                self._session_journal.record_tail(
+                    process.name,
+                    terminal_controller.get_output_tail(
+                        self.session_tail_lines))
+        self._session_journal.close()
+
         logger.info('quit - sending kill signals')
-        for tc in self._terminal_controllers.values():
-            tc.stop_process()
-        if not self._process_state.has_running_processes:
+        for tc in [*self._terminal_controllers.values(), *self._retiring]:
+            if not tc.process.peer:
+                tc.stop_process()
+        if not self._process_state.has_running_processes and not self._retiring:
             application.exit()
 
     def _quit(self):
@@ -0,0 +1,130 @@
+import dataclasses
+import time
+from typing import Callable
+
+import pyte
+from prompt_toolkit.application.current import set_app
+from prompt_toolkit.eventloop import get_event_loop
+from prompt_toolkit.input.defaults import create_pipe_input
+from prompt_toolkit.layout.screen import Size
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from procmux.config import ProcMuxConfig
+from procmux.tui.app import create_application
+
+
+class _ScreenWriter:
+    """the stdout handed to prompt_toolkit, everything it writes is fed into a pyte screen"""
+
+    encoding = 'utf-8'
+
+    def __init__(self, stream: pyte.Stream):
+        self._stream = stream
+
+    def write(self, data: str):
+        self._stream.feed(data)
+
+    def flush(self):
+        pass
+
+
+class TUIHarness:
+    """
+    drives the real TUI with pipe input and renders it into a pyte screen instead of a terminal.
+    the event loop is stepped until the UI is idle (nothing to read, no redraw scheduled),
+    so tests and benchmarks never have to sleep.
+    """
+
+    def __init__(self,
+                 config: ProcMuxConfig,
+                 columns: int = 100,
+                 rows: int = 30,
+                 autostart: bool = True):
+        self.screen = pyte.Screen(columns, rows)
+        self._input = create_pipe_input()
+        output = Vt100_Output(_ScreenWriter(pyte.Stream(self.screen)),
+                              lambda: Size(rows=rows, columns=columns),
+                              write_binary=False)
+        # the loop is stepped by hand, its scheduling lag would only measure the test code in between
+        config = dataclasses.replace(config, slow_callback_ms=0)
+        self.application, self.controller = create_application(
+            config, input=self._input, output=output)
+        self._autostart = autostart
+        self._loop = get_event_loop()
+        self._future = None
+
+    def __enter__(self) -> 'TUIHarness':
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.screen.display)
+
+    def start(self):
+        if self._autostart:
+            with set_app(self.application):
+                self.controller.autostart()
+        self._future = self.application.run_async()
+        self.advance()
+
+    def _step(self, timeout: float) -> bool:
+        # relies on the prompt_toolkit 2.0 posix event loop internals
+        if not self._loop.selector.select(timeout):
+            return False
+        self._loop._run_once(None)
+        return True
+
+    def advance(self, timeout: float = 5.0):
+        """runs the event loop until the UI is idle"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._step(0) and not self.application.invalidated:
+                return
+        raise TimeoutError(f'the TUI did not become idle within {timeout}s')
+
+    def send_keys(self, *keys: str):
+        for key in keys:
+            self._input.send_text(key)
+            self.advance()
+
+    def wait_until(self,
+                   predicate: Callable[[], bool],
+                   timeout: float = 5.0) -> bool:
+        """advances until the predicate holds, for things that happen outside the UI (IE: process output)"""
+        deadline = time.monotonic() + timeout
+        self.advance()
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._step(min(remaining, 0.05))
+            self.advance()
+        return True
+
+    def run_until(self,
+                  predicate: Callable[[], bool],
+                  timeout: float = 5.0) -> bool:
+        """steps the event loop until the predicate holds, also while the UI is never idle (IE: streaming output)"""
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._step(min(remaining, 0.05))
+        return True
+
+    def wait_for_text(self, text: str, timeout: float = 5.0) -> bool:
+        return self.wait_until(lambda: text in self.text, timeout)
+
+    def stop(self, timeout: float = 10.0):
+        if self._future and not self._future.done():
+            with set_app(self.application):
+                self.controller.quit()
+            deadline = time.monotonic() + timeout
+            while not self._future.done() and time.monotonic() < deadline:
+                self._step(0.05)
+        self._input.close()
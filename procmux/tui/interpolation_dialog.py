@@ -1,4 +1,4 @@
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional
 from prompt_toolkit.application import get_app
 from prompt_toolkit.layout import Dimension, Float, FloatContainer, HSplit, VSplit
 from prompt_toolkit.widgets import Box, Button, Frame, TextArea
@@ -12,11 +12,13 @@ from procmux.util.interpolation import Interpolation
 
 class InterpolationDialog():
 
-    def __init__(
-        self, process: Process, run_in_background: bool, config: ProcMuxConfig,
-        float_container: FloatContainer,
-        on_finished: Callable[[Process, bool, Optional[List[Interpolation]]],
-                              None]):
+    def __init__(self,
+                 process: Process,
+                 run_in_background: bool,
+                 config: ProcMuxConfig,
+                 float_container: FloatContainer,
+                 on_finished: Callable[[Process, bool, Optional[List[Interpolation]]], None],
+                 remembered_values: Optional[Dict[str, str]] = None):
         self._process = process
         self._run_in_background = run_in_background
         self._interpolations = process.config.interpolations
@@ -24,6 +26,7 @@ class InterpolationDialog():
         self._float_container = float_container
         self._on_finished = on_finished
         self._tab_ix = 0
+        remembered_values = remembered_values or {}
 
         self._text_inputs = [
             TextArea(
@@ -34,7 +37,8 @@ class InterpolationDialog():
                 style="class:input-field",
                 multiline=False,
                 wrap_lines=False,
-                text=interp.default_value,
+                text=remembered_values.get(interp.field,
+                                           interp.default_value),
                 focus_on_click=True,
             ) for interp in self._interpolations
         ]
@@ -0,0 +1,89 @@
+import json
+import os
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from procmux.config import ProcMuxConfig
+from procmux.log import logger
+from procmux.util.interpolation import Interpolation
+
+
+class InterpolationState:
+    """
+    remembers the last field values each process was started with.
+    values are persisted to interpolations.json in the state dir so they survive restarts.
+    """
+
+    _file_name = 'interpolations.json'
+
+    def __init__(self, config: ProcMuxConfig):
+        state_dir = config.resolved_state_dir
+        self._path: Optional[str] = os.path.join(
+            state_dir, self._file_name) if state_dir else None
+        self._values: Optional[Dict[str, Dict[str, str]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if self._values is None:
+            self._values = {}
+            if self._path and os.path.exists(self._path):
+                try:
+                    with open(self._path) as f:
+                        self._values = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(
+                        f'failed to read remembered interpolation values from {self._path}: {e}'
+                    )
+        return self._values
+
+    def _save(self):
+        if not self._path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._load(), f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(
+                f'failed to persist interpolation values to {self._path}: {e}')
+
+    def get_values(self, process_name: str) -> Dict[str, str]:
+        return dict(self._load().get(process_name, {}))
+
+    def remember(self, process_name: str,
+                 interpolations: List[Interpolation]):
+        values = {i.field: i.value for i in interpolations}
+        if self._load().get(process_name) == values:
+            return
+        self._load()[process_name] = values
+        self._save()
+
+    def resolve(
+        self,
+        process_name: str,
+        fields: List[Interpolation],
+        overrides: Optional[Mapping[str, str]] = None
+    ) -> Tuple[List[Interpolation], List[str]]:
+        """
+        layers explicit overrides over the remembered values over the configured defaults.
+        returns the resolved interpolations and the names of fields that have no value at all.
+        """
+        overrides = overrides or {}
+        remembered = self.get_values(process_name)
+        resolved = []
+        missing = []
+        for interp in fields:
+            if interp.field in overrides:
+                value = overrides[interp.field]
+            elif interp.field in remembered:
+                value = remembered[interp.field]
+            elif interp.default_value:
+                value = interp.default_value
+            else:
+                missing.append(interp.field)
+                continue
+            resolved.append(
+                Interpolation(field=interp.field,
+                              value=value,
+                              default_value=interp.default_value))
+        return resolved, missing
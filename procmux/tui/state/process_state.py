@@ -2,6 +2,7 @@ from typing import Dict, List, Optional
 
 from procmux.config import ProcMuxConfig, ProcessConfig
 from procmux.tui.types import Process
+from procmux.util.timing import timings
 
 
 class ProcessState:
@@ -14,6 +15,8 @@ class ProcessState:
         self.selected_process: Optional[Process] = self.filtered_process_list[
             0] if self.filtered_process_list else None
         self._filter: str = ''
+        # indices are never reused, a removed process may still own a terminal until it exits
+        self._next_index: int = len(self.process_list)
 
     @property
     def is_selected_process_running(self) -> bool:
@@ -22,7 +25,7 @@ class ProcessState:
     @property
     def has_running_processes(self) -> bool:
         for process in self.process_list:
-            if process.running:
+            if process.running and not process.peer:
                 return True
         return False
 
@@ -39,6 +42,30 @@ class ProcessState:
                 self.filtered_process_list):
             self.selected_process = self.filtered_process_list[y_pos]
 
+    def get_process_by_name(self, name: str) -> Optional[Process]:
+        return next((p for p in self.process_list if p.name == name), None)
+
+    def add_process(self, name: str, process_config: ProcessConfig) -> Process:
+        process = Process(self._next_index, process_config, name)
+        self._next_index += 1
+        self.process_list = self._sort_process_list(
+            [*self.process_list, process])
+        self._reapply_filter()
+        return process
+
+    def remove_process(self, process: Process):
+        self.process_list = [
+            p for p in self.process_list if p.index != process.index
+        ]
+        self._reapply_filter()
+
+    def _reapply_filter(self):
+        selected = self.selected_process
+        self.apply_filter(self._filter)
+        if selected and any(p.index == selected.index
+                            for p in self.filtered_process_list):
+            self.selected_process = selected
+
     def _create_process_list(
             self, process_config: Dict[str, ProcessConfig]) -> List[Process]:
         return self._sort_process_list([
@@ -51,6 +78,7 @@ class ProcessState:
             return sorted(ps, key=lambda p: p.name)
         return ps
 
+    @timings.timed('process_state.apply_filter')
     def apply_filter(self, filter_text: str):
         self._filter = filter_text
 
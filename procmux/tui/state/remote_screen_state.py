@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Tuple
+
+StyledLine = List[Tuple[str, str]]
+
+
+class RemoteScreenState:
+    """the viewer side copy of a screen kept by the supervisor"""
+
+    def __init__(self):
+        self.columns = 0
+        self.rows = 0
+        self.cursor: Tuple[int, int] = (0, 0)
+        self.show_cursor = True
+        self.app_cursor_keys = False
+        self.lines: Dict[int, StyledLine] = {}
+
+    def apply(self, message: Dict[str, Any]):
+        if message['full']:
+            self.lines = {}
+        for row, runs in message['lines'].items():
+            line = [(style, text) for style, text in runs]
+            if line:
+                self.lines[int(row)] = line
+            else:
+                self.lines.pop(int(row), None)
+        self.columns = message['columns']
+        self.rows = message['rows']
+        x, y = message['cursor']
+        self.cursor = (x, y)
+        self.show_cursor = message['show_cursor']
+        self.app_cursor_keys = message['app_cursor_keys']
+
+    def get_line(self, row: int) -> StyledLine:
+        return self.lines.get(row, [])
+
+    def get_text(self, max_lines: int) -> str:
+        if not self.lines:
+            return ''
+        last_row = max(self.lines)
+        rows = range(max(0, last_row - max_lines + 1), last_row + 1)
+        return '\n'.join(''.join(text for _, text in self.get_line(row))
+                         for row in rows)
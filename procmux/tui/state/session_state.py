@@ -0,0 +1,145 @@
+import json
+import os
+import queue
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+from procmux.log import logger
+
+
+@dataclass
+class SessionSnapshot:
+    running: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    selected: Optional[str] = None
+    filter_text: str = ''
+    tails: Dict[str, str] = field(default_factory=dict)
+
+    def apply(self, record: Dict[str, Any]):
+        event = record.get('event')
+        if event == 'snapshot':
+            self.running = dict(record.get('running') or {})
+            self.selected = record.get('selected')
+            self.filter_text = record.get('filter_text') or ''
+            self.tails = dict(record.get('tails') or {})
+        elif event == 'started':
+            self.running[record['name']] = dict(record.get('values') or {})
+        elif event == 'stopped':
+            self.running.pop(record['name'], None)
+        elif event == 'tail':
+            self.tails[record['name']] = record['tail']
+        elif event == 'selected':
+            self.selected = record['name']
+        elif event == 'filter':
+            self.filter_text = record['text']
+
+
+def load_session(path: str) -> SessionSnapshot:
+    snapshot = SessionSnapshot()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    snapshot.apply(json.loads(line))
+                except (ValueError, KeyError):
+                    # a crash can leave a torn last line behind, everything before it is still good
+                    break
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f'failed to read the session file {path}: {e}')
+    return snapshot
+
+
+class SessionJournal:
+    """
+    records what is running in this session to session.jsonl in the state dir, so `--restore` can bring it back.
+    records are appended by a background thread (callers never wait on disk),
+    every compact_after records the journal is rewritten as a single snapshot record.
+    """
+
+    _file_name = 'session.jsonl'
+    compact_after = 500
+
+    def __init__(self, state_dir: Optional[str]):
+        self._path: Optional[str] = os.path.join(
+            state_dir, self._file_name) if state_dir else None
+        self._queue: 'queue.SimpleQueue[Optional[Dict[str, Any]]]' = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self) -> SessionSnapshot:
+        """returns the previous session, the journal starts over from an empty session"""
+        if not self._path or self._thread:
+            return SessionSnapshot()
+        previous = load_session(self._path)
+        self._thread = threading.Thread(target=self._write_records,
+                                        name='procmux-session-journal',
+                                        daemon=True)
+        self._thread.start()
+        return previous
+
+    def close(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _record(self, record: Dict[str, Any]):
+        if self._thread:
+            self._queue.put(record)
+
+    def record_started(self, name: str, values: Dict[str, str]):
+        self._record({'event': 'started', 'name': name, 'values': values})
+
+    def record_stopped(self, name: str, tail: str):
+        self._record({'event': 'tail', 'name': name, 'tail': tail})
+        self._record({'event': 'stopped', 'name': name})
+
+    def record_tail(self, name: str, tail: str):
+        self._record({'event': 'tail', 'name': name, 'tail': tail})
+
+    def record_selected(self, name: Optional[str]):
+        self._record({'event': 'selected', 'name': name})
+
+    def record_filter(self, text: str):
+        self._record({'event': 'filter', 'text': text})
+
+    def _write_records(self):
+        snapshot = SessionSnapshot()
+        self._compact(snapshot)
+        appended = 0
+        try:
+            f = open(self._path, 'a')
+        except OSError as e:
+            logger.error(f'failed to open the session file {self._path}: {e}')
+            return
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                snapshot.apply(record)
+                f.write(json.dumps(record) + '\n')
+                appended += 1
+                if self._queue.empty():
+                    f.flush()
+                if appended >= self.compact_after:
+                    f.close()
+                    self._compact(snapshot)
+                    appended = 0
+                    f = open(self._path, 'a')
+        except OSError as e:
+            logger.error(f'failed to write the session file {self._path}: {e}')
+        finally:
+            f.close()
+        self._compact(snapshot)
+
+    def _compact(self, snapshot: SessionSnapshot):
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'event': 'snapshot', **asdict(snapshot)}) + '\n')
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f'failed to write the session file {self._path}: {e}')
@@ -6,6 +6,7 @@ from procmux.tui.types import Process
 
 
 class TerminalState:
+    __slots__ = ('process', 'running', 'scroll_mode', 'terminal')
 
     def __init__(self, process: Process):
         self.process = process
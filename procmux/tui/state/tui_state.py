@@ -12,6 +12,7 @@ class TUIState:
         self.zoomed_in: bool = False
         self.filter_mode: bool = False
         self.docs_open: bool = False
+        self.show_process_tree: bool = False
         self.quitting: bool = False
         self._focus_targets: List[FocusTarget] = []
         self._modal_open: bool = False
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Any
+from typing import Any, Optional
 
-from procmux.config import ProcessConfig
+from procmux.config import ProcessConfig, compact
 
 
 class FocusWidget(Enum):
@@ -25,10 +25,19 @@ class KeybindingDocumentation:
     help: str
 
 
-@dataclass
+@dataclass(**compact)
 class Process:
     index: int
     config: ProcessConfig
     name: str
     running: bool = False
     scroll_mode: bool = False
+    restart_pending: bool = False
+    # the name of the peer (another procmux instance) the process belongs to, None for local processes
+    peer: Optional[str] = None
+    # waiting for a start slot, see StartQueue
+    start_queued: bool = False
+    # the peer could not be reached, `running` is the last known state
+    stale: bool = False
+    # the last start was skipped, the inputs did not change since the last successful run (see TaskCache)
+    up_to_date: bool = False
@@ -1,19 +1,23 @@
-from typing import Callable, Union
+from typing import Optional
 
 from prompt_toolkit import HTML
-from prompt_toolkit.formatted_text import merge_formatted_text
+from prompt_toolkit.formatted_text import merge_formatted_text, to_formatted_text
 from prompt_toolkit.formatted_text.base import FormattedText
 from prompt_toolkit.layout import FormattedTextControl, Window
 from prompt_toolkit.widgets import Frame
 
-from procmux.tui.types import FocusWidget
+from procmux.log import logger
+from procmux.tui.types import FocusWidget, Process
 from procmux.tui.controller.tui_controller import TUIController
+from procmux.util.file_cache import read_cached
+from procmux.util.memo import LastValueCache
 
 
 class DocsDialog:
 
     def __init__(self, controller: TUIController):
         self._controller: TUIController = controller
+        self._formatted_text: LastValueCache[FormattedText] = LastValueCache()
         self._container: Frame = Frame(
             title=self._get_title,
             body=Window(
@@ -27,19 +31,37 @@ class DocsDialog:
         process = self._controller.selected_process
         return process.name if process else 'Help'
 
-    def _get_formatted_text(self) -> Union[HTML, Callable[[], FormattedText]]:
+    def _get_docs(self, process: Process) -> Optional[str]:
+        docs_file = process.config.resolved_docs_file
+        if not docs_file:
+            return process.config.docs
+        try:
+            return read_cached(docs_file)
+        except OSError as e:
+            logger.error(f'failed to read the docs of {process.name}: {e}')
+            return f'<b>failed to read {docs_file}</b>'
+
+    def _get_formatted_text(self) -> FormattedText:
         process = self._controller.selected_process
-        if process:
-            result = []
-            if process.config.description:
-                result.append(HTML(f'<b>{process.config.description}</b>\n'))
-            if process.config.docs:
-                result.append(HTML(process.config.docs))
-            if len(result) == 0:
-                result.append(f'No docs available for process: {process.name}')
-
-            return merge_formatted_text(result)
-        return HTML('No process is currently selected.')
+        if not process:
+            return self._formatted_text.get(
+                (None, ), lambda: to_formatted_text(
+                    HTML('No process is currently selected.')))
+        docs = self._get_docs(process)
+        return self._formatted_text.get(
+            (process, process.config, docs),
+            lambda: self._build_formatted_text(process, docs))
+
+    def _build_formatted_text(self, process: Process,
+                              docs: Optional[str]) -> FormattedText:
+        result = []
+        if process.config.description:
+            result.append(HTML(f'<b>{process.config.description}</b>\n'))
+        if docs:
+            result.append(HTML(docs))
+        if len(result) == 0:
+            result.append(f'No docs available for process: {process.name}')
+        return to_formatted_text(merge_formatted_text(result))
 
     def __pt_container__(self):
         return self._container
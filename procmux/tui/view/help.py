@@ -1,11 +1,12 @@
 from __future__ import unicode_literals
 
-from typing import Callable
+from weakref import WeakKeyDictionary
 
-from prompt_toolkit.formatted_text import FormattedText, HTML, merge_formatted_text
+from prompt_toolkit.formatted_text import FormattedText, HTML, merge_formatted_text, to_formatted_text
 from prompt_toolkit.layout import Window
 from prompt_toolkit.layout.controls import FormattedTextControl
 
+from procmux.tui.keybindings import DocumentedKeybindings
 from procmux.tui.types import KeybindingDocumentation
 from procmux.tui.controller.tui_controller import TUIController
 
@@ -14,13 +15,24 @@ class HelpPanel:
 
     def __init__(self, controller: TUIController):
         self._controller: TUIController = controller
+        # keybinding sets are cached (and never change once built), so is the text rendered from them
+        self._formatted_text_cache: 'WeakKeyDictionary[DocumentedKeybindings, FormattedText]' = \
+            WeakKeyDictionary()
         self._container: Window = Window(height=1,
                                          content=FormattedTextControl(
                                              text=self._get_formatted_text,
                                              focusable=False,
                                              show_cursor=False))
 
-    def _get_formatted_text(self) -> Callable[[], FormattedText]:
+    def _get_formatted_text(self) -> FormattedText:
+        kb = self._controller.get_app_keybindings()
+        formatted_text = self._formatted_text_cache.get(kb)
+        if formatted_text is None:
+            formatted_text = self._formatted_text_cache[kb] = \
+                self._build_formatted_text(kb)
+        return formatted_text
+
+    def _build_formatted_text(self, kb: DocumentedKeybindings) -> FormattedText:
         delimiter = " | "
 
         def intersperse(lst, item):
@@ -30,11 +42,11 @@ class HelpPanel:
 
         result = [
             self._get_key_combo_text(help_)
-            for help_ in self._controller.get_app_keybindings().help_docs
+            for help_ in kb.help_docs
         ]
         if result:
             result = intersperse(result, delimiter)
-        return merge_formatted_text(result)
+        return to_formatted_text(merge_formatted_text(result))
 
     def _get_key_combo_text(self, help_doc: KeybindingDocumentation) -> HTML:
         return HTML(f'<b>&lt;{help_doc.help}&gt;</b> {help_doc.label}')
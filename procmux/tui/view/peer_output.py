@@ -0,0 +1,28 @@
+from typing import Callable
+
+from prompt_toolkit.layout import Window
+from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.layout.screen import Point
+
+
+class PeerOutput:
+    """the tail of the output of a peer's process (read only), kept scrolled to the last line"""
+
+    def __init__(self, get_output: Callable[[], str], width, height):
+        self._get_output = get_output
+        self.control = FormattedTextControl(
+            text=get_output,
+            focusable=True,
+            show_cursor=False,
+            get_cursor_position=self._get_cursor_position)
+        self._window = Window(content=self.control,
+                              style='class:terminal',
+                              width=width,
+                              height=height,
+                              wrap_lines=False)
+
+    def _get_cursor_position(self) -> Point:
+        return Point(x=0, y=self._get_output().count('\n'))
+
+    def __pt_container__(self):
+        return self._window
@@ -1,31 +1,83 @@
 from __future__ import unicode_literals
-from typing import Callable
 
-from prompt_toolkit.formatted_text import HTML, merge_formatted_text
+from typing import List
+
+from prompt_toolkit.formatted_text import HTML, to_formatted_text
 from prompt_toolkit.formatted_text.base import FormattedText
 from prompt_toolkit.layout import Window
 from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.layout.dimension import Dimension
 
+from procmux.process.ports import ListeningPort, PortConflict
+from procmux.process.tree import TreeNode
 from procmux.tui.controller.tui_controller import TUIController
+from procmux.tui.types import Process
+from procmux.util.memo import LastValueCache
+
+_max_tree_rows = 10
+
+
+def _format_tree_row(node: TreeNode) -> str:
+    info = node.info
+    return (f'{info.pid:>7} {info.cpu_percent:>5.1f}% {info.rss_kb / 1024:>7.1f}M '
+            f'{"  " * node.depth}{info.command}')
 
 
 class ProcessDescriptionPanel:
 
     def __init__(self, controller: TUIController):
         self._controller: TUIController = controller
-        self._container: Window = Window(height=1,
+        self._formatted_text: LastValueCache[FormattedText] = LastValueCache()
+        self._container: Window = Window(height=self._get_height,
                                          content=FormattedTextControl(
                                              text=self._get_formatted_text,
                                              focusable=False,
                                              show_cursor=False))
 
-    def _get_formatted_text(self) -> Callable[[], FormattedText]:
+    def _get_tree(self) -> List[TreeNode]:
+        process = self._controller.selected_process
+        if not process or not self._controller.show_process_tree:
+            return []
+        return self._controller.get_process_tree(process)
+
+    def _get_conflicts(self) -> List[PortConflict]:
+        process = self._controller.selected_process
+        return self._controller.get_port_conflicts(process) if process else []
+
+    def _get_height(self) -> Dimension:
+        tree = self._get_tree()
+        # the description, the header and the rows (plus a line for the ones that did not fit)
+        rows = 2 + min(len(tree), _max_tree_rows + 1) if tree else 1
+        return Dimension.exact(rows + len(self._get_conflicts()))
+
+    def _get_formatted_text(self) -> FormattedText:
         process = self._controller.selected_process
         if not process:
-            return merge_formatted_text([HTML('')])
+            return self._formatted_text.get((None, ), lambda: to_formatted_text(HTML('')))
+        tree = self._get_tree()
+        ports = self._controller.get_listening_ports(process)
+        conflicts = self._get_conflicts()
+        # the config is part of the key, a reload replaces it. the rest is replaced on every refresh
+        return self._formatted_text.get(
+            (process, process.config, tree, ports, conflicts),
+            lambda: self._build_formatted_text(process, tree, ports, conflicts))
+
+    def _build_formatted_text(self, process: Process, tree: List[TreeNode],
+                              ports: List[ListeningPort],
+                              conflicts: List[PortConflict]) -> FormattedText:
         desc = " - " + process.config.description if process.config.description else ''
-        result = [HTML(f'<b>{process.name}</b>{desc}')]
-        return merge_formatted_text(result)
+        result = to_formatted_text(HTML(f'<b>{process.name}</b>{desc}'))
+        if ports:
+            result.append(('', f' [ports: {", ".join(str(p) for p in ports)}]'))
+        for conflict in conflicts:
+            result.append(('fg:ansiyellow bold', f'\n⚠ {conflict}'))
+        if tree:
+            rows = [_format_tree_row(node) for node in tree[:_max_tree_rows]]
+            if len(tree) > _max_tree_rows:
+                rows.append(f'... {len(tree) - _max_tree_rows} more')
+            result.append(('bold', f'\n{"pid":>7} {"cpu":>6} {"rss":>8} command'))
+            result.append(('', '\n' + '\n'.join(rows)))
+        return result
 
     def __pt_container__(self):
         return self._container
@@ -0,0 +1,68 @@
+from typing import Callable, Optional, Tuple
+
+from prompt_toolkit.layout.screen import Point
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.keys import Keys
+from prompt_toolkit.layout import Window
+from prompt_toolkit.layout.controls import UIContent, UIControl
+from ptterm.key_mappings import prompt_toolkit_key_to_vt100_key
+
+from procmux.tui.state.remote_screen_state import RemoteScreenState
+
+
+class _RemoteScreenControl(UIControl):
+
+    def __init__(self, screen_state: RemoteScreenState,
+                 on_input: Callable[[str], None],
+                 on_resize: Callable[[int, int], None]):
+        self._screen_state = screen_state
+        self._on_input = on_input
+        self._on_resize = on_resize
+        self._size: Optional[Tuple[int, int]] = None
+
+    def is_focusable(self) -> bool:
+        return True
+
+    def create_content(self, width: int, height: int) -> UIContent:
+        if (width, height) != self._size:
+            # the supervisor resizes the pty to whatever space the viewer renders it in
+            self._size = (width, height)
+            self._on_resize(width, height)
+        x, y = self._screen_state.cursor
+        return UIContent(get_line=self._screen_state.get_line,
+                         line_count=max(self._screen_state.rows, 1),
+                         show_cursor=self._screen_state.show_cursor,
+                         cursor_position=Point(x=x, y=y))
+
+    def get_key_bindings(self) -> KeyBindings:
+        bindings = KeyBindings()
+
+        @bindings.add(Keys.Any)
+        def _(event):
+            for key_press in event.key_sequence:
+                self._on_input(
+                    prompt_toolkit_key_to_vt100_key(
+                        key_press.key, self._screen_state.app_cursor_keys))
+
+        @bindings.add(Keys.BracketedPaste)
+        def _(event):
+            self._on_input(event.data)
+
+        return bindings
+
+
+class RemoteTerminal:
+    """renders a process screen streamed from the supervisor, keys are sent back to it"""
+
+    def __init__(self, screen_state: RemoteScreenState,
+                 on_input: Callable[[str], None],
+                 on_resize: Callable[[int, int], None], width, height):
+        self.control = _RemoteScreenControl(screen_state, on_input, on_resize)
+        self._window = Window(content=self.control,
+                              style='class:terminal',
+                              width=width,
+                              height=height,
+                              wrap_lines=False)
+
+    def __pt_container__(self):
+        return self._window
@@ -95,9 +95,16 @@ class SideBar:
         result = []
         for process in self._controller.filtered_process_list:
             status = "UP" if process.running else "DOWN"
+            if process.up_to_date and not process.running:
+                status = "OK"
+            if process.start_queued:
+                status = "WAIT"
+            if process.stale:
+                # the peer the process belongs to is unreachable
+                status = "??"
             status_fg = (
                 self._controller.config.style.status_running_color
-                if process.running
+                if process.running or status == "OK"
                 else self._controller.config.style.status_stopped_color
             )
 
@@ -0,0 +1,176 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from procmux.log import logger
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """
+    minimal ctypes binding to the linux inotify API.
+    directories are watched (not the files themselves) so that editors which save by
+    writing a temp file and renaming it over the original are still detected.
+    """
+
+    def __init__(self, directories: List[str]):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd: int = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._watch_dirs: Dict[int, str] = {}
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(self.fd,
+                                              os.fsencode(directory),
+                                              _WATCH_MASK)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(),
+                              f'inotify_add_watch failed for {directory}')
+            self._watch_dirs[wd] = directory
+
+    def read_paths(self) -> List[str]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _mask, _cookie, name_len = _EVENT_HEADER.unpack_from(
+                data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            directory = self._watch_dirs.get(wd)
+            if directory is not None:
+                paths.append(os.path.join(directory, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ConfigWatcher:
+    """
+    watches the config files on a background thread and calls on_change once the files
+    have been quiet for `debounce` seconds. inotify is used on linux, everywhere else
+    (or if inotify is unavailable) the files are polled by mtime.
+    """
+
+    def __init__(self,
+                 config_files: List[str],
+                 on_change: Callable[[], None],
+                 debounce: float = 0.3,
+                 poll_interval: float = 1.0):
+        self._config_files = [os.path.abspath(f) for f in config_files]
+        self._on_change = on_change
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run,
+                                        name='procmux-config-watcher',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        os.write(self._wake_w, b'x')
+        if self._thread:
+            self._thread.join(2)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _run(self):
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                inotify = _Inotify(
+                    sorted({os.path.dirname(f)
+                            for f in self._config_files}))
+            except (OSError, AttributeError) as e:
+                logger.error(
+                    f'failed to set up inotify, falling back to polling the config files: {e}'
+                )
+        try:
+            if inotify:
+                self._watch_inotify(inotify)
+            else:
+                self._watch_poll()
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _fire(self):
+        try:
+            self._on_change()
+        except Exception as e:
+            logger.error(f'config change handler failed: {e}')
+
+    def _watch_inotify(self, inotify: _Inotify):
+        watched = set(self._config_files)
+        pending_since: Optional[float] = None
+        while not self._stop_event.is_set():
+            timeout = self._poll_interval
+            if pending_since is not None:
+                timeout = max(
+                    0.0, pending_since + self._debounce - time.monotonic())
+            readable, _, _ = select.select([inotify.fd, self._wake_r], [],
+                                           [], timeout)
+            if inotify.fd in readable:
+                if watched.intersection(inotify.read_paths()):
+                    # restart the debounce window on every write
+                    pending_since = time.monotonic()
+                continue
+            if readable:
+                continue
+            if pending_since is not None:
+                pending_since = None
+                self._fire()
+
+    def _get_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for config_file in self._config_files:
+            try:
+                mtimes[config_file] = os.stat(config_file).st_mtime
+            except OSError:
+                mtimes[config_file] = 0.0
+        return mtimes
+
+    def _watch_poll(self):
+        last_mtimes = self._get_mtimes()
+        while not self._stop_event.wait(self._poll_interval):
+            mtimes = self._get_mtimes()
+            if mtimes == last_mtimes:
+                continue
+            # wait for the writes to settle before reloading
+            while not self._stop_event.wait(self._debounce):
+                settled = self._get_mtimes()
+                if settled == mtimes:
+                    break
+                mtimes = settled
+            last_mtimes = mtimes
+            self._fire()
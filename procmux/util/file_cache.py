@@ -0,0 +1,20 @@
+import os
+from typing import Dict, Tuple
+
+# path -> (mtime, size, contents)
+_cache: Dict[str, Tuple[int, int, str]] = {}
+
+
+def read_cached(path: str) -> str:
+    """
+    reads a text file, only touching its contents again when its mtime or size changed.
+    the same str object is returned while the file is unchanged, so callers can cache what they derive from it
+    """
+    stat = os.stat(path)
+    cached = _cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, encoding='utf-8') as f:
+        contents = f.read()
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, contents)
+    return contents
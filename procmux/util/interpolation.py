@@ -1,41 +1,76 @@
 from collections import namedtuple
+from functools import lru_cache
 import re
-from typing import List, Optional
+from typing import List, Mapping, Optional, Tuple, Union
 
-_replacement_regex = r"<([^:>]*):?([^>]*)>"
+_replacement_regex = re.compile(r"<([^:>]*):?([^>]*)>")
 
 Interpolation = namedtuple('Interpolation',
                            ['field', 'value', 'default_value'])
 
 
-def parse_interpolations(*cmds) -> List[Interpolation]:
+class InterpolationTemplate:
+    """
+    a command string split once into literal text and replacement fields,
+    so rendering is a single join instead of a regex substitution per field.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # str entries are literal text, tuple entries are (field, original placeholder text)
+        self._segments: List[Union[str, Tuple[str, str]]] = []
+        self.fields: List[Interpolation] = []
+
+        position = 0
+        for match in _replacement_regex.finditer(text):
+            if match.start() > position:
+                self._segments.append(text[position:match.start()])
+            field = match.group(1).strip()
+            default_value = match.group(2).strip()
+            self._segments.append((field, match.group(0)))
+            self.fields.append(
+                Interpolation(field=field,
+                              value=default_value,
+                              default_value=default_value))
+            position = match.end()
+        if position < len(text):
+            self._segments.append(text[position:])
+
+    def render(self, values: Mapping[str, str]) -> str:
+        if not self.fields:
+            return self.text
+        return ''.join(
+            segment if isinstance(segment, str) else values.
+            get(segment[0], segment[1]) for segment in self._segments)
+
+
+@lru_cache(maxsize=512)
+def compile_template(text: str) -> InterpolationTemplate:
+    return InterpolationTemplate(text)
+
+
+def collect_fields(
+        templates: List[InterpolationTemplate]) -> List[Interpolation]:
     interpolations = []
     field_names = set()
-    for cmd in cmds:
-        matches = re.findall(_replacement_regex, cmd)
-        for m in matches:
-            value = ''
-            if m:
-                field = m[0].strip()
-                if len(m) == 2:
-                    value = m[1].strip()
-                interpolations.append(
-                    Interpolation(field=field,
-                                  value=value,
-                                  default_value=value))
-                assert field not in field_names, f'A duplicate replacement ' \
-                                                 f'field detected during interpolation - field: "{field}" \n' \
-                                                 f'All replacement fields must have unique names per process definition'
-                field_names.add(field)
+    for template in templates:
+        for interp in template.fields:
+            assert interp.field not in field_names, \
+                f'A duplicate replacement field detected during interpolation - field: "{interp.field}" \n' \
+                'All replacement fields must have unique names per process definition'
+            field_names.add(interp.field)
+            interpolations.append(interp)
     return interpolations
 
 
+def parse_interpolations(*cmds) -> List[Interpolation]:
+    return collect_fields([compile_template(cmd) for cmd in cmds])
+
+
 def interpolate(text: str,
                 interpolations: Optional[List[Interpolation]] = None) -> str:
     if not interpolations:
         return text
-    for interp in interpolations:
-        replace_regex = rf'<\s*{interp.field}\s*:?\s*{interp.default_value}\s*>'
-        text = re.sub(replace_regex, interp.value, text)
-
-    return text
+    return compile_template(text).render(
+        {interp.field: interp.value
+         for interp in interpolations})
@@ -0,0 +1,153 @@
+import functools
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from procmux.log import logger
+from procmux.util.timing import timings
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_stack_depth = 20
+
+
+class LoopMonitor:
+    """
+    watches the event loop from a separate thread.
+    every interval a probe is scheduled on the loop, the time it takes to run is the scheduling lag.
+    when a probe is late by more than the budget the loop thread's stack is sampled, so the stall
+    can be attributed to whatever was running. callbacks wrapped with `tracked` are also timed
+    individually and recorded when they run over the budget.
+    """
+
+    def __init__(self, max_records: int = 50):
+        self.budget_ms = 0.0
+        self.interval = 0.25
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self.slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self._schedule: Optional[Callable[[Callable[[], None]], None]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._current_callback: Optional[str] = None
+        self._pending_stall: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self,
+              schedule: Callable[[Callable[[], None]], None],
+              budget_ms: float,
+              interval: float = 0.25):
+        """must be called from the event loop thread, schedule has to be thread safe"""
+        if self._thread or not budget_ms:
+            return
+        self._schedule = schedule
+        self.budget_ms = budget_ms
+        self.interval = interval
+        self._loop_thread_id = threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch,
+                                        name='procmux-loop-monitor',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join(1)
+            self._thread = None
+
+    def _watch(self):
+        budget = self.budget_ms / 1000
+        while not self._stop_event.wait(self.interval):
+            scheduled = time.perf_counter()
+            done = threading.Event()
+
+            def probe():
+                self._on_probe(scheduled)
+                done.set()
+
+            try:
+                self._schedule(probe)
+            except Exception as e:
+                logger.error(f'loop monitor failed to schedule a probe: {e}')
+                return
+            if not done.wait(budget) and not self._stop_event.is_set():
+                self._sample_stall(scheduled)
+                while not done.wait(self.interval):
+                    if self._stop_event.is_set():
+                        return
+
+    def _sample_stall(self, scheduled: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame)[-_stack_depth:] if frame else []
+        with self._lock:
+            self._pending_stall = {
+                'time': time.time(),
+                'callback': self._current_callback,
+                'stack': [line.rstrip() for line in stack],
+                'scheduled': scheduled,
+            }
+
+    def _on_probe(self, scheduled: float):
+        lag_ms = (time.perf_counter() - scheduled) * 1000
+        timings.record('loop.lag', lag_ms)
+        with self._lock:
+            stall, self._pending_stall = self._pending_stall, None
+        if stall and stall.pop('scheduled') == scheduled:
+            stall['duration_ms'] = round(lag_ms, 3)
+            self.stalls.append(stall)
+            stack = '\n'.join(stall['stack'])
+            logger.warning(
+                f'event loop stalled for {lag_ms:.1f}ms '
+                f'(budget {self.budget_ms}ms, in: {stall["callback"] or "unknown"}):\n{stack}'
+            )
+
+    def tracked(self, name: str) -> Callable[[F], F]:
+        """times a callback that runs on the event loop and records it when it exceeds the budget"""
+
+        def decorator(func: F) -> F:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                previous, self._current_callback = self._current_callback, name
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._current_callback = previous
+                    duration_ms = (time.perf_counter() - started) * 1000
+                    if self.budget_ms and duration_ms > self.budget_ms:
+                        self._record_slow_callback(name, duration_ms)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    def _record_slow_callback(self, name: str, duration_ms: float):
+        self.slow_callbacks.append({
+            'time': time.time(),
+            'callback': name,
+            'duration_ms': round(duration_ms, 3),
+        })
+        logger.warning(
+            f'{name} took {duration_ms:.1f}ms on the event loop (budget {self.budget_ms}ms)'
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'budget_ms': self.budget_ms,
+            'lag': timings.snapshot().get('loop.lag'),
+            'stalls': list(self.stalls),
+            'slow_callbacks': list(self.slow_callbacks),
+        }
+
+
+loop_monitor = LoopMonitor()
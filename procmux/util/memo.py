@@ -0,0 +1,26 @@
+from typing import Any, Callable, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+_unset: Any = object()
+
+
+class LastValueCache(Generic[T]):
+    """
+    remembers the value computed for the most recent key. meant for render callbacks whose inputs
+    rarely change: tuple keys holding the same objects compare by identity, so a hit costs next to nothing
+    """
+
+    def __init__(self):
+        self._key: Any = _unset
+        self._value: Optional[T] = None
+
+    def get(self, key: Tuple[Any, ...], compute: Callable[[], T]) -> T:
+        if self._key is _unset or self._key != key:
+            self._value = compute()
+            self._key = key
+        return self._value  # type: ignore
+
+    def clear(self):
+        self._key = _unset
+        self._value = None
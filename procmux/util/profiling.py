@@ -0,0 +1,38 @@
+import cProfile
+import io
+import os
+import pstats
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from procmux.log import logger
+
+_summary_functions = 30
+
+
+def default_profile_path(state_dir: Optional[str]) -> str:
+    return os.path.join(state_dir or os.getcwd(), f'procmux-{os.getpid()}.prof')
+
+
+@contextmanager
+def profiled(path: str) -> Iterator[None]:
+    """
+    profiles everything run in the block (the event loop runs on this thread) with cProfile.
+    the stats are written to path on exit (load them with pstats or snakeviz) and a summary is logged.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            profile.dump_stats(path)
+            logger.info(f'wrote profile to {path}')
+        except OSError as e:
+            logger.error(f'failed to write profile to {path}: {e}')
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats(
+            pstats.SortKey.CUMULATIVE).print_stats(_summary_functions)
+        logger.info(f'profile summary:\n{summary.getvalue()}')
@@ -0,0 +1,64 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class Timer:
+
+    def __init__(self, callback: Callable[[], None]):
+        self._callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        # a timer cancelled after it came due (but before the loop got to it) does not run either
+        if not self.cancelled:
+            self._callback()
+
+
+class Timers:
+    """
+    call_later for event loops without timers of their own (prompt_toolkit's).
+    a single thread sleeps until the earliest timer is due and hands its callback to the loop with schedule,
+    which must be safe to call from any thread. the callbacks run on the event loop.
+    """
+
+    def __init__(self, schedule: Callable[[Callable[[], None]], None]):
+        self._schedule = schedule
+        # (due, sequence, timer), cancelled timers are dropped when they come up
+        self._heap: List[Tuple[float, int, Timer]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        timer = Timer(callback)
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay,
+                                        next(self._sequence), timer))
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run,
+                                                name='procmux-timers',
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return timer
+
+    def _run(self):
+        with self._condition:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                remaining = self._heap[0][0] - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                _, _, timer = heapq.heappop(self._heap)
+                self._schedule(timer._run)
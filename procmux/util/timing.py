@@ -0,0 +1,127 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, TypeVar
+
+# upper bounds (in ms) of the histogram buckets, the last bucket catches everything slower
+_bucket_bounds_ms = [
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500,
+    5000
+]
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class Histogram:
+    """a fixed bucket latency histogram, cheap enough to record every call of a hot path"""
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(_bucket_bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float):
+        self.counts[bisect.bisect_left(_bucket_bounds_ms, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+
+    def percentile(self, percent: float) -> float:
+        """the upper bound of the bucket the percentile falls into"""
+        if not self.count:
+            return 0.0
+        threshold = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= threshold:
+                if index < len(_bucket_bounds_ms):
+                    return min(_bucket_bounds_ms[index], self.max_ms)
+                break
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        bucket_labels = [f'<={bound}ms' for bound in _bucket_bounds_ms
+                         ] + [f'>{_bucket_bounds_ms[-1]}ms']
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'buckets': {
+                label: count
+                for label, count in zip(bucket_labels, self.counts) if count
+            },
+        }
+
+
+class Timings:
+    """named histograms of the hot paths (render, keybindings, filtering, spawning, output, server handlers)"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration_ms: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(duration_ms)
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+
+        def decorator(func: F) -> F:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - started) * 1000)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: histogram.snapshot()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def report(self) -> str:
+        lines = [
+            f'{"timer":<32} {"count":>8} {"mean ms":>9} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"max ms":>9}'
+        ]
+        for name, stats in self.snapshot().items():
+            lines.append(
+                f'{name:<32} {stats["count"]:>8} {stats["mean_ms"]:>9.3f} '
+                f'{stats["p50_ms"]:>8.3f} {stats["p95_ms"]:>8.3f} {stats["p99_ms"]:>8.3f} '
+                f'{stats["max_ms"]:>9.3f}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+timings = Timings()
@@ -0,0 +1,26 @@
+from benchmarks.tui import (benchmark_idle_memory, benchmark_keystroke_latency, benchmark_output_throughput,
+                            benchmark_spawn_latency)
+
+
+def test_keystroke_latency_benchmark_runs():
+    results = benchmark_keystroke_latency(process_counts=[10], keystrokes=10)
+    assert set(results[10]) == {"p50", "p95", "p99", "max", "mean"}
+    assert results[10]["p50"] <= results[10]["p99"] <= results[10]["max"]
+
+
+def test_idle_memory_benchmark_runs():
+    results = benchmark_idle_memory(process_counts=[10])
+    assert set(results[10]) == {"kib", "per_process"}
+    assert results[10]["kib"] > 0
+
+
+def test_output_throughput_benchmark_runs():
+    results = benchmark_output_throughput(megabytes=1)
+    assert set(results) == {"idle", "visible"}
+    assert all(rate > 0 for rate in results.values())
+
+
+def test_spawn_latency_benchmark_runs():
+    results = benchmark_spawn_latency(spawns=3)
+    assert set(results) == {"shell", "direct"}
+    assert all(stats["p50"] > 0 for stats in results.values())
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from conftest import repo_root, unused_port
+
+_heavy_modules = ("prompt_toolkit", "ptterm", "hiyapyco", "pyte")
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """returns {module_name: cumulative_us} for every import reported by -X importtime"""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def test_signal_subcommand_skips_heavy_imports():
+    with tempfile.NamedTemporaryFile(suffix=".yaml") as yaml_tmp:
+        yaml_tmp.write(f"""\
+signal_server:
+  enable: true
+  port: {unused_port()}
+procs:
+  "tail log":
+    shell: "tail -f /dev/null"
+""".encode("utf8"))
+        yaml_tmp.flush()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "procmux.main",
+             "signal-restart", "--name", "tail log", "--config", yaml_tmp.name],
+            cwd=tempfile.gettempdir(),
+            env={**os.environ, "PYTHONPATH": repo_root},
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+
+    # nothing is listening, the client should fail cleanly instead of with a traceback
+    assert result.returncode == 1
+    assert "Traceback" not in result.stderr
+
+    imports = _parse_importtime(result.stderr)
+    procmux_us = sum(us for name, us in imports.items() if name in ("procmux", "procmux.server.client"))
+    print(f"signal-restart import time: {procmux_us / 1000:.1f}ms across {len(imports)} modules")
+    heavy = sorted(name for name in imports if name.split(".")[0] in _heavy_modules)
+    assert heavy == []
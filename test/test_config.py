@@ -0,0 +1,35 @@
+from procmux.config import ProcMuxConfig, ProcessConfig, diff_procs
+from procmux.tui.state.process_state import ProcessState
+
+
+def _procs(**shells) -> dict:
+    return {name: ProcessConfig(shell=shell) for name, shell in shells.items()}
+
+
+def test_diff_procs_detects_added_removed_and_changed():
+    old = _procs(api="run api", web="run web", db="run db")
+    new = _procs(api="run api --debug", web="run web", worker="run worker")
+    diff = diff_procs(old, new)
+    assert diff.added == ["worker"]
+    assert diff.removed == ["db"]
+    assert diff.changed == ["api"]
+    assert not diff.empty
+
+
+def test_diff_procs_no_changes():
+    assert diff_procs(_procs(api="run api"), _procs(api="run api")).empty
+
+
+def test_process_state_add_and_remove_keeps_selection():
+    state = ProcessState(ProcMuxConfig(procs=_procs(b="b", c="c")))
+    state.set_selected_process_by_y_pos(1)
+    assert state.selected_process.name == "c"
+
+    added = state.add_process("a", ProcessConfig(shell="a"))
+    assert added.index == 2
+    assert [p.name for p in state.filtered_process_list] == ["a", "b", "c"]
+    assert state.selected_process.name == "c"
+
+    state.remove_process(state.get_process_by_name("b"))
+    assert [p.name for p in state.process_list] == ["a", "c"]
+    assert state.selected_process.name == "c"
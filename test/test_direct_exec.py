@@ -0,0 +1,40 @@
+import os
+import shutil
+
+from procmux.process.direct_exec import direct_command, resolve_executable
+
+
+def _path() -> str:
+    return os.environ.get("PATH", "")
+
+
+def test_plain_command_is_exec_directly(tmp_path):
+    assert direct_command("sleep 5", _path(), str(tmp_path)) == [shutil.which("sleep"), "5"]
+    assert direct_command("""echo 'a b' "c d" e""", _path(), str(tmp_path)) == [
+        shutil.which("echo"), "a b", "c d", "e"]
+    assert direct_command("uname --kernel-name=x", _path(), str(tmp_path))[1:] == ["--kernel-name=x"]
+
+
+def test_commands_that_need_the_shell(tmp_path):
+    for command in ["echo $HOME", "echo a | cat", "ls *.py", "sleep 1 && echo done", "cd /tmp",
+                    "FOO=bar env", "echo ~", "echo 'unbalanced", "definitely-not-a-program-procmux"]:
+        assert direct_command(command, _path(), str(tmp_path)) is None, command
+
+
+def test_relative_program_is_resolved_against_cwd(tmp_path):
+    script = tmp_path / "run.sh"
+    script.write_text("#!/bin/sh\necho hi\n")
+    assert direct_command("./run.sh --fast", _path(), str(tmp_path)) is None
+    script.chmod(0o755)
+    assert direct_command("./run.sh --fast", _path(), str(tmp_path)) == [str(script), "--fast"]
+
+
+def test_resolved_executable_is_looked_up_again_once_it_is_gone(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    tool = bin_dir / "procmux-tool"
+    tool.write_text("#!/bin/sh\n")
+    tool.chmod(0o755)
+    assert resolve_executable("procmux-tool", str(bin_dir), str(tmp_path)) == str(tool)
+    tool.unlink()
+    assert resolve_executable("procmux-tool", str(bin_dir), str(tmp_path)) is None
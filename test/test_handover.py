@@ -0,0 +1,157 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from urllib.request import Request, urlopen
+
+from conftest import repo_root, unused_port, wait_for
+
+# takes a while to listen, like any real service
+_service = """\
+import os, socket, sys, time
+time.sleep(0.5)
+s = socket.socket()
+s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+s.bind(("127.0.0.1", int(sys.argv[1])))
+s.listen(64)
+print("serving", os.getpid(), flush=True)
+while True:
+    s.accept()[0].close()
+"""
+
+
+def _serving_pids(log_path: str):
+    try:
+        with open(log_path) as f:
+            return [int(line.split()[1]) for line in f if line.startswith("serving")]
+    except OSError:
+        return []
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+
+def _accepts(port: int) -> bool:
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=1).close()
+        return True
+    except ConnectionRefusedError:
+        return False
+
+
+def test_overlap_restart_keeps_the_port_served():
+    work_dir = tempfile.mkdtemp()
+    with open(os.path.join(work_dir, "service.py"), "w") as f:
+        f.write(_service)
+    port, server_port = unused_port(), unused_port()
+    config_path = os.path.join(work_dir, "procmux.yaml")
+    with open(config_path, "w") as f:
+        f.write(textwrap.dedent(f"""\
+            signal_server:
+              enable: true
+              port: {server_port}
+            procs:
+              api:
+                cmd: ["{sys.executable}", "service.py", "{port}"]
+                cwd: "{work_dir}"
+                autostart: true
+                ports: [{port}]
+                restart_strategy: overlap
+            """))
+    output_dir = os.path.join(work_dir, "out")
+    log_path = os.path.join(output_dir, "api.log")
+    serve = subprocess.Popen(
+        [sys.executable, "-m", "procmux.main", "serve", "--config", config_path,
+         "--output-dir", output_dir],
+        cwd=work_dir,
+        env={**os.environ, "PYTHONPATH": repo_root},
+    )
+    try:
+        assert wait_for(lambda: _serving_pids(log_path) and _accepts(port))
+        old_pid = _serving_pids(log_path)[0]
+
+        urlopen(Request(f"http://127.0.0.1:{server_port}/restart-by-name/api",
+                        method="POST"), timeout=10).read()
+        refused = 0
+        deadline = time.monotonic() + 10
+        while _is_alive(old_pid) and time.monotonic() < deadline:
+            refused += not _accepts(port)
+            time.sleep(0.01)
+
+        assert not _is_alive(old_pid)
+        assert refused == 0
+        new_pid = _serving_pids(log_path)[-1]
+        assert new_pid != old_pid and _is_alive(new_pid)
+        assert _accepts(port)
+        listed = json.loads(urlopen(f"http://127.0.0.1:{server_port}/", timeout=10).read())
+        assert listed["process_list"][0]["running"]
+    finally:
+        serve.send_signal(signal.SIGTERM)
+        serve.wait(timeout=15)
+
+
+# the first instance drains its connections for a while once it is asked to stop
+_draining_service = _service.replace("while True:", """\
+import signal
+first = not os.path.exists("started")
+open("started", "w").close()
+def drain(*_):
+    open(f"draining-{os.getpid()}", "w").close()
+    time.sleep(2 if first else 0)
+    sys.exit(0)
+signal.signal(signal.SIGTERM, drain)
+# keeps draining when the pty goes away
+signal.signal(signal.SIGHUP, signal.SIG_IGN)
+while True:""")
+
+
+def test_shutdown_waits_for_the_replaced_instance():
+    work_dir = tempfile.mkdtemp()
+    with open(os.path.join(work_dir, "service.py"), "w") as f:
+        f.write(_draining_service)
+    port, server_port = unused_port(), unused_port()
+    config_path = os.path.join(work_dir, "procmux.yaml")
+    with open(config_path, "w") as f:
+        f.write(textwrap.dedent(f"""\
+            signal_server:
+              enable: true
+              port: {server_port}
+            procs:
+              api:
+                cmd: ["{sys.executable}", "service.py", "{port}"]
+                cwd: "{work_dir}"
+                autostart: true
+                ports: [{port}]
+                restart_strategy: overlap
+                stop: SIGTERM
+            """))
+    output_dir = os.path.join(work_dir, "out")
+    log_path = os.path.join(output_dir, "api.log")
+    serve = subprocess.Popen(
+        [sys.executable, "-m", "procmux.main", "serve", "--config", config_path,
+         "--output-dir", output_dir],
+        cwd=work_dir,
+        env={**os.environ, "PYTHONPATH": repo_root},
+    )
+    try:
+        assert wait_for(lambda: _serving_pids(log_path) and _accepts(port))
+        old_pid = _serving_pids(log_path)[0]
+        urlopen(Request(f"http://127.0.0.1:{server_port}/restart-by-name/api",
+                        method="POST"), timeout=10).read()
+        assert wait_for(lambda: os.path.exists(os.path.join(work_dir, f"draining-{old_pid}")))
+        serve.send_signal(signal.SIGTERM)
+        serve.wait(timeout=15)
+        assert not _is_alive(old_pid)
+    finally:
+        if serve.poll() is None:
+            serve.kill()
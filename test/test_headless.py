@@ -0,0 +1,60 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+from conftest import repo_root, wait_for
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def test_serve_runs_processes_without_prompt_toolkit():
+    work_dir = tempfile.mkdtemp()
+    config_path = os.path.join(work_dir, "procmux.yaml")
+    output_dir = os.path.join(work_dir, "out")
+    with open(config_path, "w") as f:
+        f.write("""\
+procs:
+  "long running":
+    shell: "echo started $GREETING; sleep 60"
+    autostart: true
+    env:
+      GREETING: headless
+  "flaky":
+    shell: "echo flaky run; exit 3"
+    autostart: true
+    restart: on-failure
+    restart_delay: 0.1
+  "manual":
+    shell: "echo never started"
+""")
+
+    serve = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-m", "procmux.main", "serve",
+         "--config", config_path, "--output-dir", output_dir],
+        cwd=work_dir,
+        env={**os.environ, "PYTHONPATH": repo_root},
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        long_running_log = os.path.join(output_dir, "long_running.log")
+        flaky_log = os.path.join(output_dir, "flaky.log")
+        assert wait_for(lambda: "started headless" in _read(long_running_log))
+        assert wait_for(lambda: _read(flaky_log).count("flaky run") >= 3)
+        assert not os.path.exists(os.path.join(output_dir, "manual.log"))
+    finally:
+        serve.send_signal(signal.SIGTERM)
+        _, stderr = serve.communicate(timeout=15)
+
+    assert serve.returncode == 0
+    assert "headless procmux finished" in stderr
+    imported = [line.split("|")[-1].strip() for line in stderr.splitlines() if line.startswith("import time:")]
+    assert not [m for m in imported if m.split(".")[0] in ("prompt_toolkit", "ptterm")]
@@ -0,0 +1,40 @@
+import pytest
+
+from procmux.config import ProcessConfig
+from procmux.util.interpolation import InterpolationTemplate, interpolate, parse_interpolations
+
+
+def test_template_lists_fields_with_defaults():
+    template = InterpolationTemplate("echo '<first_echo:some default>' && echo '<second_echo>'")
+    assert [(f.field, f.default_value) for f in template.fields] == [
+        ("first_echo", "some default"),
+        ("second_echo", ""),
+    ]
+
+
+def test_template_renders_in_a_single_pass():
+    template = InterpolationTemplate("echo <a> <b>")
+    # a value that looks like another placeholder must not be substituted again
+    assert template.render({"a": "<b>", "b": "B"}) == "echo <b> B"
+
+
+def test_template_keeps_placeholders_without_values():
+    assert InterpolationTemplate("echo <a:x> <b>").render({"b": "B"}) == "echo <a:x> B"
+
+
+def test_defaults_with_regex_metacharacters():
+    text = "find . -regex '<pattern:.*\\.(py|txt)$>' -size <size:+1k>"
+    interpolations = parse_interpolations(text)
+    assert [i.default_value for i in interpolations] == [".*\\.(py|txt)$", "+1k"]
+    assert interpolate(text, interpolations) == "find . -regex '.*\\.(py|txt)$' -size +1k"
+
+
+def test_process_config_caches_interpolations():
+    config = ProcessConfig(cmd=["grep", "<pattern:a|b>", "<path>"])
+    assert config.interpolations is config.interpolations
+    assert config.render_command({"pattern": "foo", "path": "/tmp"}) == ["grep", "foo", "/tmp"]
+
+
+def test_duplicate_fields_are_rejected():
+    with pytest.raises(AssertionError):
+        ProcessConfig(cmd=["echo", "<a>", "<a>"]).interpolations
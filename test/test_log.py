@@ -0,0 +1,22 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+
+from procmux.log import for_process, logger, start_logging, stop_logging
+
+
+def test_json_lines_are_written_off_thread_with_the_process(tmp_path):
+    log_file = tmp_path / "procmux.log"
+    start_logging(logging.FileHandler(log_file), "json")
+    try:
+        logger.info("%s exited with code %s", "web", 1, extra=for_process("web"))
+        logger.info("in autostart")
+    finally:
+        stop_logging()
+
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert entries[0]["message"] == "web exited with code 1"
+    assert entries[0]["process"] == "web"
+    assert entries[0]["thread"] == "MainThread"
+    assert entries[1]["process"] is None
+    assert not any(isinstance(h, QueueHandler) for h in logger.handlers)
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from procmux.util.loop_monitor import LoopMonitor
+
+
+def test_blocking_callback_is_sampled_and_attributed():
+    monitor = LoopMonitor()
+
+    @monitor.tracked("blocking handler")
+    def blocking_handler():
+        time.sleep(0.3)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        monitor.start(loop.call_soon_threadsafe, budget_ms=50, interval=0.02)
+        await asyncio.sleep(0.1)
+        blocking_handler()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+
+    asyncio.run(run())
+
+    assert [c["callback"] for c in monitor.slow_callbacks] == ["blocking handler"]
+    assert monitor.slow_callbacks[0]["duration_ms"] >= 300
+    stall = monitor.stalls[-1]
+    assert stall["callback"] == "blocking handler"
+    assert stall["duration_ms"] >= 50
+    assert any("blocking_handler" in line for line in stall["stack"])
+    assert not monitor.snapshot()["enabled"]
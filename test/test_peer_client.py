@@ -0,0 +1,84 @@
+import logging
+import queue
+import tempfile
+import time
+
+from procmux.config import PeerConfig, ProcMuxConfig, ProcessConfig, SignalServerConfig
+from procmux.process.controller import ProcessController
+from procmux.server import peer_client
+from procmux.server.commands import CommandQueue, StopProcess
+from procmux.server.peer_client import PeerClient
+from procmux.server.server import start_server
+from procmux.tui.state.interpolation_state import InterpolationState
+from procmux.tui.state.process_state import ProcessState
+
+from conftest import unused_port
+
+
+class _StateController(ProcessController):
+    """the server only reads the state of the processes"""
+
+    @property
+    def is_running(self) -> bool:
+        return self.process.running
+
+    def get_output_tail(self, max_lines: int) -> str:
+        return ""
+
+    def _send_signal(self, sig_code: int):
+        pass
+
+
+def test_peer_process_list_is_long_polled_and_commands_are_proxied():
+    port = unused_port()
+    config = ProcMuxConfig(
+        procs={"web": ProcessConfig(shell="echo web"), "db": ProcessConfig(shell="echo db")},
+        signal_server=SignalServerConfig(enable=True, port=port),
+        state_dir=tempfile.mkdtemp(),
+    )
+    process_state = ProcessState(config)
+    web = process_state.get_process_by_name("web")
+    web.running = True
+
+    def execute(command):
+        if isinstance(command, StopProcess):
+            command.process.running = False
+
+    controllers = {p.index: _StateController(config, p) for p in process_state.process_list}
+    server = start_server(config, process_state, controllers, CommandQueue(lambda drain: drain(), execute),
+                          InterpolationState(config))
+    updates = queue.Queue()
+    client = PeerClient("other", PeerConfig(port=port), updates.put, lambda name, output: None)
+    client.start()
+    try:
+        processes = updates.get(timeout=5)
+        assert {p["name"]: p["running"] for p in processes} == {"web": True, "db": False}
+
+        # the held poll answers as soon as the stop changed the list
+        client.stop_process("web").result(5)
+        processes = updates.get(timeout=5)
+        assert {p["name"]: p["running"] for p in processes} == {"web": False, "db": False}
+
+        # an unreachable peer is reported once
+        server.stop()
+        assert updates.get(timeout=10) is None
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_offline_peer_is_logged_once(monkeypatch, caplog):
+    monkeypatch.setattr(peer_client, "retry_delay", 0.01)
+    monkeypatch.setattr(peer_client, "max_retry_delay", 0.01)
+    updates = queue.Queue()
+    client = PeerClient("offline", PeerConfig(port=unused_port()), updates.put, lambda name, output: None)
+    with caplog.at_level(logging.INFO):
+        client.start()
+        try:
+            assert updates.get(timeout=5) is None
+            # a few more failed polls
+            time.sleep(0.2)
+        finally:
+            client.close()
+    assert len([r for r in caplog.records if "offline" in r.getMessage()]) == 1
+    assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
@@ -0,0 +1,66 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from procmux.process.ports import OUTSIDE, ListeningPort, PortConflict, PortScanner, find_conflicts
+from procmux.process.tree import ProcessTable
+
+
+def _tcp(port: int) -> ListeningPort:
+    return ListeningPort('tcp', '0.0.0.0', port, inode=port)
+
+
+def test_find_conflicts():
+    conflicts = find_conflicts({'api': [8000], 'web': [3000]}, {
+        'api': [_tcp(8000)],
+        'worker': [_tcp(3000), _tcp(9000)],
+        'other': [_tcp(9000)],
+        None: [],
+    })
+    assert conflicts == [
+        PortConflict(9000, holders=('other', 'worker')),
+        PortConflict(3000, 'web', holders=('worker', )),
+    ]
+    assert find_conflicts({'api': [8000]}, {'api': [], None: [_tcp(8000)]}) == [
+        PortConflict(8000, 'api', outside=True)
+    ]
+    # udp sockets share ports on purpose
+    udp = ListeningPort('udp', '0.0.0.0', 5353, inode=1)
+    assert find_conflicts({}, {'a': [udp], 'b': [udp]}) == []
+
+
+@pytest.mark.skipif(not ProcessTable().available, reason="needs /proc")
+def test_scanner_finds_the_port_a_process_listens_on():
+    popen = subprocess.Popen([
+        sys.executable, "-c",
+        "import socket, sys, time\n"
+        "s = socket.socket()\n"
+        "s.bind(('127.0.0.1', 0))\n"
+        "s.listen()\n"
+        "print(s.getsockname()[1], flush=True)\n"
+        "time.sleep(30)\n"
+    ], stdout=subprocess.PIPE)
+    outside = socket.socket()
+    try:
+        port = int(popen.stdout.readline())
+        outside.bind(('127.0.0.1', 0))
+        outside.listen()
+        scanner = PortScanner()
+        ports = scanner.scan([popen.pid])
+        assert [p.port for p in ports[popen.pid]] == [port]
+        assert outside.getsockname()[1] in [p.port for p in ports[OUTSIDE]]
+
+        # the owner of a closed socket is forgotten
+        popen.kill()
+        popen.wait()
+        deadline = time.monotonic() + 5
+        while popen.pid in scanner.scan([]) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert popen.pid not in scanner.scan([])
+    finally:
+        outside.close()
+        popen.kill()
+        popen.wait()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from procmux.process.tree import ProcessTable
+
+
+@pytest.mark.skipif(not ProcessTable().available, reason="needs /proc")
+def test_tree_contains_the_descendants_of_a_shell_wrapper():
+    popen = subprocess.Popen(["/bin/sh", "-c", f"{sys.executable} -c 'import time; time.sleep(30)' & wait"])
+    try:
+        table = ProcessTable()
+        deadline = time.monotonic() + 5
+        while True:
+            table.refresh([popen.pid])
+            tree = table.tree(popen.pid)
+            if len(tree) == 2 or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        assert [node.depth for node in tree] == [0, 1]
+        assert tree[0].info.pid == popen.pid
+        assert "time.sleep(30)" in tree[1].info.command
+        assert tree[1].info.rss_kb > 0
+
+        # the child is gone after the next refresh once it exited
+        subprocess.run(["kill", str(tree[1].info.pid)])
+        deadline = time.monotonic() + 5
+        while len(table.tree(popen.pid)) > 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            table.refresh([popen.pid])
+        assert len(table.tree(popen.pid)) <= 1
+    finally:
+        popen.kill()
+        popen.wait()
@@ -0,0 +1,24 @@
+import asyncio
+import subprocess
+import sys
+import threading
+
+from procmux.process.reaper import Reaper
+
+
+def test_exit_status_and_rusage_are_collected_on_the_loop():
+    async def run():
+        loop = asyncio.get_running_loop()
+        reaper = Reaper(loop.add_reader, loop.remove_reader, loop.call_soon_threadsafe)
+        exited = loop.create_future()
+        popen = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        threads = threading.active_count()
+        reaper.watch(popen.pid, exited.set_result)
+        # the pidfd is watched by the loop itself
+        assert threading.active_count() == threads
+        return await asyncio.wait_for(exited, 10)
+
+    status = asyncio.run(run())
+    assert status.exit_code == 3
+    assert status.user_time + status.system_time > 0
+    assert status.max_rss_kb > 0
@@ -0,0 +1,111 @@
+import tempfile
+import time
+
+import pytest
+
+from procmux.config import ProcMuxConfig, ProcessConfig, SignalServerConfig
+from procmux.server.client import SignalClient
+from procmux.server.commands import CommandQueue, ReadState, StartProcess
+from procmux.server.server import start_server
+from procmux.tui.state.interpolation_state import InterpolationState
+from procmux.tui.state.process_state import ProcessState
+
+from conftest import unused_port
+
+
+@pytest.fixture
+def signal_server():
+    config = ProcMuxConfig(
+        procs={
+            "plain": ProcessConfig(shell="echo plain"),
+            "deploy": ProcessConfig(shell="deploy --env <env> --tag <tag:latest>"),
+        },
+        signal_server=SignalServerConfig(enable=True, port=unused_port()),
+        state_dir=tempfile.mkdtemp(),
+    )
+    started = []
+    interpolation_state = InterpolationState(config)
+
+    def execute(command):
+        if isinstance(command, StartProcess):
+            interpolations = command.interpolations
+            started.append((command.process.name, {i.field: i.value for i in interpolations or []}))
+            if interpolations:
+                interpolation_state.remember(command.process.name, interpolations)
+
+    commands = CommandQueue(lambda drain: drain(), execute)
+    server = start_server(config, ProcessState(config), {}, commands, interpolation_state)
+    client = SignalClient(config)
+    for _ in range(50):
+        try:
+            client.get_process_list()
+            break
+        except ConnectionError:
+            time.sleep(0.05)
+    yield config, client, started
+    server.stop()
+
+
+def test_start_plain_process(signal_server):
+    _, client, started = signal_server
+    client.start_process("plain")
+    assert started == [("plain", {})]
+
+
+def test_start_with_field_values_and_defaults(signal_server):
+    _, client, started = signal_server
+    client.start_process("deploy", {"env": "staging"})
+    assert started == [("deploy", {"env": "staging", "tag": "latest"})]
+
+
+def test_start_without_required_field_is_rejected(signal_server):
+    _, client, started = signal_server
+    with pytest.raises(ValueError, match="env"):
+        client.start_process("deploy")
+    assert started == []
+
+
+def test_remembered_values_are_reused_and_persisted(signal_server):
+    config, client, started = signal_server
+    client.start_process("deploy", {"env": "prod", "tag": "v2"})
+    client.start_process("deploy")
+    assert started[-1] == ("deploy", {"env": "prod", "tag": "v2"})
+    assert InterpolationState(config).get_values("deploy") == {"env": "prod", "tag": "v2"}
+
+
+def test_handlers_are_timed(signal_server):
+    _, client, _ = signal_server
+    client.start_process("plain")
+    timings = client.get_timings()
+    assert timings["server.POST /start-by-name"]["count"] >= 1
+    assert timings["server.GET /"]["count"] >= 1
+
+
+def test_commands_submitted_before_a_drain_are_applied_in_one_batch():
+    scheduled, executed, batches = [], [], []
+    commands = CommandQueue(scheduled.append, executed.append, lambda: batches.append(list(executed)))
+    futures = [commands.submit(StartProcess(name)) for name in ("a", "b", "c")]
+    assert len(scheduled) == 1
+    scheduled[0]()
+    assert [c.process for c in executed] == ["a", "b", "c"]
+    assert batches == [executed]
+    assert all(f.done() for f in futures)
+
+
+def test_failing_command_fails_its_future():
+    def execute(command):
+        raise RuntimeError("boom")
+
+    commands = CommandQueue(lambda drain: drain(), execute)
+    with pytest.raises(RuntimeError, match="boom"):
+        commands.submit(StartProcess("a")).result(1)
+
+
+def test_reads_run_on_the_loop_without_a_redraw():
+    scheduled, executed, batches = [], [], []
+    commands = CommandQueue(scheduled.append, executed.append, lambda: batches.append(list(executed)))
+    future = commands.submit(ReadState(lambda: "tail"))
+    assert not future.done()
+    scheduled[0]()
+    assert future.result(0) == "tail"
+    assert executed == [] and batches == []
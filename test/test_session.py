@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+from procmux.tui.state.session_state import SessionJournal, load_session
+
+
+def test_session_journal_replays_and_compacts():
+    state_dir = tempfile.mkdtemp()
+    journal = SessionJournal(state_dir)
+    journal.compact_after = 3
+    assert journal.open().running == {}
+
+    journal.record_started("api", {"port": "8080"})
+    journal.record_started("worker", {})
+    journal.record_stopped("worker", "worker output")
+    journal.record_selected("api")
+    journal.record_filter("ap")
+    journal.close()
+
+    path = os.path.join(state_dir, "session.jsonl")
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+    # a torn record from a crash mid-write is ignored
+    with open(path, "a") as f:
+        f.write('{"event": "started", "na')
+
+    session = load_session(path)
+    assert session.running == {"api": {"port": "8080"}}
+    assert session.tails == {"worker": "worker output"}
+    assert session.selected == "api"
+    assert session.filter_text == "ap"
+
+    # a new session starts over, but hands back the previous one first
+    journal = SessionJournal(state_dir)
+    assert journal.open().running == {"api": {"port": "8080"}}
+    journal.close()
+    assert load_session(path).running == {}
@@ -0,0 +1,86 @@
+import queue
+import socket
+
+from procmux.config import ProcessConfig
+from procmux.process.start_queue import StartQueue
+from procmux.tui.types import Process
+
+
+class _Timer:
+
+    def __init__(self, delay, callback):
+        self.delay = delay
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def _process(index: int, name: str, **config) -> Process:
+    return Process(index, ProcessConfig(shell=f"echo {name}", **config), name)
+
+
+def test_starts_by_priority_within_the_limit():
+    scheduled = queue.Queue()
+    timers = []
+
+    def call_later(delay, callback):
+        timers.append(_Timer(delay, callback))
+        return timers[-1]
+
+    start_queue = StartQueue(2, scheduled.put, call_later)
+    spawned = []
+
+    def run_scheduled():
+        while not scheduled.empty():
+            scheduled.get()()
+
+    processes = [
+        _process(0, "low"),
+        _process(1, "high", start_priority=10),
+        _process(2, "mid", start_priority=5, ready_timeout=3),
+        _process(3, "other low"),
+    ]
+    for process in processes:
+        start_queue.submit(process, lambda p=process: spawned.append(p.name) or True)
+    run_scheduled()
+    assert spawned == ["high", "mid"]
+    assert processes[0].start_queued and not processes[1].start_queued
+
+    # a process without ports is ready once it was spawned
+    start_queue.on_spawned(processes[1])
+    run_scheduled()
+    assert spawned == ["high", "mid", "low"]
+
+    # a start that is still queued can be dropped
+    assert start_queue.cancel(processes[3])
+    # the slot of a process that never gets ready is given up after its ready timeout
+    mid_timer = next(t for t in timers if t.delay == 3)
+    mid_timer.callback()
+    run_scheduled()
+    assert spawned == ["high", "mid", "low"]
+    # the timer of a process that got ready in time is cancelled
+    assert timers[0].cancelled
+
+
+def test_slot_is_held_until_the_declared_ports_are_listened_on():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]
+        scheduled = queue.Queue()
+        start_queue = StartQueue(1, scheduled.put, _Timer)
+        server = _process(0, "server", ports=[port], start_priority=1)
+        client = _process(1, "client")
+        spawned = []
+        for process in (server, client):
+            start_queue.submit(process, lambda p=process: spawned.append(p.name) or True)
+        scheduled.get(timeout=1)()
+        start_queue.on_spawned(server)
+        assert spawned == ["server"]
+
+        s.listen()
+        # scheduled from the port waiter thread
+        scheduled.get(timeout=5)()
+        scheduled.get(timeout=1)()
+        assert spawned == ["server", "client"]
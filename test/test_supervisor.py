@@ -0,0 +1,93 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+
+from procmux.supervisor.launcher import is_supervisor_listening
+from procmux.supervisor.protocol import MessageReader, encode
+
+from conftest import repo_root, wait_for
+
+
+class _Viewer:
+
+    def __init__(self, socket_path: str):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(socket_path)
+        self.socket.settimeout(0.1)
+        self.reader = MessageReader()
+        self.screens = {}
+        self.processes = {}
+
+    def send(self, message):
+        self.socket.sendall(encode(message))
+
+    def poll(self):
+        try:
+            data = self.socket.recv(65536)
+        except socket.timeout:
+            return
+        for message in self.reader.feed(data):
+            if message["type"] == "processes":
+                self.processes = {p["name"]: p["running"] for p in message["processes"]}
+            elif message["type"] == "screen":
+                lines = {} if message["full"] else self.screens.get(message["name"], {})
+                for row, runs in message["lines"].items():
+                    lines[int(row)] = "".join(text for _, text in runs)
+                self.screens[message["name"]] = lines
+
+    def screen_text(self, name: str) -> str:
+        self.poll()
+        return "\n".join(self.screens.get(name, {}).values())
+
+    def close(self):
+        self.socket.close()
+
+
+def test_viewers_attach_and_detach_without_stopping_processes():
+    work_dir = tempfile.mkdtemp()
+    config_path = os.path.join(work_dir, "procmux.yaml")
+    socket_path = os.path.join(work_dir, "supervisor.sock")
+    with open(config_path, "w") as f:
+        f.write("""\
+procs:
+  "greeter":
+    shell: "echo hello from the supervisor; sleep 60"
+    autostart: true
+  "echo":
+    shell: "cat"
+    autostart: true
+""")
+
+    serve = subprocess.Popen(
+        [sys.executable, "-m", "procmux.main", "serve", "--config", config_path, "--socket", socket_path],
+        cwd=work_dir,
+        env={**os.environ, "PYTHONPATH": repo_root},
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        assert wait_for(lambda: is_supervisor_listening(socket_path))
+
+        first = _Viewer(socket_path)
+        assert wait_for(lambda: "hello from the supervisor" in first.screen_text("greeter"))
+        first.send({"type": "input", "name": "echo", "data": "typed remotely\r"})
+        assert wait_for(lambda: "typed remotely" in first.screen_text("echo"))
+        first.close()
+
+        # a second viewer gets a snapshot of everything that happened before it attached
+        second = _Viewer(socket_path)
+        assert wait_for(lambda: "typed remotely" in second.screen_text("echo"))
+        assert second.processes == {"greeter": True, "echo": True}
+
+        second.send({"type": "stop", "name": "echo"})
+        assert wait_for(lambda: second.poll() or second.processes.get("echo") is False)
+        assert second.processes["greeter"]
+        second.close()
+    finally:
+        serve.send_signal(signal.SIGTERM)
+        serve.wait(timeout=15)
+
+    assert serve.returncode == 0
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import Future
+
+from procmux.config import ProcessConfig
+from procmux.process.task_cache import TaskCache
+from procmux.util.interpolation import Interpolation
+
+
+def _task(tmp_path, **kwargs) -> ProcessConfig:
+    return ProcessConfig(shell="echo <target:all>",
+                         cwd=str(tmp_path),
+                         inputs=["src/**/*.txt"],
+                         **kwargs)
+
+
+def _cache(state_dir) -> TaskCache:
+    # the results are delivered on the hashing thread
+    return TaskCache(state_dir, lambda callback: callback())
+
+
+def _start(cache: TaskCache, config: ProcessConfig, interpolations=None) -> bool:
+    checked = Future()
+    if not cache.start("build", config, interpolations, checked.set_result):
+        return False
+    return checked.result(timeout=5)
+
+
+def _run(cache: TaskCache, config: ProcessConfig, succeeded: bool = True) -> bool:
+    up_to_date = _start(cache, config)
+    if not up_to_date:
+        cache.finish("build", succeeded)
+    return up_to_date
+
+
+def test_task_is_skipped_until_its_inputs_change(tmp_path):
+    (tmp_path / "src" / "nested").mkdir(parents=True)
+    source = tmp_path / "src" / "nested" / "a.txt"
+    source.write_text("one")
+    config = _task(tmp_path)
+    cache = _cache(str(tmp_path / ".procmux"))
+
+    assert not _run(cache, config)
+    assert _run(cache, config)
+    # only the mtime changed, the content hash still matches
+    os.utime(source, ns=(0, 0))
+    assert _run(cache, config)
+    source.write_text("two")
+    assert not _run(cache, config)
+    (tmp_path / "src" / "b.txt").write_text("new input")
+    assert not _run(cache, config)
+    # persisted in the state dir
+    assert _run(_cache(str(tmp_path / ".procmux")), config)
+
+
+def test_failed_run_and_other_field_values_are_not_up_to_date(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("one")
+    config = _task(tmp_path)
+    cache = _cache(None)
+
+    assert not _run(cache, config)
+    assert not _start(
+        cache, config, [Interpolation(field="target", value="docs", default_value="all")])
+    cache.finish("build", False)
+    # the failed run dropped the last successful one
+    assert not _run(cache, config)
+    assert _run(cache, config)
+
+
+def test_task_with_missing_outputs_runs(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("one")
+    config = _task(tmp_path, outputs=["dist/*.js"])
+    cache = _cache(None)
+
+    assert not _run(cache, config)
+    assert not _run(cache, config)
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "app.js").write_text("built")
+    assert _run(cache, config)
+
+
+def test_process_without_inputs_is_never_up_to_date(tmp_path):
+    cache = _cache(str(tmp_path))
+    config = ProcessConfig(shell="echo hi", cwd=str(tmp_path))
+    assert not _run(cache, config)
+    assert not _run(cache, config)
+
+
+def test_cancelled_hashing_is_dropped(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("one")
+    config = _task(tmp_path)
+    scheduled = []
+    cache = TaskCache(None, scheduled.append)
+    checked = []
+
+    assert cache.start("build", config, None, checked.append)
+    assert cache.checking("build")
+    assert cache.cancel("build")
+    cache.close()
+    for callback in scheduled:
+        callback()
+    assert not checked
+    assert not cache.checking("build")
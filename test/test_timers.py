@@ -0,0 +1,24 @@
+import queue
+import threading
+import time
+
+from procmux.util.timers import Timers
+
+
+def test_timers_run_in_order_on_one_thread():
+    scheduled = queue.Queue()
+    timers = Timers(scheduled.put)
+    ran = []
+    threads_before = threading.active_count()
+
+    timers.call_later(0.2, lambda: ran.append("late"))
+    timers.call_later(0.05, lambda: ran.append("early"))
+    cancelled = timers.call_later(0.1, lambda: ran.append("cancelled"))
+    cancelled.cancel()
+    assert threading.active_count() <= threads_before + 1
+
+    started = time.monotonic()
+    while len(ran) < 2:
+        scheduled.get(timeout=1)()
+    assert ran == ["early", "late"]
+    assert time.monotonic() - started >= 0.15
@@ -0,0 +1,27 @@
+from procmux.util.timing import Histogram, Timings
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.record(0.3)
+    for _ in range(10):
+        histogram.record(40)
+    assert histogram.percentile(50) == 0.5
+    assert histogram.percentile(95) == 40
+    assert histogram.snapshot()["buckets"] == {"<=0.5ms": 90, "<=50ms": 10}
+
+
+def test_timed_records_even_when_the_call_raises():
+    timings = Timings()
+
+    @timings.timed("failing")
+    def failing():
+        raise RuntimeError()
+
+    try:
+        failing()
+    except RuntimeError:
+        pass
+    assert timings.snapshot()["failing"]["count"] == 1
+    assert "failing" in timings.report()
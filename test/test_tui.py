@@ -1,11 +1,9 @@
-import os
-import select
 import tempfile
 
-import pyte
+from prompt_toolkit.application.current import set_app
 
-from procmux import run_app
-from procmux.config import parse_config
+from procmux.config import ProcMuxConfig, ProcessConfig, parse_config
+from procmux.tui.harness import TUIHarness
 
 
 def _get_config_yaml(log_file: str) -> str:
@@ -52,46 +50,31 @@ def _get_config_yaml(log_file: str) -> str:
 
 def preform_test_within_tui(keys, assertion):
     """Test TUI."""
-    # create pseudo-terminal
-    pid, f_d = os.forkpty()
-    if pid == 0:
-        # child process spawns TUI
-        with tempfile.NamedTemporaryFile() as yaml_tmp:
-            with tempfile.NamedTemporaryFile() as log_tmp:
-                config_yaml = _get_config_yaml(log_tmp.name)
-                yaml_tmp.write(config_yaml.encode("utf8"))
-                yaml_tmp.flush()
-                config = parse_config(yaml_tmp.name)
-                run_app(config)
-
-    else:
-        screen = pyte.Screen(100, 30)
-        stream = pyte.ByteStream(screen)
-        for key in keys:
-            print(f"sending key input: {key}")
-            os.write(f_d, str.encode(key))
-        # scrape pseudo-terminal's screen
-        while True:
-            try:
-                [f_d], _, _ = select.select([f_d], [], [], 1)
-            except (KeyboardInterrupt, ValueError):
-                # either test was interrupted or the
-                # file descriptor of the child process
-                # provides nothing to be read
-                break
-            else:
-                try:
-                    # scrape screen of child process
-                    data = os.read(f_d, 1024)
-                    stream.feed(data)
-                except OSError:
-                    # reading empty
-                    break
-        print("\n")
-        for line in screen.display:
-            print(line)
-
-        assertion(screen)
+    with tempfile.NamedTemporaryFile() as yaml_tmp:
+        with tempfile.NamedTemporaryFile() as log_tmp:
+            config_yaml = _get_config_yaml(log_tmp.name)
+            yaml_tmp.write(config_yaml.encode("utf8"))
+            yaml_tmp.flush()
+            config = parse_config(yaml_tmp.name)
+            with TUIHarness(config, columns=100, rows=30) as harness:
+                for key in keys:
+                    print(f"sending key input: {key}")
+                    harness.send_keys(key)
+
+                def _assertion_holds():
+                    try:
+                        assertion(harness.screen)
+                        return True
+                    except AssertionError:
+                        return False
+
+                # only waits when the assertion depends on process output
+                harness.wait_until(_assertion_holds)
+                print("\n")
+                for line in harness.screen.display:
+                    print(line)
+
+                assertion(harness.screen)
 
 
 def join_screen_to_str(screen) -> str:
@@ -118,6 +101,21 @@ def test_tui_shows_terminal_help():
     preform_test_within_tui(keys=["j", "j", "w"], assertion=assert_terminal_help_bar)
 
 
+def test_keybindings_are_cached_per_state():
+    with tempfile.NamedTemporaryFile() as yaml_tmp:
+        yaml_tmp.write(_get_config_yaml("/dev/null").encode("utf8"))
+        yaml_tmp.flush()
+        config = parse_config(yaml_tmp.name)
+    with TUIHarness(config, autostart=False) as harness:
+        controller = harness.controller
+        harness.send_keys("j", "j", "j")  # test long running proc
+        stopped = controller.get_app_keybindings()
+        assert controller.get_app_keybindings() is stopped
+        harness.send_keys("s")
+        assert harness.wait_for_text("<x> stop")
+        assert controller.get_app_keybindings() is not stopped
+
+
 def test_tui_filter():
     def assert_filter(screen):
         full_screen = join_screen_to_str(screen)
@@ -201,6 +199,77 @@ def test_long_docs_get_displayed():
     )
 
 
+def test_docs_file_is_loaded_and_reloaded_when_it_changes(tmp_path):
+    docs_file = tmp_path / "runbook.html"
+    docs_file.write_text("<b>first runbook</b>")
+    config = ProcMuxConfig(
+        procs={"deploy": ProcessConfig(shell="true", cwd=str(tmp_path), docs_file="runbook.html")},
+        signal_server={"enable": False},
+        watch_config=False,
+    )
+    with TUIHarness(config, autostart=False) as harness:
+        harness.send_keys("?")
+        assert "first runbook" in harness.text
+        docs_file.write_text("<b>second version of the runbook</b>")
+        harness.application.invalidate()
+        harness.advance()
+        assert "second version of the runbook" in harness.text
+
+
+def test_background_terminal_starts_at_the_size_terminals_are_shown_at(tmp_path):
+    config = ProcMuxConfig(
+        procs={
+            "a": ProcessConfig(shell="sleep 5"),
+            "b": ProcessConfig(shell="stty size; sleep 5"),
+        },
+        signal_server={"enable": False},
+        watch_config=False,
+        state_dir=str(tmp_path),
+    )
+    with TUIHarness(config, autostart=False) as harness:
+        harness.send_keys("s")
+        columns, rows = harness.controller.terminal_size
+        with set_app(harness.application):
+            harness.controller.start_process(harness.controller.process_list[1])
+        harness.send_keys("j")
+        # not resized from a default size once it is shown
+        assert harness.wait_for_text(f"{rows} {columns}")
+
+
+def test_terminal_controller_is_created_on_first_start(tmp_path):
+    config = ProcMuxConfig(
+        procs={"a": ProcessConfig(shell="sleep 5")},
+        signal_server={"enable": False},
+        watch_config=False,
+        state_dir=str(tmp_path),
+    )
+    with TUIHarness(config, autostart=False) as harness:
+        assert harness.controller.current_terminal_controller is None
+        harness.send_keys("s")
+        assert harness.controller.current_terminal_controller.is_running
+
+
+def test_flood_of_output_keeps_the_last_lines(tmp_path):
+    config = ProcMuxConfig(
+        procs={
+            "a": ProcessConfig(shell="sleep 5"),
+            "b": ProcessConfig(shell="seq 200000"),
+        },
+        signal_server={"enable": False},
+        watch_config=False,
+        state_dir=str(tmp_path),
+    )
+    with TUIHarness(config, autostart=False) as harness:
+        process = harness.controller.process_list[1]
+        with set_app(harness.application):
+            harness.controller.start_process(process)
+        assert harness.wait_until(lambda: not process.start_queued and not process.running, 30)
+        harness.send_keys("j")
+        # the cursor is on the empty line after the last one
+        tail = harness.controller.current_terminal_controller.get_output_tail(1001)
+        assert tail.split() == [str(i) for i in range(199001, 200001)]
+
+
 def test_tui_autostart():
     def assert_autostart(screen):
         for line in screen.display: